@@ -0,0 +1,109 @@
+
+import numpy as np
+
+# canais animados de todas as pecas em arrays tipo alvo valor taxa e modo
+# um step avanca todos os canais de uma vez e o apply escreve as matrizes locais dos nos ligados
+# cada no ligado e T(pivot) R1 R2 S T(-pivot) com cada R um eixo fixo vezes um canal vezes um fator
+# so os nos cujos angulos mudaram desde o ultimo apply recebem matriz nova
+# assim pecas paradas nao custam matrizes nem invalidam a world dos filhos
+
+EASE = 0   # aproxima do alvo exponencialmente a rate por segundo
+SPIN = 1   # soma rate unidades por segundo sem alvo tipo rodas a rolar
+
+LAYERS = 2 # rotacoes por no ligado
+
+_EYE3 = np.eye(3)
+
+class Animator:
+    def __init__(self):
+        self.names = []
+        self.target = np.zeros(0)
+        self.value = np.zeros(0)
+        self.prev = np.zeros(0)
+        self.rate = np.zeros(0)
+        self.ease = np.zeros(0, dtype=bool)
+        self.active = np.zeros(0, dtype=bool)
+
+        self.nodes = []
+        self.channels = np.zeros((0, LAYERS), dtype=np.intp)
+        # termos de rodrigues de cada eixo feitos no bind tipo R = c I + s K + (1 - c) k kT
+        self.K = np.zeros((0, LAYERS, 3, 3))
+        self.KK = np.zeros((0, LAYERS, 3, 3))
+        self.factors = np.zeros((0, LAYERS))
+        self.pivots = np.zeros((0, 3), dtype=np.float32)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.angles = np.zeros((0, LAYERS))   # angulos do ultimo apply pra saber quem mexeu
+        self.out = np.zeros((0, 4, 4), dtype=np.float32)
+        self.writes = 0
+
+    def add(self, name, value=0.0, rate=1.0, mode=EASE, target=None):
+        # devolve o indice do canal so se chama na construcao da cena
+        self.names.append(name)
+        self.target = np.append(self.target, value if target is None else target)
+        self.value = np.append(self.value, value)
+        self.prev = np.append(self.prev, value)
+        self.rate = np.append(self.rate, rate)
+        self.ease = np.append(self.ease, mode == EASE)
+        self.active = np.append(self.active, True)
+        return len(self.names) - 1
+
+    def bind(self, node, rotations, pivot=(0.0, 0.0, 0.0), scale=1.0):
+        # rotations lista de ate LAYERS tuplos canal eixo fator com o fator a passar o canal pra radianos
+        channels = np.zeros(LAYERS, dtype=np.intp)
+        K = np.zeros((LAYERS, 3, 3))
+        KK = np.zeros((LAYERS, 3, 3))
+        factors = np.zeros(LAYERS)
+        for k, (channel, axis, factor) in enumerate(rotations):
+            x, y, z = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+            channels[k], factors[k] = channel, factor
+            K[k] = ((0, -z, y), (z, 0, -x), (-y, x, 0))
+            KK[k] = np.outer((x, y, z), (x, y, z))
+        self.nodes.append(node)
+        self.channels = np.vstack([self.channels, channels[None]])
+        self.K = np.concatenate([self.K, K[None]])
+        self.KK = np.concatenate([self.KK, KK[None]])
+        self.factors = np.vstack([self.factors, factors[None]])
+        self.pivots = np.vstack([self.pivots, np.float32(pivot)[None]])
+        self.scales = np.append(self.scales, np.float32(scale))
+        # nan nunca e igual assim o primeiro apply escreve todos
+        self.angles = np.vstack([self.angles, np.full((1, LAYERS), np.nan)])
+        self.out = np.concatenate([self.out, np.eye(4, dtype=np.float32)[None]])
+        return len(self.nodes) - 1
+
+    def step(self, dt):
+        # um passo de simulacao pra todos os canais os inativos ficam onde estao
+        np.copyto(self.prev, self.value)
+        delta = np.where(self.ease, (self.target - self.value) * self.rate, self.rate)
+        delta *= dt
+        delta *= self.active
+        self.value += delta
+
+    def settled(self, channels, eps):
+        channels = np.asarray(channels)
+        return bool(np.all(np.abs(self.target[channels] - self.value[channels]) <= eps))
+
+    def apply(self, alpha=1.0):
+        # valores interpolados entre o passo anterior e o atual devolve quantos nos foram escritos
+        if not self.nodes: return 0
+        values = self.prev + (self.value - self.prev) * alpha
+        angles = values[self.channels] * self.factors
+        moved = np.flatnonzero((angles != self.angles).any(axis=1))
+        if not len(moved): return 0
+        self.angles[moved] = angles[moved]
+        a = angles[moved][:, :, None, None]
+        c = np.cos(a)
+        R = self.K[moved] * np.sin(a)
+        R += self.KK[moved] * (1.0 - c)
+        R += c * _EYE3
+        linear = R[:, 0]
+        for k in range(1, LAYERS): linear = linear @ R[:, k]
+        linear *= self.scales[moved, None, None]
+        # forma fechada de T(p) L T(-p) tipo bloco L e translacao p - L p
+        pivots = self.pivots[moved]
+        out = self.out
+        out[moved, :3, :3] = linear
+        out[moved, :3, 3] = pivots - np.einsum('nij,nj->ni', linear, pivots)
+        nodes = self.nodes
+        for i in moved.tolist(): nodes[i].local = self.out[i]
+        self.writes += len(moved)
+        return len(moved)
@@ -0,0 +1,279 @@
+
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from scene import vertex_bounds
+
+# formato de vertice partilhado igual ao do Mesh tipo x y z nx ny nz u v
+VERTEX_FLOATS = 8
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+# atributo opcional do bake tipo luz indireta rgb mais oclusao num vbo separado
+BAKE_FLOATS = 4
+BAKE_DEFAULT = np.array([0.0, 0.0, 0.0, 1.0], dtype=np.float32)
+
+# tamanho por defeito de cada pool em vertices e indices
+POOL_VERTICES = 1 << 18
+POOL_INDICES = 1 << 19
+
+class FreeList:
+    # lista de intervalos livres ordenada por offset tipo first fit com fusao dos vizinhos
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ranges = [(0, capacity)]
+
+    def alloc(self, size):
+        for i, (off, length) in enumerate(self.ranges):
+            if length >= size:
+                if length == size: del self.ranges[i]
+                else: self.ranges[i] = (off + size, length - size)
+                return off
+        return None
+
+    def free(self, off, size):
+        # inserir ordenado e juntar com os vizinhos pra nao fragmentar
+        i = 0
+        while i < len(self.ranges) and self.ranges[i][0] < off: i += 1
+        self.ranges.insert(i, (off, size))
+        if i + 1 < len(self.ranges) and off + size == self.ranges[i+1][0]:
+            self.ranges[i] = (off, size + self.ranges[i+1][1])
+            del self.ranges[i+1]
+        if i > 0 and self.ranges[i-1][0] + self.ranges[i-1][1] == off:
+            self.ranges[i-1] = (self.ranges[i-1][0], self.ranges[i-1][1] + self.ranges[i][1])
+            del self.ranges[i]
+
+    def largest(self):
+        return max((length for _, length in self.ranges), default=0)
+
+    def used(self):
+        return self.capacity - sum(length for _, length in self.ranges)
+
+class ArenaPool:
+    # um vao com um vbo e um ebo grandes onde as malhas sao subalocadas
+    def __init__(self, max_vertices, max_indices):
+        self.max_vertices = max_vertices
+        self.bake_vbo = None
+        self.vertex_space = FreeList(max_vertices)
+        self.index_space = FreeList(max_indices)
+
+        self.vao = glGenVertexArrays(1)
+        self.vbo = glGenBuffers(1)
+        self.ebo = glGenBuffers(1)
+
+        glBindVertexArray(self.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, max_vertices * VERTEX_STRIDE, None, GL_STATIC_DRAW)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, max_indices * 4, None, GL_STATIC_DRAW)
+
+        # mesmos atributos do Mesh posicao 0 normal 1 uv 2
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(2)
+        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, ctypes.c_void_p(24))
+
+        glBindVertexArray(0)
+
+    def try_alloc(self, n_verts, n_indices):
+        v_off = self.vertex_space.alloc(n_verts)
+        if v_off is None: return None
+        i_off = self.index_space.alloc(n_indices)
+        if i_off is None:
+            self.vertex_space.free(v_off, n_verts)
+            return None
+        return v_off, i_off
+
+    def upload(self, v_off, i_off, vertices, indices):
+        # indices ja rebaseados pro offset do vertice assim nao precisamos de base vertex
+        rebased = (indices.astype(np.uint32) + np.uint32(v_off)).astype(np.uint32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, v_off * VERTEX_STRIDE, vertices.nbytes, vertices)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferSubData(GL_ELEMENT_ARRAY_BUFFER, i_off * 4, rebased.nbytes, rebased)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def set_bake(self, v_off, data):
+        # o vbo do bake so e criado quando alguma malha do pool tem bake
+        # o resto fica com o valor por defeito sem luz extra e oclusao 1
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if self.bake_vbo is None:
+            self.bake_vbo = glGenBuffers(1)
+            defaults = np.tile(BAKE_DEFAULT, self.max_vertices)
+            glBindVertexArray(self.vao)
+            glBindBuffer(GL_ARRAY_BUFFER, self.bake_vbo)
+            glBufferData(GL_ARRAY_BUFFER, defaults.nbytes, defaults, GL_STATIC_DRAW)
+            glEnableVertexAttribArray(3)
+            glVertexAttribPointer(3, BAKE_FLOATS, GL_FLOAT, GL_FALSE, BAKE_FLOATS * 4, ctypes.c_void_p(0))
+            glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, self.bake_vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, v_off * BAKE_FLOATS * 4, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def gpu_bytes(self):
+        # reservado no driver quer esteja ocupado ou nao
+        bake = self.max_vertices * BAKE_FLOATS * 4 if self.bake_vbo is not None else 0
+        return self.vertex_space.capacity * VERTEX_STRIDE + self.index_space.capacity * 4 + bake
+
+    def used_bytes(self):
+        return self.vertex_space.used() * VERTEX_STRIDE + self.index_space.used() * 4
+
+    def release(self, v_off, n_verts, i_off, n_indices):
+        # repor o bake por defeito pra proxima malha neste intervalo nao herdar luz
+        if self.bake_vbo is not None:
+            self.set_bake(v_off, np.tile(BAKE_DEFAULT, n_verts))
+        self.vertex_space.free(v_off, n_verts)
+        self.index_space.free(i_off, n_indices)
+
+    def destroy(self):
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(1, [self.vbo])
+        glDeleteBuffers(1, [self.ebo])
+        if self.bake_vbo is not None: glDeleteBuffers(1, [self.bake_vbo])
+
+class ArenaMesh:
+    # handle pra uma malha dentro de um pool tipo so offsets e contagens
+    # tem a mesma interface do Mesh count texture id draw destroy
+    def __init__(self, arena, pool, v_off, v_count, i_off, i_count, texture_id=None, aabb=None):
+        self.arena = arena
+        self.pool = pool
+        self.v_off = v_off
+        self.v_count = v_count
+        self.first_index = i_off
+        self.count = i_count
+        self.texture_id = texture_id
+        self.aabb = aabb
+
+    def set_bake(self, data):
+        self.pool.set_bake(self.v_off, data)
+
+    def replace(self, vertices, indices):
+        # devolver o intervalo antigo e subalocar de novo o handle e o mesmo pra quem o guarda
+        # o intervalo libertado ainda pode ser o escolhido se a malha nova couber
+        self.destroy()
+        fresh = self.arena.allocate(vertices, indices, self.texture_id)
+        self.pool = fresh.pool
+        self.v_off, self.v_count = fresh.v_off, fresh.v_count
+        self.first_index, self.count = fresh.first_index, fresh.count
+        self.aabb = fresh.aabb
+
+    def gpu_bytes(self):
+        # so a fatia do pool que esta malha ocupa
+        if self.pool is None: return 0
+        bake = self.v_count * BAKE_FLOATS * 4 if self.pool.bake_vbo is not None else 0
+        return self.v_count * VERTEX_STRIDE + self.count * 4 + bake
+
+    def draw(self, shader):
+        # malhas seguidas do mesmo pool partilham o bind do vao
+        shader.bind_vao(self.pool.vao)
+        glDrawElements(GL_TRIANGLES, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(self.first_index * 4))
+
+    def destroy(self):
+        if self.pool is None: return
+        self.pool.release(self.v_off, self.v_count, self.first_index, self.count)
+        self.pool = None
+
+class MeshGroup:
+    # varias malhas do mesmo arena desenhadas numa so chamada multi draw
+    def __init__(self, arena, meshes, texture_id=None):
+        self.arena = arena
+        self.meshes = list(meshes)
+        self.texture_id = texture_id
+        self.refresh()
+
+    def refresh(self):
+        # contagem e aabb outra vez depois de alguma das malhas mudar
+        self.count = sum(m.count for m in self.meshes)
+        self.bvh = None # a bvh do picking era das malhas antigas
+        self.aabb = (np.min([m.aabb[0] for m in self.meshes], axis=0),
+                     np.max([m.aabb[1] for m in self.meshes], axis=0))
+
+    def gpu_bytes(self):
+        return sum(m.gpu_bytes() for m in self.meshes)
+
+    def draw(self, shader):
+        self.arena.draw_multi(self.meshes, shader)
+
+    def destroy(self):
+        for m in self.meshes: m.destroy()
+        self.meshes = []
+
+class MeshArena:
+    def __init__(self, pool_vertices=POOL_VERTICES, pool_indices=POOL_INDICES):
+        self.pool_vertices = pool_vertices
+        self.pool_indices = pool_indices
+        self.pools = []
+
+        # indirect so existe a partir do 4.3 senao usamos glMultiDrawElements
+        major = glGetIntegerv(GL_MAJOR_VERSION)
+        minor = glGetIntegerv(GL_MINOR_VERSION)
+        self.has_indirect = (int(major), int(minor)) >= (4, 3) and bool(glMultiDrawElementsIndirect)
+        self.indirect_buffer = glGenBuffers(1) if self.has_indirect else None
+
+    def allocate(self, vertices, indices, texture_id=None):
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        n_verts = vertices.size // VERTEX_FLOATS
+        n_indices = indices.size
+
+        for pool in self.pools:
+            offs = pool.try_alloc(n_verts, n_indices)
+            if offs is not None: break
+        else:
+            # pool novo grande o suficiente mesmo pra malhas enormes
+            pool = ArenaPool(max(self.pool_vertices, n_verts), max(self.pool_indices, n_indices))
+            self.pools.append(pool)
+            offs = pool.try_alloc(n_verts, n_indices)
+
+        v_off, i_off = offs
+        pool.upload(v_off, i_off, vertices, indices)
+        return ArenaMesh(self, pool, v_off, n_verts, i_off, n_indices, texture_id, vertex_bounds(vertices))
+
+    def group(self, meshes, texture_id=None):
+        return MeshGroup(self, meshes, texture_id)
+
+    def build_commands(self, meshes):
+        # buffer de comandos tipo DrawElementsIndirectCommand
+        # count instance count first index base vertex base instance
+        cmds = np.zeros((len(meshes), 5), dtype=np.uint32)
+        cmds[:, 0] = [m.count for m in meshes]
+        cmds[:, 1] = 1
+        cmds[:, 2] = [m.first_index for m in meshes]
+        return cmds
+
+    def draw_multi(self, meshes, shader):
+        # agrupar por pool pois cada pool tem o seu vao
+        by_pool = {}
+        for m in meshes:
+            if m.pool is not None: by_pool.setdefault(m.pool, []).append(m)
+
+        for pool, group in by_pool.items():
+            cmds = self.build_commands(group)
+            shader.bind_vao(pool.vao)
+            if self.has_indirect:
+                glBindBuffer(GL_DRAW_INDIRECT_BUFFER, self.indirect_buffer)
+                glBufferData(GL_DRAW_INDIRECT_BUFFER, cmds.nbytes, cmds, GL_STREAM_DRAW)
+                glMultiDrawElementsIndirect(GL_TRIANGLES, GL_UNSIGNED_INT, ctypes.c_void_p(0), len(group), 0)
+                glBindBuffer(GL_DRAW_INDIRECT_BUFFER, 0)
+            else:
+                counts = np.ascontiguousarray(cmds[:, 0], dtype=np.int32)
+                offsets = (cmds[:, 2].astype(np.uintp) * 4)
+                ptrs = (ctypes.c_void_p * len(group)).from_buffer(offsets)
+                glMultiDrawElements(GL_TRIANGLES, counts, GL_UNSIGNED_INT, ptrs, len(group))
+
+    def stats(self):
+        # ocupacao de cada pool em vertices e indices
+        return [{
+            "vertices_used": p.vertex_space.used(), "vertices_capacity": p.vertex_space.capacity,
+            "indices_used": p.index_space.used(), "indices_capacity": p.index_space.capacity,
+            "largest_free_vertices": p.vertex_space.largest(),
+        } for p in self.pools]
+
+    def destroy(self):
+        for p in self.pools: p.destroy()
+        self.pools = []
+        if self.indirect_buffer is not None:
+            glDeleteBuffers(1, [self.indirect_buffer])
@@ -0,0 +1,210 @@
+
+import os
+import sys
+import time
+import hashlib
+import numpy as np
+import multiprocessing
+from multiprocessing import cpu_count
+
+from picking import MeshBVH
+
+# bake offline de oclusao ambiente e luz indireta por vertice pra geometria parada da garagem
+# raytracer de cpu com a bvh do picking e pacotes de raios divididos por processos
+# o resultado vai pra uma cache em models/.cache com chave no hash da malha e da cena
+# em runtime so se carrega o ficheiro pro atributo 3 sem custo nenhum por frame
+
+BAKE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", ".cache")
+
+SAMPLES = 64            # raios por vertice no hemisferio
+AO_DISTANCE = 3.0       # so conta como oclusao o que estiver mais perto que isto
+AO_STRENGTH = 0.7       # vertices nos cantos das paredes grandes ficavam pretos com 1
+BOUNCE_DISTANCE = 60.0  # alcance dos raios da luz indireta
+ALBEDO = 0.6            # refletancia media das paredes pro ressalto
+SUN_COLOR = (1.0, 0.95, 0.8)
+CHUNK = 128             # vertices por tarefa
+
+def hemisphere_samples(n, seed=21):
+    # direcoes com distribuicao cosseno fixas pra o bake ser deterministico
+    rng = np.random.default_rng(seed)
+    u1, u2 = rng.random(n), rng.random(n)
+    r = np.sqrt(u1)
+    phi = 2.0 * np.pi * u2
+    return np.stack([r * np.cos(phi), r * np.sin(phi), np.sqrt(1.0 - u1)], axis=1)
+
+def tangent_frames(normals):
+    # base ortonormal por vertice com a normal no eixo z
+    n = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    helper = np.where(np.abs(n[:, 1:2]) < 0.9, [[0.0, 1.0, 0.0]], [[1.0, 0.0, 0.0]])
+    t = np.cross(helper, n)
+    t /= np.linalg.norm(t, axis=1, keepdims=True)
+    b = np.cross(n, t)
+    return t, b, n
+
+_worker = {}
+
+def _init_worker(tris, sun_dir):
+    # cada processo constroi a sua bvh uma vez
+    _worker["bvh"] = MeshBVH(tris)
+    e1 = tris[:, 1] - tris[:, 0]
+    e2 = tris[:, 2] - tris[:, 0]
+    n = np.cross(e1, e2)
+    _worker["tri_normals"] = n / np.maximum(np.linalg.norm(n, axis=1, keepdims=True), 1e-12)
+    _worker["sun_dir"] = np.asarray(sun_dir, dtype=np.float64)
+    _worker["samples"] = hemisphere_samples(SAMPLES)
+
+def _bake_chunk(args):
+    positions, normals = args
+    bvh = _worker["bvh"]
+    tri_normals = _worker["tri_normals"]
+    sun_dir = _worker["sun_dir"]
+    samples = _worker["samples"]
+
+    t, b, n = tangent_frames(normals.astype(np.float64))
+    # raios N K 3 rodados pra o hemisferio de cada vertice
+    dirs = samples[None, :, 0:1] * t[:, None] + samples[None, :, 1:2] * b[:, None] + samples[None, :, 2:3] * n[:, None]
+    origins = np.repeat(positions.astype(np.float64) + n * 1e-3, SAMPLES, axis=0)
+    dirs = dirs.reshape(-1, 3)
+    hit_t, hit_tri = bvh.intersect_many(origins, dirs, BOUNCE_DISTANCE)
+
+    occluded = (hit_t <= AO_DISTANCE).reshape(-1, SAMPLES).mean(axis=1)
+    ao = 1.0 - AO_STRENGTH * occluded
+
+    # um ressalto do sol tipo ponto acertado iluminado se vir o sol
+    hit = np.isfinite(hit_t)
+    bounce = np.zeros(len(hit_t))
+    if hit.any():
+        p = origins[hit] + dirs[hit] * hit_t[hit][:, None]
+        hn = tri_normals[hit_tri[hit]]
+        # paredes tem duas faces a normal vira pro lado de onde veio o raio
+        hn = np.where((np.sum(hn * dirs[hit], axis=1) > 0)[:, None], -hn, hn)
+        lambert = np.maximum(hn @ sun_dir, 0.0)
+        lit = lambert > 0
+        shadow_t, _ = bvh.intersect_many(p[lit] + hn[lit] * 1e-3, np.broadcast_to(sun_dir, (int(lit.sum()), 3)))
+        visible = np.zeros(len(lambert), dtype=bool)
+        visible[lit] = ~np.isfinite(shadow_t)
+        bounce[hit] = ALBEDO * lambert * visible
+    indirect = bounce.reshape(-1, SAMPLES).mean(axis=1)[:, None] * np.asarray(SUN_COLOR)
+
+    out = np.empty((len(positions), 4), dtype=np.float32)
+    out[:, :3] = indirect
+    out[:, 3] = ao
+    return out
+
+def bake_vertices(positions, normals, tris, sun_dir, processes=None):
+    # divide os vertices em blocos e distribui pelos processos
+    chunks = [(positions[i:i + CHUNK], normals[i:i + CHUNK]) for i in range(0, len(positions), CHUNK)]
+    if not chunks: return np.zeros((0, 4), dtype=np.float32)
+    processes = processes or cpu_count()
+    if processes <= 1 or len(chunks) == 1:
+        _init_worker(tris, sun_dir)
+        return np.concatenate([_bake_chunk(c) for c in chunks])
+    # spawn e nao fork o world ja tem threads a correr tipo streamer e hot reload e um contexto gl
+    # um fork com threads vivas pode deixar o filho preso num lock que ninguem vai largar
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(min(processes, len(chunks)), initializer=_init_worker, initargs=(tris, sun_dir)) as pool:
+        return np.concatenate(pool.map(_bake_chunk, chunks))
+
+def leaf_meshes(queue):
+    # malhas individuais com a matriz world os grupos do arena sao abertos nos membros
+    out = []
+    for world, node in queue:
+        for mesh in getattr(node.mesh, "meshes", [node.mesh]):
+            if getattr(mesh, "positions", None) is not None:
+                out.append((world, mesh))
+    return out
+
+def world_geometry(world, mesh):
+    pos = mesh.positions @ world[:3, :3].T + world[:3, 3]
+    N = np.linalg.inv(world[:3, :3]).T
+    nrm = mesh.normals @ N.T
+    return pos.astype(np.float32), nrm.astype(np.float32)
+
+def scene_key(tris, sun_dir):
+    h = hashlib.sha1()
+    h.update(f"v{BAKE_VERSION} {SAMPLES} {AO_DISTANCE} {AO_STRENGTH} {BOUNCE_DISTANCE} {ALBEDO} {SUN_COLOR}".encode())
+    h.update(np.ascontiguousarray(tris, dtype=np.float32).tobytes())
+    h.update(np.asarray(sun_dir, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+def mesh_key(pos, nrm, scene):
+    h = hashlib.sha1(scene.encode())
+    h.update(pos.tobytes())
+    h.update(nrm.tobytes())
+    return h.hexdigest()
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key + ".npy")
+
+def _triangles(geometry, leaves):
+    return np.concatenate([pos[m.indices[:len(m.indices) // 3 * 3]].reshape(-1, 3, 3)
+                           for (pos, _), (_, m) in zip(geometry, leaves)])
+
+def queue_triangles(queue):
+    # triangulos em world de uma queue pra servirem de oclusores num bake so de parte da cena
+    leaves = leaf_meshes(queue)
+    if not leaves: return np.zeros((0, 3, 3), dtype=np.float32)
+    return _triangles([world_geometry(w, m) for w, m in leaves], leaves)
+
+def bake_static(queue, sun_pos, processes=None, verbose=True, occluders=None):
+    # queue tipo world e no de tudo o que nunca se mexe ocluem-se uns aos outros
+    # occluders sao os triangulos da cena toda quando a queue e so uma parte tipo um no recarregado
+    # devolve quantas malhas vieram da cache e quantas foram calculadas
+    leaves = leaf_meshes(queue)
+    if not leaves: return 0, 0
+    geometry = [world_geometry(w, m) for w, m in leaves]
+    tris = _triangles(geometry, leaves) if occluders is None else occluders
+
+    # sol longe o suficiente pra tratar como direcional a partir do centro da cena
+    center = (tris.reshape(-1, 3).min(axis=0) + tris.reshape(-1, 3).max(axis=0)) * 0.5
+    sun_dir = np.asarray(sun_pos, dtype=np.float64) - center
+    sun_dir /= np.linalg.norm(sun_dir)
+
+    scene = scene_key(tris, sun_dir)
+    keys = [mesh_key(pos, nrm, scene) for pos, nrm in geometry]
+    results = {}
+    missing = []
+    for i, key in enumerate(keys):
+        path = _cache_path(key)
+        if os.path.isfile(path):
+            try:
+                results[i] = np.load(path)
+                continue
+            except (OSError, ValueError):
+                pass
+        missing.append(i)
+
+    if missing:
+        start = time.perf_counter()
+        positions = np.concatenate([geometry[i][0] for i in missing])
+        normals = np.concatenate([geometry[i][1] for i in missing])
+        baked = bake_vertices(positions, normals, tris, sun_dir, processes)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        offset = 0
+        for i in missing:
+            n = len(geometry[i][0])
+            results[i] = baked[offset:offset + n]
+            offset += n
+            np.save(_cache_path(keys[i]), results[i])
+        if verbose:
+            print(f"Bake de {len(positions)} vertices em {time.perf_counter() - start:.1f} s")
+
+    for i, (_, mesh) in enumerate(leaves):
+        mesh.set_bake(results[i])
+    return len(leaves) - len(missing), len(missing)
+
+def clear_cache():
+    if not os.path.isdir(CACHE_DIR): return 0
+    removed = 0
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".npy"):
+            os.remove(os.path.join(CACHE_DIR, name))
+            removed += 1
+    return removed
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["clear"]:
+        print(f"{clear_cache()} ficheiros removidos de {CACHE_DIR}")
+    else:
+        print("uso: python bake.py clear")
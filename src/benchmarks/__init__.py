@@ -0,0 +1,3 @@
+
+# benchmarks de cpu pra loaders transformacoes geracao de malhas e travessia da cena
+# correr a partir da pasta src com python -m benchmarks --out resultados.json
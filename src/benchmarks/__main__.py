@@ -0,0 +1,322 @@
+
+import os
+import sys
+import math
+import glob
+import argparse
+
+# o backend falso tem de entrar antes de qualquer modulo que faca import do OpenGL
+from benchmarks import mockgl
+mockgl.install()
+
+import numpy as np
+from benchmarks.harness import BenchResults, compare
+from benchmarks.scenes import make_scene, overview_camera
+
+SRC_DIR = mockgl.SRC_DIR
+MODELS_DIR = os.path.join(SRC_DIR, "..", "models")
+
+def bench_loaders(r):
+    from obj_loader import OBJModel
+    for path in sorted(glob.glob(os.path.join(MODELS_DIR, "*.obj"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        size_kb = os.path.getsize(path) // 1024
+        r.bench(f"obj.parse.{name}", lambda: OBJModel(path), repeat=3, group="loaders", kb=size_kb)
+        model = OBJModel(path)
+        def build():
+            model.batches = []
+            model.build()
+        r.bench(f"obj.build.{name}", build, repeat=3, group="loaders", kb=size_kb)
+
+def bench_bundle(r):
+    # todos os modelos a partir dos obj soltos contra o bundle mapeado
+    import tempfile
+    from obj_loader import OBJModel
+    from bundle import Bundle, build_bundle
+    paths = sorted(glob.glob(os.path.join(MODELS_DIR, "*.obj")))
+    def load_loose():
+        for p in paths: OBJModel(p).build()
+    tmp = os.path.join(tempfile.gettempdir(), "bench_assets.bundle")
+    build_bundle(MODELS_DIR, tmp, verbose=False)
+    def load_bundle():
+        b = Bundle(tmp)
+        for p in paths: b.model(p).build()
+    r.bench("bundle.load_all.loose", load_loose, repeat=3, group="loaders", models=len(paths))
+    r.bench("bundle.load_all.mmap", load_bundle, repeat=3, group="loaders", models=len(paths))
+
+def bench_glb(r):
+    # as pecas do carro como o World carregava os obj um a um contra um so glb com a hierarquia
+    import tempfile
+    from obj_loader import OBJModel
+    from glb import GLBModel
+    from benchmarks.glb_fixture import write_car_glb
+    tmp = os.path.join(tempfile.gettempdir(), "bench_carro.glb")
+    names = list(write_car_glb(tmp))
+    def load_objs():
+        for n in names: OBJModel(os.path.join(MODELS_DIR, n + ".obj")).build()
+    def load_glb():
+        model = GLBModel(tmp)
+        model.build()
+        model.to_node("Car")
+    r.bench("glb.car.obj", load_objs, repeat=3, group="loaders", parts=len(names))
+    r.bench("glb.car.glb", load_glb, repeat=5, group="loaders", parts=len(names))
+
+def bench_hotreload(r):
+    # o que fica na thread do gl quando um obj muda contra carregar tudo de novo
+    from obj_loader import OBJModel
+    from arena import MeshArena
+    from hotreload import AssetReloader
+    from world import load_obj_node
+    path = os.path.join(MODELS_DIR, "racing_seat_completed.obj")
+    arena = MeshArena()
+    assets = AssetReloader()
+    load_obj_node(path, "Seat", arena=arena, assets=assets)
+    model = OBJModel(path, parse_only=True)
+    batches = model.batch_arrays()
+    r.bench("hotreload.parse.racing_seat", lambda: OBJModel(path, parse_only=True).batch_arrays(), repeat=3, group="hotreload")
+    r.bench("hotreload.swap.racing_seat", lambda: assets._apply(os.path.abspath(path), model, batches, 0.0),
+            repeat=5, group="hotreload", vertices=sum(len(v) // 8 for _, v, _ in batches))
+
+# arranque do World num processo novo pra o pico de rss ser so dele
+# keep emula o antigo com as listas do parse vivas ate ao fim do __init__
+STARTUP_SCRIPT = '''
+import sys
+from benchmarks import mockgl
+mockgl.install()
+import memory
+from obj_loader import OBJModel
+if sys.argv[1] == "keep": OBJModel.release_geometry = lambda self: None
+from world import World
+World(keep_mesh_geometry=sys.argv[1] != "mesh")
+print(memory.peak_rss_bytes())
+'''
+
+def bench_memory(r):
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    for mode in ("keep", "release", "mesh"):
+        peaks = []
+        def startup():
+            out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, mode], cwd=SRC_DIR, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            peaks.append(int(out.split()[-1]))
+        entry = r.bench(f"memory.startup.{mode}", startup, repeat=1, group="memory")
+        if entry is None: continue
+        entry["params"]["peak_rss_mb"] = round(min(peaks) / (1 << 20), 1)
+        print(f"{'':<50} pico de rss {entry['params']['peak_rss_mb']} MB")
+
+def bench_mirrors(r):
+    # frame inteiro sem retrovisores e com eles de n em n frames
+    # sem o on_move pra o carro parado contra uma parede nao esconder o custo
+    # a diferenca pro every0 e o custo dos retrovisores no orcamento do frame
+    from world import World
+    for every in (0, 1, 2, 4):
+        world = World(mirror_every=every)
+        world.setup_gl_state()
+        world.apply_action('w', True)
+        for view in world.views.views: view.target.on_move = False
+        clock = [0.0]
+        def frame():
+            clock[0] += 1.0 / 60.0
+            world.update(1.0 / 60.0, clock[0])
+            world.render(1280, 720)
+        r.bench(f"mirrors.frame.every{every}", frame, number=20, repeat=3, group="mirrors",
+                views=len(world.views.views))
+
+def bench_animation(r):
+    # n pecas com um canal cada contra o loop por peca com dicionarios e matrizes 4x4 a mao
+    # a mexer todas tipo rodas a rolar e paradas tipo portas fechadas que nao escrevem nada
+    from animation import Animator, SPIN
+    from scene import Node
+    from transform import translate, rotate
+    rng = np.random.default_rng(0)
+    for n in (8, 1000):
+        pivots = rng.normal(size=(n, 3)).astype(np.float32)
+        nodes = [Node(f"peca{i}") for i in range(n)]
+        states = {i: {'open': True, 'angle': 0.0} for i in range(n)}
+        def legacy():
+            for i, state in states.items():
+                target = 45.0 if state['open'] else 0.0
+                state['angle'] += (target - state['angle']) * 2.0 * (1.0 / 60.0)
+                p = pivots[i]
+                nodes[i].local = translate(p[0], p[1], p[2]) @ rotate(math.radians(state['angle']), (0, 1, 0)) @ \
+                                 translate(-p[0], -p[1], -p[2])
+        number = 200 if n == 8 else 5
+        r.bench(f"animation.loop.legacy.{n}", legacy, number=number, group="animation", n=n)
+        for mode in ("moving", "parked"):
+            anim = Animator()
+            for i in range(n):
+                if mode == "moving": c = anim.add(f"peca{i}", rate=1.0, mode=SPIN)
+                else: c = anim.add(f"peca{i}", value=45.0, rate=2.0)
+                anim.bind(nodes[i], [(c, (0, 1, 0), math.radians(1.0))], pivots[i])
+            anim.apply()
+            def frame():
+                anim.step(1.0 / 60.0)
+                anim.apply(0.5)
+            r.bench(f"animation.animator.{mode}.{n}", frame, number=number * 10, group="animation", n=n)
+
+def bench_transforms(r):
+    from transform import translate, rotate, scale, lookAt, normal_matrix
+    M = translate(1, 2, 3) @ rotate(0.3, (0, 1, 0)) @ scale(1.3)
+    r.bench("transform.translate", lambda: translate(1.0, 2.0, 3.0), number=10000, group="transforms")
+    r.bench("transform.rotate", lambda: rotate(0.7, (0.3, 1.0, 0.2)), number=10000, group="transforms")
+    r.bench("transform.scale", lambda: scale(1.3), number=10000, group="transforms")
+    r.bench("transform.lookAt", lambda: lookAt((1.0, 5.0, 10.0), (0.0, 0.0, 0.0), (0.0, 1.0, 0.0)), number=5000, group="transforms")
+    r.bench("transform.normal_matrix", lambda: normal_matrix(M), number=10000, group="transforms")
+    bench_transform_batches(r)
+
+def bench_transform_batches(r):
+    # versoes em lote contra as funcoes originais no mesmo trabalho
+    from transform import translate, rotate, lookAt_into, rotate_batch, pivot_rotate_batch
+    rng = np.random.default_rng(0)
+    for n in (4, 1000):
+        pivots = rng.normal(size=(n, 3)).astype(np.float32)
+        angles = rng.uniform(-3.0, 3.0, n).astype(np.float32)
+        out = np.empty((n, 4, 4), dtype=np.float32)
+        def legacy_pivots():
+            for i in range(n):
+                p = pivots[i]
+                translate(p[0], p[1], p[2]) @ rotate(float(angles[i]), (0, 1, 0)) @ translate(-p[0], -p[1], -p[2])
+        def legacy_rotate():
+            for i in range(n): rotate(float(angles[i]), (0, 1, 0))
+        number = 200 if n == 4 else 5
+        r.bench(f"transform.pivot_chain.legacy.{n}", legacy_pivots, number=number, group="transforms", n=n)
+        r.bench(f"transform.pivot_rotate_batch.{n}", lambda: pivot_rotate_batch(pivots, angles, (0, 1, 0), out=out),
+                number=number * 10, group="transforms", n=n)
+        r.bench(f"transform.rotate.loop.{n}", legacy_rotate, number=number, group="transforms", n=n)
+        r.bench(f"transform.rotate_batch.{n}", lambda: rotate_batch(angles, (0, 1, 0), out=out),
+                number=number * 10, group="transforms", n=n)
+    view = np.eye(4, dtype=np.float32)
+    r.bench("transform.lookAt_into", lambda: lookAt_into((1.0, 5.0, 10.0), (0.0, 0.0, 0.0), (0.0, 1.0, 0.0), view),
+            number=5000, group="transforms")
+
+def bench_meshgen(r):
+    import meshgen
+    from benchmarks import legacy_meshgen
+    # os loops antigos ficam ao lado pra se ver o ganho na mesma corrida
+    r.bench("meshgen.legacy.grid.150x30", lambda: legacy_meshgen.grid(150, 30), repeat=5, group="meshgen", tiles=30)
+    r.bench("meshgen.legacy.sphere.64", lambda: legacy_meshgen.sphere(500.0, 64, 64), repeat=5, group="meshgen", stacks=64)
+    r.bench("meshgen.grid.150x30", lambda: meshgen.grid(150, 30), repeat=5, group="meshgen", tiles=30)
+    r.bench("meshgen.grid.100x100", lambda: meshgen.grid(100, 100), repeat=3, group="meshgen", tiles=100)
+    r.bench("meshgen.grid.1000x1000", lambda: meshgen.grid(1000, 1000), repeat=3, group="meshgen", tiles=1000)
+    r.bench("meshgen.sphere.32", lambda: meshgen.sphere(20.0, 32, 32), repeat=5, group="meshgen", stacks=32)
+    r.bench("meshgen.sphere.64", lambda: meshgen.sphere(500.0, 64, 64), repeat=5, group="meshgen", stacks=64)
+    r.bench("meshgen.sphere.512", lambda: meshgen.sphere(500.0, 512, 512), repeat=3, group="meshgen", stacks=512)
+    r.bench("meshgen.cube.seg64", lambda: meshgen.cube(1.0, 64), repeat=5, group="meshgen", segments=64)
+    r.bench("meshgen.cylinder.256", lambda: meshgen.cylinder(1.0, 2.0, 256, 64), repeat=5, group="meshgen", slices=256)
+
+def bench_textures(r):
+    # custo na thread principal no frame em que a textura e pedida
+    from scene import load_texture
+    from texstream import TextureStreamer
+    path = os.path.join(MODELS_DIR, "gold_carbody.jpg")
+    r.bench("textures.sync.gold_carbody", lambda: load_texture(path), repeat=3, group="textures")
+    streamer = TextureStreamer()
+    def request():
+        streamer.textures.clear()
+        streamer.request(path)
+        streamer.update()
+    r.bench("textures.stream.gold_carbody", request, repeat=3, group="textures")
+    streamer.flush()
+    streamer.destroy()
+
+def bench_traversal(r, world):
+    from scene import cull_queue, draw_queue, sort_queue
+    shader = world.shader
+    I = np.eye(4, dtype=np.float32)
+    sizes = [(1, 1), (4, 2), (16, 4), (64, 16)]
+    if r.quick: sizes = sizes[:2]
+    for n_cars, n_garages in sizes:
+        root = make_scene(world, n_cars, n_garages)
+        VP, _ = overview_camera(max(n_cars, n_garages))
+        queue = root.collect(I, [])
+        visible = cull_queue(queue, VP)
+        tag = f"{n_cars}c{n_garages}g"
+        params = dict(cars=n_cars, garages=n_garages, draws=len(queue), visible=len(visible))
+        r.bench(f"scene.collect.{tag}", lambda: root.collect(I, []), group="traversal", **params)
+        r.bench(f"scene.cull.{tag}", lambda: cull_queue(queue, VP), group="traversal", **params)
+        r.bench(f"scene.sort.{tag}", lambda: sort_queue(visible, shader.materials), group="traversal", **params)
+        r.bench(f"scene.submit.{tag}", lambda: draw_queue(shader, visible, VP), group="traversal", **params)
+        r.bench(f"scene.draw.{tag}", lambda: root.draw(shader, I, VP), group="traversal", **params)
+
+def bench_transparency(r, world):
+    # vidros de n carros pelo oit contra o blend pela ordem da arvore e contra ordenar por profundidade
+    # que era o que o blend precisava pra ficar certo
+    from scene import cull_queue, draw_queue
+    shader = world.shader
+    I = np.eye(4, dtype=np.float32)
+    for n_cars in ((1, 16) if r.quick else (1, 16, 64)):
+        root = make_scene(world, n_cars, 1)
+        VP, eye = overview_camera(n_cars)
+        eye = np.array(eye, dtype=np.float32)
+        transparent = [item for item in cull_queue(root.collect(I, []), VP) if item[1].material.alpha < 1.0]
+        def sorted_blend():
+            order = sorted(transparent, key=lambda item: -float(np.sum((item[0][:3, 3] - eye) ** 2)))
+            draw_queue(shader, order, VP)
+        params = dict(cars=n_cars, glass=len(transparent))
+        r.bench(f"transparency.blend.{n_cars}c", lambda: draw_queue(shader, transparent, VP), group="transparency", **params)
+        r.bench(f"transparency.sorted.{n_cars}c", sorted_blend, group="transparency", **params)
+        r.bench(f"transparency.oit.{n_cars}c", lambda: world.oit.draw(shader, transparent, VP, 1280, 720),
+                group="transparency", **params)
+
+def bench_picking(r):
+    # raios contra a malha do banco a maior do projeto mais a bvh de raiz
+    from obj_loader import OBJModel
+    from picking import MeshBVH, mesh_triangles
+    model = OBJModel(os.path.join(MODELS_DIR, "racing_seat_completed.obj"))
+    model.build()
+    tris = np.concatenate([mesh_triangles(b["mesh"]) for b in model.batches])
+    r.bench("picking.bvh_build.seat", lambda: MeshBVH(tris), repeat=3, group="picking", triangles=len(tris))
+    bvh = MeshBVH(tris)
+    rng = np.random.default_rng(0)
+    lo, hi = tris.reshape(-1, 3).min(axis=0), tris.reshape(-1, 3).max(axis=0)
+    rays = []
+    for _ in range(64):
+        o = (lo + hi) * 0.5 + rng.normal(size=3) * (hi - lo) * 2.0
+        d = lo + rng.random(3) * (hi - lo) - o
+        rays.append((o, d / np.linalg.norm(d)))
+    def cast_all():
+        for o, d in rays: bvh.intersect(o, d)
+    r.bench("picking.ray.seat", cast_all, number=5, group="picking", rays=len(rays), triangles=len(tris))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmarks de cpu sem gpu")
+    parser.add_argument("--out", default=None, help="gravar resultados em json")
+    parser.add_argument("--compare", default=None, help="json antigo pra comparar")
+    parser.add_argument("--filter", default=None, help="so benchmarks cujo nome contem isto")
+    parser.add_argument("--quick", action="store_true", help="menos repeticoes")
+    args = parser.parse_args(argv)
+
+    # caminhos dos modelos sao relativos a pasta src
+    os.chdir(SRC_DIR)
+    if SRC_DIR not in sys.path: sys.path.insert(0, SRC_DIR)
+
+    r = BenchResults(args.filter, args.quick)
+    bench_transforms(r)
+    bench_meshgen(r)
+    bench_loaders(r)
+    if r.wanted("picking."): bench_picking(r)
+    if r.wanted("textures."): bench_textures(r)
+    if r.wanted("bundle."): bench_bundle(r)
+    if r.wanted("glb."): bench_glb(r)
+    if r.wanted("hotreload."): bench_hotreload(r)
+    if r.wanted("memory."): bench_memory(r)
+    if r.wanted("mirrors."): bench_mirrors(r)
+    if r.wanted("animation."): bench_animation(r)
+
+    if r.wanted("scene.") or r.wanted("transparency."):
+        from world import World
+        world = World()
+        if r.wanted("scene."): bench_traversal(r, world)
+        if r.wanted("transparency."): bench_transparency(r, world)
+
+    if args.out:
+        r.save(args.out)
+        print(f"Resultados gravados em {args.out}")
+    if args.compare:
+        regressions = compare(args.compare, r.results)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+
+import os
+import json
+import numpy as np
+
+from glb import GLB_HEADER, CHUNK_HEADER, GLB_MAGIC, CHUNK_JSON, CHUNK_BIN
+
+# carro em glb montado a partir dos obj da pasta models pros benchmarks e pra paridade
+# nao ha export do carro.blend na arvore por isso faz-se um com a mesma forma de um export do blender
+# um no por peca com a origem no pivot vidros e retrovisores filhos das portas e texturas embebidas
+# interleaved poe posicao normal e uv num so bufferView com byteStride como alguns exportadores fazem
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "models")
+
+CAR_PARTS = ["carrocaria", "luz_frente", "luz_tras", "parabrisas", "vidro_atras",
+             "roda_frente_esquerda", "roda_frente_direita", "roda_tras_esquerda", "roda_tras_direita",
+             "porta_frente_esquerda", "porta_frente_direita", "porta_tras_esquerda", "porta_tras_direita"]
+
+# filho pro pai tipo como estariam ligados no blender
+CAR_CHILDREN = {
+    "vidro_porta_frente_esquerdo": "porta_frente_esquerda",
+    "vidro_porta_frente_direito": "porta_frente_direita",
+    "vidro_porta_tras_esquerdo": "porta_tras_esquerda",
+    "vidro_porta_tras_direito": "porta_tras_direita",
+    "retrovisor_fora_esquerda": "porta_frente_esquerda",
+    "retrovisor_fora_direita": "porta_frente_direita",
+}
+
+def part_pivot(name, lo, hi):
+    # mesma regra que o World usa pros obj rodas no centro portas na dobradica
+    center = (lo + hi) / 2.0
+    if name.startswith("porta_"):
+        x = lo[0] if "esquerda" in name else hi[0]
+        return np.array([x, center[1], lo[2]], dtype=np.float32)
+    return center.astype(np.float32)
+
+class _Writer:
+    def __init__(self):
+        self.bin = bytearray()
+        self.gltf = {"asset": {"version": "2.0", "generator": "glb_fixture"},
+                     "scene": 0, "scenes": [{"nodes": []}], "nodes": [], "meshes": [],
+                     "materials": [], "accessors": [], "bufferViews": [], "buffers": [],
+                     "textures": [], "images": []}
+        self.material_ids = {}
+        self.image_ids = {}
+
+    def view(self, data, stride=None, target=None):
+        pad = (-len(self.bin)) % 4
+        self.bin += b"\0" * pad
+        v = {"buffer": 0, "byteOffset": len(self.bin), "byteLength": len(data)}
+        if stride: v["byteStride"] = stride
+        if target: v["target"] = target
+        self.bin += data
+        self.gltf["bufferViews"].append(v)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def accessor(self, view, ctype, count, kind, offset=0, lo=None, hi=None):
+        a = {"bufferView": view, "componentType": ctype, "count": int(count), "type": kind}
+        if offset: a["byteOffset"] = offset
+        if lo is not None: a["min"], a["max"] = [float(x) for x in lo], [float(x) for x in hi]
+        self.gltf["accessors"].append(a)
+        return len(self.gltf["accessors"]) - 1
+
+    def image(self, path):
+        if path not in self.image_ids:
+            with open(path, "rb") as f: data = f.read()
+            mime = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+            self.gltf["images"].append({"bufferView": self.view(data), "mimeType": mime})
+            self.gltf["textures"].append({"source": len(self.gltf["images"]) - 1})
+            self.image_ids[path] = len(self.gltf["textures"]) - 1
+        return self.image_ids[path]
+
+    def material(self, mat_data):
+        tex = mat_data.get("texture_path")
+        if tex and not os.path.isfile(tex): tex = None
+        key = (mat_data.get("name"), tuple(mat_data["diffuse"]), tex)
+        if key not in self.material_ids:
+            pbr = {"baseColorFactor": list(map(float, mat_data["diffuse"])) + [1.0],
+                   "metallicFactor": 0.0, "roughnessFactor": 0.5}
+            if tex: pbr["baseColorTexture"] = {"index": self.image(tex)}
+            self.gltf["materials"].append({"name": mat_data.get("name") or "Material", "pbrMetallicRoughness": pbr})
+            self.material_ids[key] = len(self.gltf["materials"]) - 1
+        return self.material_ids[key]
+
+    def mesh(self, name, batches, offset, interleaved):
+        prims = []
+        for mat_data, vertices, indices in batches:
+            v = vertices.reshape(-1, 8).copy()
+            v[:, :3] -= offset
+            v[:, 7] = 1.0 - v[:, 7] # uv do gltf com o v a comecar em cima
+            n = len(v)
+            lo, hi = v[:, :3].min(axis=0), v[:, :3].max(axis=0)
+            if interleaved:
+                view = self.view(v.tobytes(), stride=32, target=34962)
+                attrs = {"POSITION": self.accessor(view, 5126, n, "VEC3", 0, lo, hi),
+                         "NORMAL": self.accessor(view, 5126, n, "VEC3", 12),
+                         "TEXCOORD_0": self.accessor(view, 5126, n, "VEC2", 24)}
+            else:
+                attrs = {"POSITION": self.accessor(self.view(np.ascontiguousarray(v[:, 0:3]).tobytes(), target=34962), 5126, n, "VEC3", 0, lo, hi),
+                         "NORMAL": self.accessor(self.view(np.ascontiguousarray(v[:, 3:6]).tobytes(), target=34962), 5126, n, "VEC3"),
+                         "TEXCOORD_0": self.accessor(self.view(np.ascontiguousarray(v[:, 6:8]).tobytes(), target=34962), 5126, n, "VEC2")}
+            # indices pequenos em uint16 como o blender faz quando cabem
+            idx = np.asarray(indices, dtype=np.uint16 if n < 65536 else np.uint32)
+            ind = self.accessor(self.view(idx.tobytes(), target=34963), 5123 if idx.dtype == np.uint16 else 5125, len(idx), "SCALAR")
+            prims.append({"attributes": attrs, "indices": ind, "material": self.material(mat_data)})
+        self.gltf["meshes"].append({"name": name, "primitives": prims})
+        return len(self.gltf["meshes"]) - 1
+
+    def node(self, name, translation, mesh=None):
+        n = {"name": name, "translation": [float(x) for x in translation]}
+        if mesh is not None: n["mesh"] = mesh
+        self.gltf["nodes"].append(n)
+        return len(self.gltf["nodes"]) - 1
+
+    def finish(self, path):
+        self.gltf["buffers"] = [{"byteLength": len(self.bin)}]
+        self.gltf = {k: v for k, v in self.gltf.items() if v != []}
+        raw = json.dumps(self.gltf, separators=(",", ":")).encode()
+        raw += b" " * ((-len(raw)) % 4)
+        self.bin += b"\0" * ((-len(self.bin)) % 4)
+        total = GLB_HEADER.size + 2 * CHUNK_HEADER.size + len(raw) + len(self.bin)
+        with open(path, "wb") as f:
+            f.write(GLB_HEADER.pack(GLB_MAGIC, 2, total))
+            f.write(CHUNK_HEADER.pack(len(raw), CHUNK_JSON)); f.write(raw)
+            f.write(CHUNK_HEADER.pack(len(self.bin), CHUNK_BIN)); f.write(self.bin)
+
+def write_car_glb(out_path, models_dir=MODELS_DIR, interleaved=False):
+    # devolve nome pra (pivot no espaco do carro, triangulos e batches do obj) pra comparar depois
+    from obj_loader import OBJModel
+    w = _Writer()
+    ids, pivots, expected = {}, {}, {}
+    for name in CAR_PARTS + list(CAR_CHILDREN):
+        model = OBJModel(os.path.join(models_dir, name + ".obj"), parse_only=True)
+        lo, hi = model.get_bounds()
+        pivot = part_pivot(name, np.asarray(lo, dtype=np.float32), np.asarray(hi, dtype=np.float32))
+        batches = model.batch_arrays()
+        mesh = w.mesh(name, batches, pivot, interleaved)
+        parent = CAR_CHILDREN.get(name)
+        ids[name] = w.node(name, pivot - pivots[parent] if parent else pivot, mesh)
+        if parent: w.gltf["nodes"][ids[parent]].setdefault("children", []).append(ids[name])
+        else: w.gltf["scenes"][0]["nodes"].append(ids[name])
+        pivots[name] = pivot
+        expected[name] = (pivot, model.triangles(), batches)
+    w.finish(out_path)
+    return expected
@@ -0,0 +1,74 @@
+
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+
+class BenchResults:
+    def __init__(self, name_filter=None, quick=False):
+        self.name_filter = name_filter
+        self.quick = quick
+        self.results = []
+
+    def wanted(self, name):
+        return not self.name_filter or self.name_filter in name
+
+    def bench(self, name, fn, number=1, repeat=5, group="misc", **params):
+        # tempo por chamada em ms o minimo e o mais estavel pra comparar commits
+        if not self.wanted(name): return None
+        if self.quick:
+            repeat = min(repeat, 2)
+            number = max(1, number // 10)
+        fn() # aquecer
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number): fn()
+            samples.append((time.perf_counter() - start) * 1000.0 / number)
+        entry = {
+            "name": name, "group": group, "params": params,
+            "number": number, "repeat": repeat,
+            "min_ms": min(samples),
+            "median_ms": statistics.median(samples),
+            "mean_ms": statistics.fmean(samples),
+            "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        }
+        self.results.append(entry)
+        print(f"{name:<50} {entry['min_ms']:10.4f} ms  (mediana {entry['median_ms']:.4f})")
+        return entry
+
+    def metadata(self):
+        try:
+            commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        import numpy
+        return {
+            "commit": commit,
+            "python": sys.version.split()[0],
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"meta": self.metadata(), "results": self.results}, f, indent=1)
+
+def compare(old_path, new_results, threshold=1.10):
+    # comparar com um json antigo e marcar regressoes acima do limite
+    with open(old_path) as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\n{'benchmark':<50} {'antes':>10} {'depois':>10} {'racio':>7}")
+    for r in new_results:
+        o = old.get(r["name"])
+        if o is None or o["min_ms"] <= 0: continue
+        ratio = r["min_ms"] / o["min_ms"]
+        flag = "  REGRESSAO" if ratio > threshold else ""
+        if flag: regressions += 1
+        print(f"{r['name']:<50} {o['min_ms']:10.4f} {r['min_ms']:10.4f} {ratio:7.2f}{flag}")
+    return regressions
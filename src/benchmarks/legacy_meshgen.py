@@ -0,0 +1,128 @@
+
+import math
+import numpy as np
+
+# geradores antigos com loops python copiados tal e qual do scene
+# ficam so como referencia pra paridade e pra comparar tempos com o meshgen
+# devolvem vertices e indices em vez de criar a malha
+
+def grid(size=100, tiles=20):
+    # Criar uma grelha de chao
+    # vertices: x, y, z, nx, ny, nz, u, v
+    verts = []
+    step = size / tiles
+    
+    # Vamos criar quads para cada tile
+    for i in range(tiles):
+        for j in range(tiles):
+            x0 = -size/2 + i*step
+            z0 = -size/2 + j*step
+            x1 = x0 + step
+            z1 = z0 + step
+            
+            u0 = i
+            v0 = j
+            u1 = i+1
+            v1 = j+1
+            
+            # normal e sempre pra cima tipo 0 1 0
+            # quad vertices 2 triangulos
+            
+            # triangulo 1
+            verts.extend([x0, 0, z0, 0, 1, 0, 0, 0])
+            verts.extend([x0, 0, z1, 0, 1, 0, 0, 1])
+            verts.extend([x1, 0, z0, 0, 1, 0, 1, 0])
+            
+            # triangulo 2
+            verts.extend([x1, 0, z0, 0, 1, 0, 1, 0])
+            verts.extend([x0, 0, z1, 0, 1, 0, 0, 1])
+            verts.extend([x1, 0, z1, 0, 1, 0, 1, 1])
+
+    vertices = np.array(verts, dtype=np.float32)
+    indices = np.arange(len(verts)//8, dtype=np.uint32)
+    
+    return vertices, indices
+
+def cube(size=1.0):
+    s = size * 0.5
+    # vertices x y z nx ny nz u v
+    # 6 faces vezes 4 verts igual 24 verts
+    verts = [
+        # Front
+        -s, -s,  s,  0, 0, 1,  0, 0,
+         s, -s,  s,  0, 0, 1,  1, 0,
+         s,  s,  s,  0, 0, 1,  1, 1,
+        -s,  s,  s,  0, 0, 1,  0, 1,
+        # Back
+         s, -s, -s,  0, 0,-1,  0, 0,
+        -s, -s, -s,  0, 0,-1,  1, 0,
+        -s,  s, -s,  0, 0,-1,  1, 1,
+         s,  s, -s,  0, 0,-1,  0, 1,
+        # Top
+        -s,  s,  s,  0, 1, 0,  0, 0,
+         s,  s,  s,  0, 1, 0,  1, 0,
+         s,  s, -s,  0, 1, 0,  1, 1,
+        -s,  s, -s,  0, 1, 0,  0, 1,
+        # Bottom
+        -s, -s, -s,  0,-1, 0,  0, 0,
+         s, -s, -s,  0,-1, 0,  1, 0,
+         s, -s,  s,  0,-1, 0,  1, 1,
+        -s, -s,  s,  0,-1, 0,  0, 1,
+        # Right
+         s, -s,  s,  1, 0, 0,  0, 0,
+         s, -s, -s,  1, 0, 0,  1, 0,
+         s,  s, -s,  1, 0, 0,  1, 1,
+         s,  s,  s,  1, 0, 0,  0, 1,
+        # Left
+        -s, -s, -s, -1, 0, 0,  0, 0,
+        -s, -s,  s, -1, 0, 0,  1, 0,
+        -s,  s,  s, -1, 0, 0,  1, 1,
+        -s,  s, -s, -1, 0, 0,  0, 1,
+    ]
+    
+    indices = [
+        0,1,2, 0,2,3,       # Front
+        4,5,6, 4,6,7,       # Back
+        8,9,10, 8,10,11,    # Top
+        12,13,14, 12,14,15, # Bottom
+        16,17,18, 16,18,19, # Right
+        20,21,22, 20,22,23  # Left
+    ]
+    
+    return np.array(verts, dtype=np.float32), np.array(indices, dtype=np.uint32)
+
+
+def sphere(radius=1.0, stacks=32, slices=32):
+    verts = []
+    indices = []
+
+    for i in range(stacks + 1):
+        phi = math.pi * i / stacks
+        for j in range(slices + 1):
+            theta = 2 * math.pi * j / slices
+            
+            x = radius * math.sin(phi) * math.cos(theta)
+            y = radius * math.cos(phi)
+            z = radius * math.sin(phi) * math.sin(theta)
+            
+            nx = x / radius
+            ny = y / radius
+            nz = z / radius
+            
+            u = j / slices
+            v = i / stacks
+            
+            verts.extend([x, y, z, nx, ny, nz, u, v])
+            
+    for i in range(stacks):
+        for j in range(slices):
+            first = (i * (slices + 1)) + j
+            second = first + slices + 1
+            
+            indices.extend([first, second, first + 1])
+            indices.extend([second, second + 1, first + 1])
+            
+    vertices = np.array(verts, dtype=np.float32)
+    indices_arr = np.array(indices, dtype=np.uint32)
+    
+    return vertices, indices_arr
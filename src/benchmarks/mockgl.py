@@ -0,0 +1,96 @@
+
+import os
+import re
+import ctypes
+import sys
+import types
+from collections import Counter
+
+# backend opengl falso pra correr os benchmarks de cpu sem gpu nem contexto
+# os nomes gl sao tirados do codigo fonte assim o import * dos modulos continua a funcionar
+# cada chamada so conta quantas vezes foi feita
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GL_NAME = re.compile(r"\b(gl[A-Z]\w*|GL_\w+)\b")
+
+calls = Counter()
+_next_id = [1]
+
+def _new_ids(n=1):
+    ids = list(range(_next_id[0], _next_id[0] + n))
+    _next_id[0] += n
+    return ids[0] if n == 1 else ids
+
+_mapped = []
+
+def _map_buffer(target, offset, length, access):
+    # memoria de verdade pra quem escreve no ponteiro tipo o streamer de texturas
+    buf = (ctypes.c_ubyte * length)()
+    _mapped.append(buf)
+    del _mapped[:-8]
+    return ctypes.addressof(buf)
+
+def _scan_names():
+    names = set()
+    for dirpath, _, files in os.walk(SRC_DIR):
+        for fname in files:
+            if not fname.endswith(".py"): continue
+            with open(os.path.join(dirpath, fname), errors="ignore") as f:
+                names.update(GL_NAME.findall(f.read()))
+    return names
+
+def _stub(name, result=None):
+    def fn(*args, **kwargs):
+        calls[name] += 1
+        return result(*args) if callable(result) else result
+    fn.__name__ = name
+    return fn
+
+def install():
+    if "OpenGL.GL" in sys.modules and getattr(sys.modules["OpenGL.GL"], "IS_MOCK", False):
+        return sys.modules["OpenGL.GL"]
+
+    gl = types.ModuleType("OpenGL.GL")
+    gl.IS_MOCK = True
+    names = _scan_names()
+
+    # constantes com valores unicos
+    for i, name in enumerate(sorted(n for n in names if n.startswith("GL_"))):
+        setattr(gl, name, 0x10000 + i)
+
+    special = {
+        "glGetProgramiv": 1,
+        "glGetShaderiv": 1,
+        "glGetUniformLocation": lambda *a: _new_ids(),
+        "glGetUniformBlockIndex": lambda *a: _new_ids(),
+        "glCreateProgram": lambda *a: _new_ids(),
+        "glCreateShader": lambda *a: _new_ids(),
+        "glGetIntegerv": lambda pname, *a: 3 if pname in (getattr(gl, "GL_MAJOR_VERSION", None), getattr(gl, "GL_MINOR_VERSION", None)) else 0,
+        "glCheckFramebufferStatus": lambda *a: getattr(gl, "GL_FRAMEBUFFER_COMPLETE", 0),
+        "glGetString": b"mock",
+        "glGetQueryObjectiv": 1,
+        "glGetQueryObjectui64v": 0,
+        "glFenceSync": lambda *a: _new_ids(),
+        "glClientWaitSync": lambda *a: getattr(gl, "GL_ALREADY_SIGNALED", 0),
+        "glReadPixels": lambda x, y, w, h, *a: bytes(w * h * 4),
+        "glMapBufferRange": _map_buffer,
+        "glGetProgramInfoLog": b"",
+        "glGetShaderInfoLog": b"",
+    }
+    for name in sorted(n for n in names if n.startswith("gl")):
+        if name in special: result = special[name]
+        elif name.startswith("glGen"): result = lambda n=1, *a: _new_ids(n)
+        else: result = None
+        setattr(gl, name, _stub(name, result))
+
+    gl.__all__ = [n for n in vars(gl) if n.startswith(("gl", "GL_"))]
+
+    pkg = types.ModuleType("OpenGL")
+    pkg.GL = gl
+    pkg.IS_MOCK = True
+    sys.modules["OpenGL"] = pkg
+    sys.modules["OpenGL.GL"] = gl
+    return gl
+
+def reset_counts():
+    calls.clear()
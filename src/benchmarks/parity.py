@@ -0,0 +1,221 @@
+
+import sys
+import numpy as np
+
+import meshgen
+from benchmarks import legacy_meshgen
+
+# paridade dos geradores vetorizados contra os loops antigos
+# a grelha antiga nao tinha indices por isso compara-se a sopa de triangulos expandida
+# os geradores sem versao antiga so passam por verificacoes de area e de sentido das faces
+# uso a partir de src tipo python -m benchmarks.parity
+
+def canonical(soup):
+    # rodar cada triangulo pra comecar no vertice menor sem mudar o sentido e ordenar os triangulos
+    # assim duas malhas com os mesmos triangulos noutra ordem dao o mesmo array
+    soup = np.round(np.asarray(soup, dtype=np.float64), 5)
+    keys = soup.reshape(len(soup), 3, -1)
+    first = np.array([min(range(3), key=lambda k: tuple(t[k])) for t in keys])
+    rolled = keys[np.arange(len(keys))[:, None], (first[:, None] + np.arange(3)) % 3]
+    flat = rolled.reshape(len(rolled), -1)
+    return flat[np.lexsort(flat.T[::-1])]
+
+def same_soup(a, b, ordered=True):
+    if a.shape != b.shape: return False
+    if ordered: return np.allclose(a, b, rtol=1e-6, atol=1e-4)
+    return np.allclose(canonical(a), canonical(b), atol=2e-5)
+
+def face_check(vertices, indices):
+    # normal geometrica de cada triangulo tem de apontar pro lado das normais dos vertices
+    # devolve a area total e quantos triangulos estao virados ao contrario
+    soup = meshgen.expand(vertices, indices).astype(np.float64)
+    n = np.cross(soup[:, 1, :3] - soup[:, 0, :3], soup[:, 2, :3] - soup[:, 0, :3])
+    area = 0.5 * np.linalg.norm(n, axis=1)
+    facing = np.einsum('ij,ij->i', n, soup[:, :, 3:6].sum(axis=1))
+    flipped = int(np.count_nonzero((facing <= 0) & (area > 1e-9)))
+    return float(area.sum()), flipped
+
+def check_grid(size, tiles):
+    old = meshgen.expand(*legacy_meshgen.grid(size, tiles))
+    vertices, indices = meshgen.grid(size, tiles)
+    new = meshgen.expand(vertices, indices)
+    # a antiga tinha uv de 0 a 1 em cada tile e a nova conta os tiles ao longo da grelha
+    # com GL_REPEAT e igual tipo tira-se a parte inteira do canto de cada triangulo
+    new[:, :, 6:8] -= np.floor(new[:, :, 6:8].min(axis=1, keepdims=True) + 1e-4)
+    ok = same_soup(old, new)
+    return ok, f"{len(old)} triangulos {len(vertices) // 8} vertices contra {len(old) * 3}"
+
+def check_sphere(radius, stacks, slices):
+    ov, oi = legacy_meshgen.sphere(radius, stacks, slices)
+    nv, ni = meshgen.sphere(radius, stacks, slices)
+    ok = ov.shape == nv.shape and np.allclose(ov, nv, rtol=1e-6, atol=1e-4) and np.array_equal(oi, ni)
+    return ok, f"{len(ni) // 3} triangulos"
+
+def check_cube(size):
+    old = meshgen.expand(*legacy_meshgen.cube(size))
+    new = meshgen.expand(*meshgen.cube(size))
+    return same_soup(old, new, ordered=False), f"{len(new)} triangulos"
+
+def check_subdivided_cube(size, segments):
+    vertices, indices = meshgen.cube(size, segments)
+    area, flipped = face_check(vertices, indices)
+    ok = flipped == 0 and abs(area - 6 * size * size) < 1e-3 * size * size
+    # com subdivisao as faces tem de ficar nos mesmos planos do cubo simples
+    v = vertices.reshape(-1, 8)
+    ok = ok and np.allclose(np.abs(v[:, :3] * v[:, 3:6]).sum(axis=1), size * 0.5, atol=1e-5)
+    return ok, f"{len(indices) // 3} triangulos area {area:.3f} invertidos {flipped}"
+
+def check_plane(width, depth, seg_x, seg_z):
+    vertices, indices = meshgen.plane(width, depth, seg_x, seg_z)
+    area, flipped = face_check(vertices, indices)
+    ok = flipped == 0 and abs(area - width * depth) < 1e-4 * width * depth
+    uv = vertices.reshape(-1, 8)[:, 6:8]
+    ok = ok and np.allclose(uv.min(axis=0), 0.0) and np.allclose(uv.max(axis=0), 1.0)
+    return ok, f"{len(indices) // 3} triangulos area {area:.3f} invertidos {flipped}"
+
+def check_cylinder(radius, height, slices, stacks):
+    vertices, indices = meshgen.cylinder(radius, height, slices, stacks)
+    area, flipped = face_check(vertices, indices)
+    # poligono inscrito tipo lado e tampas com o seno do angulo de cada fatia
+    side = slices * 2.0 * radius * np.sin(np.pi / slices) * height
+    caps = 2.0 * 0.5 * slices * radius * radius * np.sin(2.0 * np.pi / slices)
+    ok = flipped == 0 and abs(area - (side + caps)) < 1e-4 * (side + caps)
+    return ok, f"{len(indices) // 3} triangulos area {area:.3f} invertidos {flipped}"
+
+def check_glb(interleaved):
+    # carro em glb feito dos obj tem de dar os mesmos vertices triangulos e pivots que os obj
+    import os
+    import tempfile
+    from benchmarks import mockgl
+    mockgl.install()
+    from glb import GLBModel
+    from benchmarks.glb_fixture import write_car_glb, CAR_CHILDREN
+    path = os.path.join(tempfile.gettempdir(), f"parity_car_{int(interleaved)}.glb")
+    expected = write_car_glb(path, interleaved=interleaved)
+    model = GLBModel(path)
+    ok, tris = True, 0
+    for name, (pivot, old_tris, batches) in expected.items():
+        i = model.by_name[name]
+        ok = ok and np.allclose(model.world[i][:3, 3], pivot, atol=1e-5)
+        prims = model.gltf["meshes"][model.gltf["nodes"][i]["mesh"]]["primitives"]
+        for prim, (mat_data, vertices, indices) in zip(prims, batches):
+            new_v, new_i = model.primitive_arrays(prim)
+            old_v = vertices.reshape(-1, 8).copy()
+            old_v[:, :3] -= pivot
+            ok = ok and len(prims) == len(batches) and np.allclose(new_v.reshape(-1, 8), old_v, atol=1e-5)
+            ok = ok and np.array_equal(new_i, indices) and new_i.dtype == np.uint32
+            ok = ok and np.allclose(model.material(prim["material"]).diffuse, mat_data["diffuse"])
+        new_tris = model.triangles([i])
+        ok = ok and same_soup(old_tris.reshape(len(old_tris), -1), new_tris.reshape(len(new_tris), -1), ordered=False)
+        tris += len(new_tris)
+    # pecas filhas vem dentro da porta e ja nao sao entregues outra vez
+    door = model.part("porta_frente_esquerda")
+    inside = [c for c, p in CAR_CHILDREN.items() if p == "porta_frente_esquerda"]
+    ok = ok and len(door.triangles()) == sum(len(expected[n][1]) for n in ["porta_frente_esquerda"] + inside)
+    ok = ok and all(model.part(n).nested and not len(model.part(n).triangles()) for n in inside)
+    ok = ok and model.part("luz_tras") is not None and model.part("volante") is None
+    model.close()
+    return ok, f"{len(expected)} pecas {tris} triangulos"
+
+def check_resolution(target_ms, min_scale, max_scale):
+    # controlador contra uma gpu simulada custo fixo mais um custo por pixel vezes a carga da cena
+    # o tempo chega com 3 frames de atraso como as queries a carga sobe desce e fica impossivel
+    from benchmarks import mockgl
+    mockgl.install()
+    from resolution import ResolutionController
+    c = ResolutionController(target_ms, min_scale, max_scale)
+    rng = np.random.default_rng(21)
+    phases = [(1.0, 300), (1.6, 300), (0.4, 300), (4.0, 200), (1.0, 300)]
+    fixed, full = 3.0, 20.0
+    pending, ok, info = [], True, []
+    for load, n in phases:
+        times, scales = [], []
+        for _ in range(n):
+            ms = (fixed + full * c.scale * c.scale * load) * rng.normal(1.0, 0.03)
+            ok = ok and min_scale - 1e-9 <= c.scale <= max_scale + 1e-9
+            pending.append(ms)
+            times.append(ms)
+            scales.append(c.scale)
+            if len(pending) > 3: c.update(pending.pop(0))
+        # o fim de cada fase ja tem de ter assentado
+        ms, scale = float(np.mean(times[-100:])), float(np.mean(scales[-100:]))
+        reachable = fixed + full * load * min_scale ** 2 <= target_ms <= fixed + full * load * max_scale ** 2
+        if reachable: ok = ok and abs(ms - target_ms) <= 0.1 * target_ms
+        else: ok = ok and abs(scale - (min_scale if ms > target_ms else max_scale)) < 1e-6
+        info.append(f"{load:g}x {ms:.1f}ms s{scale:.2f}")
+    # depois da fase impossivel volta ao alvo depressa sem integral acumulado
+    ok = ok and abs(float(np.mean(times[30:60])) - target_ms) <= 0.15 * target_ms
+    return ok, " ".join(info)
+
+def oit_weight(a, depth):
+    # igual ao emit da shader da cena
+    z = 1.0 - depth * 0.9
+    return np.clip((np.minimum(1.0, a * 10.0) + 0.01) ** 3 * 1e8 * z ** 3, 1e-2, 3e3)
+
+def oit_composite(colors, alphas, depths, background):
+    # as equacoes do blend do oit em float16 como nos alvos rgba16f e r16f e depois a composicao
+    accum, revealage, weight = np.zeros(3, np.float16), np.float16(1.0), np.float16(0.0)
+    for c, a, d in zip(colors, alphas, depths):
+        w = oit_weight(a, d)
+        accum = (accum + np.float16(c * a * w)).astype(np.float16)
+        revealage = np.float16(revealage * (1.0 - a))
+        weight = np.float16(weight + a * w)
+    if revealage >= 1.0: return background
+    color = accum.astype(np.float64) / max(float(weight), 1e-5)
+    return color * (1.0 - float(revealage)) + background * float(revealage)
+
+def check_oit(n_layers, same_color, tolerance):
+    # vidros sobrepostos por qualquer ordem dao o mesmo pixel e ficam perto do resultado ordenado
+    rng = np.random.default_rng(n_layers)
+    worst_order = worst_sorted = 0.0
+    for _ in range(50):
+        colors = np.tile((0.2, 0.3, 0.4), (n_layers, 1)) if same_color else rng.uniform(0.0, 1.0, (n_layers, 3))
+        alphas = np.full(n_layers, 0.4) if same_color else rng.uniform(0.2, 0.6, n_layers)
+        depths = rng.uniform(0.9, 0.999, n_layers)
+        background = rng.uniform(0.0, 1.0, 3)
+        reference = oit_composite(colors, alphas, depths, background)
+        for _ in range(4):
+            order = rng.permutation(n_layers)
+            out = oit_composite(colors[order], alphas[order], depths[order], background)
+            worst_order = max(worst_order, float(np.abs(out - reference).max()))
+        # over de tras pra frente o que o blend antigo so dava com os vidros ordenados
+        exact = background.copy()
+        for i in np.argsort(-depths): exact = colors[i] * alphas[i] + exact * (1.0 - alphas[i])
+        worst_sorted = max(worst_sorted, float(np.abs(reference - exact).max()))
+    # a ordem so mexe no arredondamento do float16
+    ok = worst_order < 4e-3 and worst_sorted < tolerance
+    return ok, f"ordem {worst_order:.4f} vs ordenado {worst_sorted:.4f}"
+
+CHECKS = [
+    ("grid.150x30", lambda: check_grid(150, 30)),
+    ("grid.100x100", lambda: check_grid(100, 100)),
+    ("grid.7x3", lambda: check_grid(7.0, 3)),
+    ("sphere.20.32", lambda: check_sphere(20.0, 32, 32)),
+    ("sphere.500.64", lambda: check_sphere(500.0, 64, 64)),
+    ("sphere.1.5x7", lambda: check_sphere(1.0, 5, 7)),
+    ("cube.1", lambda: check_cube(1.0)),
+    ("cube.2.5", lambda: check_cube(2.5)),
+    ("cube.2.seg8", lambda: check_subdivided_cube(2.0, 8)),
+    ("plane.4x2.seg7x3", lambda: check_plane(4.0, 2.0, 7, 3)),
+    ("cylinder.32x4", lambda: check_cylinder(0.5, 3.0, 32, 4)),
+    ("glb.car", lambda: check_glb(False)),
+    ("glb.car.interleaved", lambda: check_glb(True)),
+    ("oit.glass.2", lambda: check_oit(2, True, 5e-3)),
+    ("oit.glass.24", lambda: check_oit(24, True, 5e-3)),
+    ("oit.mixed.6", lambda: check_oit(6, False, 0.25)),
+    ("resolution.16ms", lambda: check_resolution(16.7, 0.5, 1.0)),
+    ("resolution.8ms", lambda: check_resolution(8.0, 0.4, 1.0)),
+]
+
+def run(verbose=True):
+    failed = []
+    for name, fn in CHECKS:
+        ok, info = fn()
+        if verbose: print(f"{'ok' if ok else 'FALHOU':7s} {name:20s} {info}")
+        if not ok: failed.append(name)
+    return failed
+
+if __name__ == "__main__":
+    failed = run()
+    if failed: print(f"{len(failed)} verificacoes falharam: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,41 @@
+
+import copy
+import math
+import numpy as np
+from scene import Node
+from transform import translate, rotate, perspective, lookAt
+
+# geradores de cenas sinteticas que escalam o numero de carros e garagens
+# as malhas sao partilhadas so a arvore de nos e copiada tal como faria um jogo com instancias
+
+def clone_node(node):
+    c = copy.copy(node)
+    c.local = np.array(node.local, dtype=np.float32)
+    c.children = [clone_node(ch) for ch in node.children]
+    return c
+
+def make_scene(world, n_cars=1, n_garages=1, spacing=60.0):
+    root = Node("BenchRoot")
+    cols = max(1, int(math.ceil(math.sqrt(max(n_cars, n_garages)))))
+
+    for i in range(n_garages):
+        g = clone_node(world.garage_root)
+        g.local = translate((i % cols) * spacing, 0, -(i // cols) * spacing)
+        root.add(g)
+
+    for i in range(n_cars):
+        c = clone_node(world.car_ctrl.root)
+        c.local = translate((i % cols) * spacing + 10.0, 0.65, -(i // cols) * spacing + 5.0) @ \
+                  rotate(i * 0.7, (0, 1, 0))
+        root.add(c)
+    return root
+
+def overview_camera(n_items, spacing=60.0, aspect=16.0 / 9.0):
+    # camara alta a olhar pra grelha toda pra quase tudo passar no culling
+    cols = max(1, int(math.ceil(math.sqrt(n_items))))
+    extent = cols * spacing
+    center = (extent * 0.5, 0.0, -extent * 0.5)
+    eye = (center[0], extent * 1.2 + 20.0, center[2] + extent * 0.8 + 20.0)
+    P = perspective(60.0, aspect, 0.1, extent * 4.0 + 200.0)
+    V = lookAt(eye, center, (0, 1, 0))
+    return P @ V, eye
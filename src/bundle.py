@@ -0,0 +1,208 @@
+
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+import numpy as np
+from PIL import Image
+
+from obj_loader import OBJModel
+
+# pacote unico com todos os modelos e texturas da pasta models
+# cabecalho fixo depois os blobs alinhados e no fim o indice em json
+# em runtime o ficheiro e mapeado e os buffers saem de vistas numpy sobre o mmap sem copias
+# os vertices ja vem interleaved como o OBJModel os monta por isso nao ha parse nenhum no arranque
+# uso a partir de src tipo python bundle.py build e python bundle.py info
+
+MAGIC = b"CBND"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ") # magic versao offset e tamanho do indice
+ALIGN = 64                       # linha de cache chega pra os vertex fetch e pro memmove
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+DEFAULT_PATH = os.path.join(MODELS_DIR, "assets.bundle")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+class BundleWriter:
+    def __init__(self, f):
+        self.f = f
+        f.write(b"\0" * HEADER.size)
+
+    def blob(self, data):
+        # alinhar e escrever devolve offset e numero de bytes
+        pos = self.f.tell()
+        pad = (-pos) % ALIGN
+        if pad: self.f.write(b"\0" * pad)
+        offset = pos + pad
+        data = memoryview(np.ascontiguousarray(data)).cast("B")
+        self.f.write(data)
+        return [offset, data.nbytes]
+
+    def finish(self, toc):
+        raw = json.dumps(toc, separators=(",", ":")).encode()
+        toc_offset = self.blob(np.frombuffer(raw, dtype=np.uint8))[0]
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, toc_offset, len(raw)))
+
+def build_bundle(models_dir=MODELS_DIR, out_path=DEFAULT_PATH, max_texture=2048, verbose=True):
+    toc = {"models": {}, "textures": {}}
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        w = BundleWriter(f)
+        for name in sorted(os.listdir(models_dir)):
+            path = os.path.join(models_dir, name)
+            if not name.endswith(".obj"): continue
+            model = OBJModel(path, parse_only=True)
+            lo, hi = model.get_bounds()
+            batches = []
+            for mat_data, vertices, indices in model.batch_arrays():
+                tex = mat_data.get("texture_path")
+                batches.append({
+                    "material": {"name": mat_data.get("name"), "diffuse": list(mat_data["diffuse"]),
+                                 "texture": os.path.basename(tex) if tex and os.path.isfile(tex) else None},
+                    "vertices": w.blob(vertices),
+                    "indices": w.blob(indices),
+                })
+            toc["models"][name] = {"source": _source_stamp(path),
+                                   "bounds": [list(map(float, lo)), list(map(float, hi))],
+                                   "batches": batches}
+            if verbose: print(f"  {name}: {len(batches)} batches")
+
+        for name in sorted(os.listdir(models_dir)):
+            path = os.path.join(models_dir, name)
+            if not name.lower().endswith(IMAGE_EXTS): continue
+            try:
+                img = Image.open(path)
+                img = img.transpose(Image.FLIP_TOP_BOTTOM).convert("RGBA")
+            except Exception as e:
+                print(f"Texture error {path}: {e}")
+                continue
+            # pixeis ja na ordem que o glTexSubImage2D quer so falta o memmove pro pbo
+            if max_texture and max(img.size) > max_texture:
+                k = max_texture / max(img.size)
+                img = img.resize((max(1, int(img.width * k)), max(1, int(img.height * k))), Image.BILINEAR)
+            toc["textures"][name] = {"source": _source_stamp(path), "size": list(img.size),
+                                     "pixels": w.blob(np.frombuffer(img.tobytes(), dtype=np.uint8))}
+            if verbose: print(f"  {name}: {img.width}x{img.height}")
+        w.finish(toc)
+    os.replace(tmp_path, out_path)
+    return toc
+
+class BundleModel(OBJModel):
+    # mesma interface que o OBJModel pro load_obj_node e pra colisao mas com os arrays do bundle
+    def __init__(self, bundle, entry, textures=None):
+        self.bundle = bundle
+        self.entry = entry
+        self.textures = textures
+        self.parse_only = False
+        self.batches = []
+        self.bounds = tuple(np.array(b, dtype=np.float32) for b in entry["bounds"])
+
+    def get_center(self):
+        return (self.bounds[0] + self.bounds[1]) / 2.0
+
+    def get_bounds(self):
+        return self.bounds
+
+    def batch_arrays(self):
+        out = []
+        for b in self.entry["batches"]:
+            m = b["material"]
+            texture = None
+            if m["texture"] is not None and self.textures is not None:
+                texture = self.textures.request(os.path.join(os.path.dirname(self.bundle.path), m["texture"]))
+            mat_data = {"name": m["name"], "diffuse": tuple(m["diffuse"]), "texture": texture}
+            out.append((mat_data, self.bundle.array(b["vertices"], np.float32), self.bundle.array(b["indices"], np.uint32)))
+        return out
+
+    def triangles(self):
+        parts = [self.bundle.array(b["vertices"], np.float32).reshape(-1, 8)[:, :3] for b in self.entry["batches"]]
+        if not parts: return np.zeros((0, 3, 3), dtype=np.float32)
+        return np.concatenate(parts).reshape(-1, 3, 3)
+
+class Bundle:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # leitura sequencial do ficheiro todo em vez de page faults espalhados
+        if hasattr(self.mm, "madvise"):
+            for advice in ("MADV_SEQUENTIAL", "MADV_WILLNEED"):
+                if hasattr(mmap, advice): self.mm.madvise(getattr(mmap, advice))
+        magic, version, toc_offset, toc_size = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} nao e um bundle versao {VERSION}")
+        self.toc = json.loads(bytes(self.mm[toc_offset:toc_offset + toc_size]))
+
+    @classmethod
+    def open_default(cls, path=DEFAULT_PATH):
+        if not os.path.isfile(path): return None
+        try:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            print(f"Falha ao abrir o bundle {path}: {e}")
+            return None
+
+    def array(self, blob, dtype):
+        # vista numpy so de leitura sobre o mmap sem copiar
+        offset, nbytes = blob
+        return np.frombuffer(self.mm, dtype=dtype, count=nbytes // np.dtype(dtype).itemsize, offset=offset)
+
+    def _entry(self, kind, path):
+        # None se nao estiver no bundle ou se o ficheiro solto for mais novo
+        entry = self.toc[kind].get(os.path.basename(path))
+        if entry is None: return None
+        if os.path.isfile(path) and _source_stamp(path) != entry["source"]: return None
+        return entry
+
+    def model(self, path, textures=None):
+        entry = self._entry("models", path)
+        return BundleModel(self, entry, textures) if entry is not None else None
+
+    def texture(self, path):
+        # pixeis rgba ja virados e o tamanho ou None
+        entry = self._entry("textures", path)
+        if entry is None: return None
+        return self.array(entry["pixels"], np.uint8), tuple(entry["size"])
+
+    def close(self):
+        # as vistas numpy seguram o mmap quem as usa depois de fechar fica com o erro do python
+        try:
+            self.mm.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="empacotar a pasta models num so ficheiro")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--models", default=MODELS_DIR)
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    parser.add_argument("--max-texture", type=int, default=2048, help="lado maximo das texturas em pixeis")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        toc = build_bundle(args.models, args.out, args.max_texture)
+        size = os.path.getsize(args.out)
+        print(f"{len(toc['models'])} modelos e {len(toc['textures'])} texturas em {args.out} ({size / 1e6:.1f} MB)")
+        return 0
+
+    bundle = Bundle(args.out)
+    for kind in ("models", "textures"):
+        for name, entry in sorted(bundle.toc[kind].items()):
+            path = os.path.join(args.models, name)
+            stale = os.path.isfile(path) and _source_stamp(path) != entry["source"]
+            blobs = [b for batch in entry.get("batches", []) for b in (batch["vertices"], batch["indices"])] or [entry.get("pixels")]
+            nbytes = sum(b[1] for b in blobs if b)
+            print(f"{name:40s} {nbytes / 1e6:8.2f} MB{'  desatualizado' if stale else ''}")
+    bundle.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
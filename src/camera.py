@@ -1,7 +1,7 @@
 
 import math
 import numpy as np
-from transform import lookAt
+from transform import lookAt_into
 
 class Camera:
     def __init__(self, radius=10.0, height=5.0):
@@ -21,6 +21,9 @@ class Camera:
         self.world_up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
         self.speed = 10.0
         self.sensitivity = 0.1
+        
+        # matriz view reutilizada em vez de uma nova por frame
+        self.view = np.eye(4, dtype=np.float32)
 
     def rotate(self, delta_deg):
         if self.mode == "ORBIT":
@@ -97,8 +100,8 @@ class Camera:
             eye_y = self.center[1] + self.height
             
             eye = np.array([eye_x, eye_y, eye_z], dtype=np.float32)
-            return lookAt(eye, self.center, self.up), eye
+            return lookAt_into(eye, self.center, self.up, self.view), eye
         else:
             # free first person etc
             # assume que position e front tao atualizados
-            return lookAt(self.position, self.position + self.front, self.up), self.position
+            return lookAt_into(self.position, self.position + self.front, self.up, self.view), self.position
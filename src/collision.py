@@ -0,0 +1,138 @@
+
+import math
+import numpy as np
+
+# colisao do carro com a geometria estatica da garagem
+# tudo no plano xz tipo caixa orientada do carro contra triangulos das paredes projetados
+# os triangulos ficam numa grelha hash uniforme assim cada passo so olha pras celulas perto do carro
+
+def model_triangles(model, M=None):
+    # triangulos N 3 3 de um OBJModel ou BundleModel opcionalmente ja transformados pra world
+    if model is None: return np.zeros((0, 3, 3), dtype=np.float32)
+    tris = model.triangles()
+    if len(tris) == 0: return tris
+    if M is not None:
+        M = np.asarray(M, dtype=np.float32)
+        tris = tris @ M[:3, :3].T + M[:3, 3]
+    return tris
+
+def wall_triangles(tris, min_height, max_height, max_normal_y=0.7):
+    # ficar so com triangulos mais ou menos verticais dentro da altura do carro
+    # chao e teto nunca empurram no plano xz
+    if len(tris) == 0: return tris
+    n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    length = np.linalg.norm(n, axis=1)
+    vertical = np.abs(n[:, 1]) < max_normal_y * np.maximum(length, 1e-12)
+    ys = tris[:, :, 1]
+    in_height = (ys.max(axis=1) > min_height) & (ys.min(axis=1) < max_height)
+    return tris[vertical & in_height & (length > 1e-12)]
+
+class SpatialHash:
+    # grelha uniforme tipo celula ix iz pra indices de triangulos 2d
+    def __init__(self, tris2d, cell_size=2.0):
+        self.cell_size = cell_size
+        self.tris = np.ascontiguousarray(tris2d, dtype=np.float32).reshape(-1, 3, 2)
+        self.mins = self.tris.min(axis=1) if len(self.tris) else np.zeros((0, 2), dtype=np.float32)
+        self.maxs = self.tris.max(axis=1) if len(self.tris) else np.zeros((0, 2), dtype=np.float32)
+
+        cells = {}
+        lo = np.floor(self.mins / cell_size).astype(np.int64)
+        hi = np.floor(self.maxs / cell_size).astype(np.int64)
+        for i in range(len(self.tris)):
+            for ix in range(lo[i, 0], hi[i, 0] + 1):
+                for iz in range(lo[i, 1], hi[i, 1] + 1):
+                    cells.setdefault((ix, iz), []).append(i)
+        self.cells = {k: np.array(v, dtype=np.int64) for k, v in cells.items()}
+
+    def query(self, lo, hi):
+        # indices unicos dos triangulos nas celulas que tocam o retangulo lo hi
+        x0, z0 = int(math.floor(lo[0] / self.cell_size)), int(math.floor(lo[1] / self.cell_size))
+        x1, z1 = int(math.floor(hi[0] / self.cell_size)), int(math.floor(hi[1] / self.cell_size))
+        found = [self.cells[(ix, iz)] for ix in range(x0, x1 + 1) for iz in range(z0, z1 + 1) if (ix, iz) in self.cells]
+        if not found: return None
+        idx = np.unique(np.concatenate(found)) if len(found) > 1 else found[0]
+        # filtro rapido pelas caixas dos triangulos antes do sat
+        keep = np.all(self.mins[idx] <= hi, axis=1) & np.all(self.maxs[idx] >= lo, axis=1)
+        idx = idx[keep]
+        return idx if len(idx) else None
+
+def box_axes(yaw):
+    # eixos do carro no plano xz tipo direita e frente iguais ao CarController
+    right = np.array([math.cos(yaw), -math.sin(yaw)], dtype=np.float32)
+    fwd = np.array([math.sin(yaw), math.cos(yaw)], dtype=np.float32)
+    return right, fwd
+
+def sat_push(center, right, fwd, half, tris):
+    # teste de eixos separadores da caixa contra K triangulos de uma vez
+    # devolve pra cada triangulo a penetracao minima e o vetor pra sair
+    K = len(tris)
+    edges = np.roll(tris, -1, axis=1) - tris
+    normals = np.stack([-edges[:, :, 1], edges[:, :, 0]], axis=2)
+    lengths = np.linalg.norm(normals, axis=2)
+    valid = lengths > 1e-6
+    normals = normals / np.where(valid, lengths, 1.0)[:, :, None]
+
+    # 5 eixos por triangulo os 2 da caixa mais as 3 normais das arestas
+    axes = np.empty((K, 5, 2), dtype=np.float32)
+    axes[:, 0] = right
+    axes[:, 1] = fwd
+    axes[:, 2:] = normals
+    valid = np.concatenate([np.ones((K, 2), dtype=bool), valid], axis=1)
+
+    proj = np.einsum('kvc,kac->kav', tris, axes)
+    t_min, t_max = proj.min(axis=2), proj.max(axis=2)
+    c = axes @ center
+    r = half[0] * np.abs(axes @ right) + half[1] * np.abs(axes @ fwd)
+    push_pos = t_max - (c - r) # empurrar no sentido do eixo
+    push_neg = (c + r) - t_min # empurrar no sentido contrario
+    depth = np.minimum(push_pos, push_neg)
+    depth = np.where(valid, depth, np.inf)
+
+    best = np.argmin(depth, axis=1)
+    rows = np.arange(K)
+    d = depth[rows, best]
+    sign = np.where(push_pos[rows, best] < push_neg[rows, best], 1.0, -1.0)
+    return d, axes[rows, best] * (d * sign)[:, None]
+
+class CollisionWorld:
+    def __init__(self, cell_size=2.0, min_height=0.1, max_height=2.0):
+        self.cell_size = cell_size
+        self.min_height = min_height
+        self.max_height = max_height
+        self.layers = {}
+        self.enabled = {}
+
+    def add_layer(self, name, tris3d):
+        walls = wall_triangles(np.asarray(tris3d, dtype=np.float32).reshape(-1, 3, 3), self.min_height, self.max_height)
+        self.layers[name] = SpatialHash(walls[:, :, [0, 2]], self.cell_size)
+        self.enabled[name] = True
+        return len(walls)
+
+    def set_enabled(self, name, enabled):
+        if name in self.enabled: self.enabled[name] = enabled
+
+    def resolve(self, center, yaw, half, iterations=4):
+        # empurrar a caixa pra fora do triangulo mais fundo e repetir
+        # devolve o deslocamento total e a normal da ultima colisao
+        center = np.array(center, dtype=np.float32)
+        start = center.copy()
+        right, fwd = box_axes(yaw)
+        ext = np.abs(right) * half[0] + np.abs(fwd) * half[1]
+        normal = None
+        for _ in range(iterations):
+            deepest = None
+            for name, grid in self.layers.items():
+                if not self.enabled[name]: continue
+                idx = grid.query(center - ext, center + ext)
+                if idx is None: continue
+                d, push = sat_push(center, right, fwd, half, grid.tris[idx])
+                i = int(np.argmax(d))
+                if d[i] > 1e-5 and (deepest is None or d[i] > deepest[0]):
+                    deepest = (d[i], push[i])
+            if deepest is None: break
+            center += deepest[1]
+            normal = deepest[1] / deepest[0]
+        return center - start, normal
+
+    def stats(self):
+        return {name: {"triangles": len(g.tris), "cells": len(g.cells)} for name, g in self.layers.items()}
@@ -0,0 +1,68 @@
+
+import numpy as np
+from OpenGL.GL import *
+
+class RenderTexture:
+    # textura de cor de um Framebuffer posta no texture_id de uma malha tipo espelho
+    # ate ao primeiro render ready e falso e a malha desenha so com a cor do material
+    def __init__(self, framebuffer):
+        self.framebuffer = framebuffer
+        self.texture = framebuffer.color_tex
+        self.ready = False
+
+class Framebuffer:
+    # fbo com textura de cor e renderbuffer de profundidade
+    def __init__(self, width, height, color_format=GL_RGBA8):
+        self.fbo = glGenFramebuffers(1)
+        self.color_tex = glGenTextures(1)
+        self.depth_rbo = glGenRenderbuffers(1)
+        self.color_format = color_format
+        self.width = 0
+        self.height = 0
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height): return
+        self.width, self.height = width, height
+
+        glBindTexture(GL_TEXTURE_2D, self.color_tex)
+        glTexImage2D(GL_TEXTURE_2D, 0, self.color_format, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_rbo)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.color_tex, 0)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth_rbo)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer incompleto: {status:#x}")
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def unbind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def read_pixels(self):
+        # rgba uint8 com a linha de cima primeiro pronta pra gravar
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)
+        return pixels[::-1]
+
+    def destroy(self):
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteTextures([self.color_tex])
+        glDeleteRenderbuffers(1, [self.depth_rbo])
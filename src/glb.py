@@ -0,0 +1,326 @@
+
+import os
+import json
+import mmap
+import struct
+import numpy as np
+from urllib.parse import unquote
+
+from scene import Node, make_mesh
+from material import Material
+from obj_loader import OBJModel
+
+# importador de gltf binario tipo um .glb exportado do blender
+# cada no do gltf vira um Node com a sua transformacao e os filhos por baixo tal como no blender
+# o ficheiro e mapeado e os accessors sao vistas numpy sobre o chunk binario sem copiar
+# por primitiva so ha uma copia que e juntar posicao normal e uv no layout de 8 floats da VAO
+# materiais pbr sao aproximados pro phong da shader e partilhados entre nos
+
+GLB_HEADER = struct.Struct("<III")  # magic versao tamanho total
+CHUNK_HEADER = struct.Struct("<II") # tamanho e tipo
+GLB_MAGIC = 0x46546C67              # glTF
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+MODE_TRIANGLES = 4
+
+COMPONENT_TYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16,
+                   5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+def trs_matrix(translation=(0, 0, 0), rotation=(0, 0, 0, 1), scale=(1, 1, 1)):
+    # T R S com o quaterniao do gltf na ordem x y z w
+    x, y, z, w = rotation
+    R = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w),     2 * (x * z + y * w)],
+        [2 * (x * y + z * w),     1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w),     2 * (y * z + x * w),     1 - 2 * (x * x + y * y)],
+    ], dtype=np.float32)
+    M = np.eye(4, dtype=np.float32)
+    M[:3, :3] = R * np.asarray(scale, dtype=np.float32)[None, :]
+    M[:3, 3] = translation
+    return M
+
+def node_matrix(n):
+    # o gltf guarda as matrizes por colunas
+    if "matrix" in n: return np.array(n["matrix"], dtype=np.float32).reshape(4, 4).T.copy()
+    return trs_matrix(n.get("translation", (0, 0, 0)), n.get("rotation", (0, 0, 0, 1)), n.get("scale", (1, 1, 1)))
+
+def pbr_material(m, name):
+    # metal e rugosidade pra especular e brilho do phong
+    # especular entre os 4 porcento dos dielectricos e a cor base conforme o metal
+    pbr = m.get("pbrMetallicRoughness", {})
+    base = np.array(pbr.get("baseColorFactor", (1.0, 1.0, 1.0, 1.0)), dtype=np.float32)
+    metal = float(pbr.get("metallicFactor", 1.0))
+    rough = float(pbr.get("roughnessFactor", 1.0))
+    a = max(rough * rough, 1e-3)
+    shininess = min(max(2.0 / (a * a) - 2.0, 1.0), 256.0)
+    alpha = float(base[3]) if m.get("alphaMode") == "BLEND" else 1.0
+    return Material(m.get("name", name), diffuse=base[:3], specular=0.04 * (1.0 - metal) + base[:3] * metal,
+                    emission=m.get("emissiveFactor", (0.0, 0.0, 0.0)), shininess=shininess, alpha=alpha)
+
+class GLBModel(OBJModel):
+    # mesma interface que o OBJModel mais o part pra ir buscar pecas pelo nome do objeto no blender
+    def __init__(self, filename, textures=None, parse_only=False):
+        self.filename = filename
+        self.textures = textures
+        self.parse_only = parse_only
+        self.batches = []
+        self.meshes = None         # por mesh do gltf lista de malha e indice do material
+        self.images = {}
+        self.materials = {}
+        self.default_material = Material(os.path.basename(filename) + "_Default")
+        self.claimed = set()       # nos ja entregues pelo part com a subarvore toda
+
+        with open(filename, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = GLB_HEADER.unpack_from(self.mm, 0)
+        if magic != GLB_MAGIC or version != 2:
+            self.close()
+            raise ValueError(f"{filename} nao e um glb versao 2")
+        self.gltf = None
+        self.bin_offset = self.bin_size = 0
+        offset = GLB_HEADER.size
+        while offset + CHUNK_HEADER.size <= min(length, len(self.mm)):
+            size, kind = CHUNK_HEADER.unpack_from(self.mm, offset)
+            start = offset + CHUNK_HEADER.size
+            if kind == CHUNK_JSON:
+                self.gltf = json.loads(bytes(self.mm[start:start + size]))
+            elif kind == CHUNK_BIN and not self.bin_size:
+                self.bin_offset, self.bin_size = start, size
+            offset = start + size + (-size) % 4
+        if self.gltf is None:
+            self.close()
+            raise ValueError(f"{filename} sem chunk json")
+
+        # hierarquia e matrizes world no espaco do ficheiro
+        nodes = self.gltf.get("nodes", [])
+        self.locals = [node_matrix(n) for n in nodes]
+        self.parents = [None] * len(nodes)
+        for i, n in enumerate(nodes):
+            for c in n.get("children", []): self.parents[c] = i
+        scenes = self.gltf.get("scenes")
+        if scenes:
+            self.roots = list(scenes[self.gltf.get("scene", 0)].get("nodes", []))
+        else:
+            self.roots = [i for i, p in enumerate(self.parents) if p is None]
+        self.world = [None] * len(nodes)
+        stack = [(i, np.eye(4, dtype=np.float32)) for i in self.roots]
+        while stack:
+            i, parent = stack.pop()
+            self.world[i] = parent @ self.locals[i]
+            stack.extend((c, self.world[i]) for c in nodes[i].get("children", []))
+        self.by_name = {n["name"]: i for i, n in enumerate(nodes) if "name" in n}
+        self.bounds = self._bounds(range(len(nodes)))
+
+    def accessor(self, index):
+        # vista (count, largura) sobre o chunk binario respeitando o byteStride dos buffers interleaved
+        acc = self.gltf["accessors"][index]
+        dtype = np.dtype(COMPONENT_TYPES[acc["componentType"]])
+        width = TYPE_WIDTHS[acc["type"]]
+        count = acc["count"]
+        if "bufferView" not in acc: return np.zeros((count, width), dtype=dtype)
+        view = self.gltf["bufferViews"][acc["bufferView"]]
+        if view.get("buffer", 0) != 0 or "uri" in self.gltf["buffers"][view.get("buffer", 0)]:
+            raise ValueError(f"{self.filename}: so buffers dentro do glb sao suportados")
+        offset = self.bin_offset + view.get("byteOffset", 0) + acc.get("byteOffset", 0)
+        stride = view.get("byteStride") or dtype.itemsize * width
+        arr = np.ndarray((count, width), dtype=dtype, buffer=self.mm, offset=offset,
+                         strides=(stride, dtype.itemsize))
+        if acc.get("normalized"):
+            arr = arr.astype(np.float32) / np.iinfo(dtype).max
+        return arr
+
+    def _bounds(self, node_indices):
+        # min e max dos accessors de posicao levados pro espaco do ficheiro pelos 8 cantos
+        lo = np.full(3, np.inf, dtype=np.float32)
+        hi = np.full(3, -np.inf, dtype=np.float32)
+        nodes = self.gltf.get("nodes", [])
+        for i in node_indices:
+            if "mesh" not in nodes[i] or self.world[i] is None: continue
+            for prim in self.gltf["meshes"][nodes[i]["mesh"]]["primitives"]:
+                acc = self.gltf["accessors"][prim["attributes"]["POSITION"]]
+                if "min" in acc and "max" in acc:
+                    a, b = np.array(acc["min"][:3], dtype=np.float32), np.array(acc["max"][:3], dtype=np.float32)
+                else:
+                    pos = self.accessor(prim["attributes"]["POSITION"])
+                    if not len(pos): continue
+                    a, b = pos.min(axis=0), pos.max(axis=0)
+                corners = np.array([[x, y, z, 1.0] for x in (a[0], b[0]) for y in (a[1], b[1]) for z in (a[2], b[2])], dtype=np.float32)
+                p = corners @ self.world[i].T
+                lo = np.minimum(lo, p[:, :3].min(axis=0))
+                hi = np.maximum(hi, p[:, :3].max(axis=0))
+        if not np.isfinite(lo).all(): return np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32)
+        return lo, hi
+
+    def get_center(self):
+        return (self.bounds[0] + self.bounds[1]) / 2.0
+
+    def get_bounds(self):
+        return self.bounds
+
+    def primitive_arrays(self, prim):
+        # posicao normal e uv no layout interleaved e indices uint32
+        attrs = prim["attributes"]
+        pos = self.accessor(attrs["POSITION"])
+        out = np.empty((len(pos), 8), dtype=np.float32)
+        out[:, 0:3] = pos
+        if "NORMAL" in attrs: out[:, 3:6] = self.accessor(attrs["NORMAL"])
+        else: out[:, 3:6] = (0.0, 1.0, 0.0)
+        if "TEXCOORD_0" in attrs:
+            # no gltf o v comeca em cima e as texturas sobem viradas como nos obj
+            uv = self.accessor(attrs["TEXCOORD_0"])
+            out[:, 6] = uv[:, 0]
+            out[:, 7] = 1.0 - uv[:, 1]
+        else:
+            out[:, 6:8] = 0.0
+        if "indices" in prim:
+            indices = self.accessor(prim["indices"]).reshape(-1)
+            # uint32 contiguo fica a vista sobre o ficheiro os outros tipos sobem pra uint32
+            if indices.dtype != np.uint32: indices = indices.astype(np.uint32)
+        else:
+            indices = np.arange(len(pos), dtype=np.uint32)
+        return out.reshape(-1), indices
+
+    def material(self, index):
+        if index is None: return self.default_material
+        m = self.materials.get(index)
+        if m is None:
+            m = self.materials[index] = pbr_material(self.gltf["materials"][index], f"GLB_{index}")
+        return m
+
+    def texture(self, material_index):
+        # textura base do material embebida no glb ou ficheiro ao lado
+        if material_index is None or self.parse_only: return None
+        info = self.gltf["materials"][material_index].get("pbrMetallicRoughness", {}).get("baseColorTexture")
+        if info is None: return None
+        source = self.gltf["textures"][info["index"]].get("source")
+        if source is None: return None
+        if source not in self.images:
+            image = self.gltf["images"][source]
+            if "bufferView" in image:
+                view = self.gltf["bufferViews"][image["bufferView"]]
+                start = self.bin_offset + view.get("byteOffset", 0)
+                data = memoryview(self.mm)[start:start + view["byteLength"]]
+                self.images[source] = self._load_texture(f"{self.filename}#image{source}", data)
+            elif image.get("uri", "").startswith("data:"):
+                print(f"Texture error {self.filename}: imagens em data uri nao sao suportadas")
+                self.images[source] = None
+            else:
+                path = os.path.join(os.path.dirname(self.filename), unquote(image["uri"]))
+                self.images[source] = self._load_texture(path)
+        return self.images[source]
+
+    def build(self, arena=None):
+        # uma vez por mesh do gltf os nos que repetem a mesh partilham as malhas
+        if self.meshes is not None: return
+        self.meshes = []
+        for m in self.gltf.get("meshes", []):
+            prims = []
+            for prim in m["primitives"]:
+                if prim.get("mode", MODE_TRIANGLES) != MODE_TRIANGLES:
+                    print(f"{self.filename}: primitiva com modo {prim['mode']} ignorada")
+                    continue
+                vertices, indices = self.primitive_arrays(prim)
+                mat = prim.get("material")
+                mesh = make_mesh(vertices, indices, texture_id=self.texture(mat), arena=arena)
+                prims.append((mesh, mat))
+                self.batches.append({"mesh": mesh, "material": mat})
+            self.meshes.append(prims)
+
+    def _make_node(self, i, local=None):
+        n = self.gltf["nodes"][i]
+        name = n.get("name", f"GLBNode_{i}")
+        node = Node(name, local=self.locals[i] if local is None else local, material=self.default_material)
+        if "mesh" in n:
+            for mesh, mat in self.meshes[n["mesh"]]:
+                node.add(Node(name + "_Mesh", mesh=mesh, material=self.material(mat)))
+        for c in n.get("children", []):
+            # filhos ja pedidos a parte pelo part nao aparecem duas vezes
+            if c not in self.claimed: node.add(self._make_node(c))
+        return node
+
+    def to_node(self, name="GLBRoot"):
+        root = Node(name, material=self.default_material)
+        for i in self.roots: root.add(self._make_node(i))
+        return root
+
+    def part(self, name):
+        # GLBPart do objeto com este nome ou None se nao existir no glb
+        # se ja veio dentro de um pai pedido antes a peca sai vazia pra nao aparecer duas vezes
+        i = self.by_name.get(name)
+        if i is None or self.world[i] is None: return None
+        p = self.parents[i]
+        while p is not None:
+            if p in self.claimed: return GLBPart(self, i, nested=True)
+            p = self.parents[p]
+        self.claimed.add(i)
+        return GLBPart(self, i)
+
+    def subtree(self, i):
+        out, stack = [], [i]
+        while stack:
+            j = stack.pop()
+            out.append(j)
+            stack.extend(c for c in self.gltf["nodes"][j].get("children", []) if c not in self.claimed)
+        return out
+
+    def triangles(self, node_indices=None):
+        # triangulos N 3 3 no espaco do ficheiro pra colisao
+        nodes = self.gltf.get("nodes", [])
+        if node_indices is None: node_indices = range(len(nodes))
+        parts = []
+        for i in node_indices:
+            if "mesh" not in nodes[i] or self.world[i] is None: continue
+            for prim in self.gltf["meshes"][nodes[i]["mesh"]]["primitives"]:
+                if prim.get("mode", MODE_TRIANGLES) != MODE_TRIANGLES: continue
+                pos = self.accessor(prim["attributes"]["POSITION"]).astype(np.float32)
+                idx = self.accessor(prim["indices"]).reshape(-1) if "indices" in prim else np.arange(len(pos))
+                p = pos @ self.world[i][:3, :3].T + self.world[i][:3, 3]
+                parts.append(p[idx].reshape(-1, 3, 3))
+        if not parts: return np.zeros((0, 3, 3), dtype=np.float32)
+        return np.concatenate(parts)
+
+    def close(self):
+        # as vistas dos accessors seguram o mmap quem as guardar fica com o erro do python
+        try:
+            self.mm.close()
+        except BufferError:
+            pass
+
+class GLBPart:
+    # uma peca do glb com a interface do OBJModel pro load_obj_node
+    # a raiz devolvida e identidade com a peca la dentro ja no espaco do ficheiro
+    # assim as montagens do carro funcionam igual aos obj e o pivot vem da origem posta no blender
+    def __init__(self, model, index, nested=False):
+        self.model = model
+        self.index = index
+        self.nested = nested
+        self.authored = True
+        self.pivot = model.world[index][:3, 3].copy()
+
+    def get_bounds(self):
+        return self.model._bounds([] if self.nested else self.model.subtree(self.index))
+
+    def get_center(self):
+        lo, hi = self.get_bounds()
+        return (lo + hi) / 2.0
+
+    def build(self, arena=None):
+        self.model.build(arena)
+
+    def to_node(self, name="GLBPart"):
+        root = Node(name, material=self.model.default_material)
+        if not self.nested: root.add(self.model._make_node(self.index, self.model.world[self.index]))
+        return root
+
+    def triangles(self):
+        return self.model.triangles([] if self.nested else self.model.subtree(self.index))
+
+def load_glb(path, textures=None):
+    # None se o ficheiro nao existir ou nao der pra ler
+    if not os.path.isfile(path): return None
+    try:
+        return GLBModel(path, textures)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Falha ao abrir o glb {path}: {e}")
+        return None
@@ -0,0 +1,187 @@
+
+import os, time, argparse, ctypes
+
+# modo sem janela pra correr benchmarks em ci ou servidores sem display
+# o contexto e criado com egl tipo mesa llvmpipe ou osmesa e desenhamos num fbo
+# uso python headless.py --frames 300 --width 1280 --height 720 --dump frames/
+
+def create_egl_context():
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize falhou")
+
+    def attrib_list(values):
+        return (EGL.EGLint * len(values))(*values)
+
+    config_attribs = attrib_list([
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8, EGL.EGL_ALPHA_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE])
+    config = EGL.EGLConfig()
+    num = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, config_attribs, ctypes.pointer(config), 1, ctypes.pointer(num)) or num.value == 0:
+        raise RuntimeError("nenhuma config egl com opengl")
+
+    # superficie minima o desenho vai todo pro fbo
+    surface = EGL.eglCreatePbufferSurface(display, config, attrib_list([EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE]))
+
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, attrib_list([
+        EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+        EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+        EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+        EGL.EGL_NONE]))
+    if context == EGL.EGL_NO_CONTEXT:
+        raise RuntimeError("eglCreateContext falhou")
+    EGL.eglMakeCurrent(display, surface, surface, context)
+
+    def destroy():
+        EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(display, context)
+        EGL.eglDestroySurface(display, surface)
+        EGL.eglTerminate(display)
+    return destroy
+
+def create_osmesa_context(width, height):
+    from OpenGL import osmesa, arrays
+    from OpenGL.GL import GL_UNSIGNED_BYTE
+
+    attribs = [
+        osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+        osmesa.OSMESA_DEPTH_BITS, 24,
+        osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+        osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+        osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+        0]
+    context = osmesa.OSMesaCreateContextAttribs((ctypes.c_int * len(attribs))(*attribs), None)
+    if not context:
+        raise RuntimeError("OSMesaCreateContextAttribs falhou")
+    # osmesa precisa de um buffer de cor proprio mesmo desenhando no fbo
+    buf = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buf, GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesaMakeCurrent falhou")
+
+    def destroy():
+        osmesa.OSMesaDestroyContext(context)
+    return destroy
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="render offscreen sem janela")
+    parser.add_argument("--backend", choices=["egl", "osmesa"], default="egl")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=None, help="por defeito 120 ou a duracao do replay")
+    parser.add_argument("--dt", type=float, default=1.0 / 60.0, help="passo de tempo simulado por frame")
+    parser.add_argument("--dump", default=None, help="pasta pra gravar os frames em png")
+    parser.add_argument("--replay", default=None, help="ficheiro de input gravado pra repetir")
+    parser.add_argument("--profile", action="store_true", help="mostrar tempos cpu gpu por scope")
+    parser.add_argument("--trace", default=None, help="gravar trace chrome about tracing neste ficheiro")
+    parser.add_argument("--mirror-every", type=int, default=2, help="redesenhar os retrovisores de n em n frames 0 desliga")
+    parser.add_argument("--release-geometry", action="store_true", help="largar as copias do cpu das malhas depois do arranque")
+    parser.add_argument("--memory", action="store_true", help="mostrar a memoria por modelo malha e textura no fim")
+    parser.add_argument("--no-oit", action="store_true", help="vidros pelo blend normal na ordem da arvore em vez do oit")
+    parser.add_argument("--dynamic-resolution", action="store_true", help="desenhar a cena num fbo com escala ajustada pelo tempo de gpu")
+    parser.add_argument("--target-ms", type=float, default=16.7, help="tempo de gpu por frame que a resolucao dinamica tenta manter")
+    parser.add_argument("--min-scale", type=float, default=0.5, help="escala minima da resolucao dinamica")
+    parser.add_argument("--max-scale", type=float, default=1.0, help="escala maxima da resolucao dinamica")
+    return parser.parse_args(argv)
+
+def run(args):
+    # o pyopengl escolhe a plataforma no primeiro import por isso so importamos a cena depois disto
+    os.environ["PYOPENGL_PLATFORM"] = args.backend
+    # caminhos dados na linha de comando sao da pasta de onde se correu antes de mudar pra src
+    for name in ("dump", "replay", "trace"):
+        path = getattr(args, name)
+        if path: setattr(args, name, os.path.abspath(path))
+    # caminhos dos modelos sao relativos a pasta src
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.backend == "egl": destroy_context = create_egl_context()
+    else: destroy_context = create_osmesa_context(args.width, args.height)
+
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from world import World
+    from framebuffer import Framebuffer
+    from replay import ReplayDriver, load_events
+    from resolution import DynamicResolution, ResolutionController
+    import memory
+
+    print(f"Renderer: {glGetString(GL_RENDERER).decode()}")
+
+    t0 = time.perf_counter()
+    resolution = None
+    if args.dynamic_resolution:
+        resolution = DynamicResolution(ResolutionController(args.target_ms, args.min_scale, args.max_scale))
+    world = World(keep_mesh_geometry=not args.release_geometry, mirror_every=args.mirror_every,
+                  resolution=resolution, oit=not args.no_oit)
+    world.setup_gl_state()
+    # frames gravados tem de ter as texturas todas desde o primeiro
+    world.textures.flush()
+    target = Framebuffer(args.width, args.height)
+    print(f"Cena construida em {(time.perf_counter() - t0) * 1000.0:.1f} ms "
+          f"pico de memoria {memory.mb(memory.peak_rss_bytes())}")
+
+    if args.dump: os.makedirs(args.dump, exist_ok=True)
+
+    driver = None
+    n_frames = args.frames if args.frames is not None else 120
+    if args.replay:
+        _, events = load_events(args.replay)
+        driver = ReplayDriver(world, events, args.dt)
+        if args.frames is None: n_frames = driver.n_frames
+
+    profiler = world.profiler
+    profiler.enabled = args.profile or args.trace is not None
+
+    frame_times = []
+    for i in range(n_frames):
+        profiler.begin_frame()
+        start = time.perf_counter()
+        t = i * args.dt
+
+        if driver: driver.step()
+        else: world.update(args.dt, t)
+        target.bind()
+        world.render(args.width, args.height)
+        with profiler.scope("finish"):
+            glFinish()
+
+        frame_times.append(time.perf_counter() - start)
+        profiler.end_frame()
+
+        if args.dump:
+            from PIL import Image
+            Image.fromarray(target.read_pixels(), "RGBA").save(os.path.join(args.dump, f"frame_{i:05d}.png"))
+
+    target.unbind()
+    target.destroy()
+
+    if profiler.enabled:
+        # esvaziar as queries que ainda estavam pendentes
+        profiler.flush()
+        print(profiler.format_summary())
+        if args.trace:
+            profiler.export_chrome_trace(args.trace)
+            print(f"Trace gravado em {args.trace}")
+    profiler.destroy()
+
+    if frame_times:
+        ms = sorted(f * 1000.0 for f in frame_times)
+        avg = sum(ms) / len(ms)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{len(ms)} frames {args.width}x{args.height} media {avg:.2f} ms p95 {p95:.2f} ms max {ms[-1]:.2f} ms")
+        if world.views.views: print(world.views.format_stats(avg))
+        if world.resolution is not None: print(world.resolution.format_stats())
+    if world.resolution is not None: world.resolution.destroy()
+    if args.memory: print(memory.format_report(world.memory_report()))
+
+    destroy_context()
+    return frame_times
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,252 @@
+
+import os
+import time
+import queue
+import threading
+
+from obj_loader import OBJModel
+from scene import model_node, refill_mesh
+from arena import MeshGroup
+from bundle import MODELS_DIR, IMAGE_EXTS
+
+# recarregar obj mtl e texturas da pasta models sem reiniciar
+# uma thread faz polling dos tamanhos e mtime e o parse dos obj que mudaram
+# na thread do gl so se troca o conteudo dos buffers por baixo dos Mesh que ja existem
+# os nos as transformacoes os materiais partilhados e o estado dos controladores ficam como estavam
+# o bundle ja ignora entradas com o ficheiro solto mais novo por isso o parse e sempre do obj
+
+WATCHED_EXTS = (".obj", ".mtl") + IMAGE_EXTS
+
+def _stamp(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+class _Tracked:
+    # um no devolvido pelo load_obj_node e as malhas de cada batch pela ordem do obj
+    def __init__(self, node, model, options):
+        self.node = node
+        self.options = options
+        self.slots = [b["mesh"] for b in model.batches]
+        self.names = [b["material"].get("name") for b in model.batches]
+        # texturas do mtl guardadas ja porque quem carregou pode por outra por cima tipo o portao
+        self.textures = [b["mesh"].texture_id for b in model.batches]
+        self.own = {id(c.material) for c in node.children} # materiais feitos pelo loader
+
+class AssetReloader:
+    def __init__(self, textures=None, materials=None, models_dir=MODELS_DIR, interval=0.5, applies_per_frame=1):
+        self.textures = textures                  # TextureStreamer pra reenviar texturas sem parar o frame
+        self.materials = materials                # MaterialTable da shader pra largar os slots dos materiais trocados
+        self.models_dir = os.path.abspath(models_dir)
+        self.interval = interval                  # segundos entre cada polling da pasta
+        self.applies_per_frame = applies_per_frame
+        self.tracked = {}                         # caminho absoluto do obj pra lista de _Tracked
+        self.mtl_users = {}                       # caminho absoluto do mtl pros obj que o usam
+        self.changes = queue.Queue()              # ficheiros que mudaram e ja acabaram de ser escritos
+        self.jobs = queue.Queue()                 # obj pra reler na thread
+        self.results = queue.Queue()              # obj relidos a espera da thread do gl
+        self.queued = set()
+        self.thread = None
+        self.reloads = 0
+        self.wake = None                          # chamado da thread quando ha mudancas tipo glfw post_empty_event
+        self.on_reload = []                       # chamados na thread do gl com o no depois de trocado tipo retrovisores
+
+    def track(self, path, node, model, options):
+        path = os.path.abspath(path)
+        self.tracked.setdefault(path, []).append(_Tracked(node, model, options))
+        for mtl in getattr(model, "mtl_files", []):
+            self.mtl_users.setdefault(os.path.abspath(mtl), set()).add(path)
+
+    def start(self):
+        if self.thread is not None: return
+        self.thread = threading.Thread(target=self._run, name="hotreload", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None: return
+        self.jobs.put(None)
+        self.thread.join(timeout=2.0)
+        self.thread = None
+
+    def _scan(self):
+        stamps = {}
+        try:
+            entries = list(os.scandir(self.models_dir))
+        except OSError:
+            return stamps
+        for e in entries:
+            if not e.name.lower().endswith(WATCHED_EXTS): continue
+            try:
+                stamps[os.path.abspath(e.path)] = _stamp(e.path)
+            except OSError:
+                pass
+        return stamps
+
+    def _run(self):
+        stamps = self._scan()
+        pending = {}
+        next_poll = time.perf_counter() + self.interval
+        while True:
+            try:
+                job = self.jobs.get(timeout=max(0.0, next_poll - time.perf_counter()))
+            except queue.Empty:
+                job = False
+            if job is None: return
+            if job: self._parse(job)
+            if time.perf_counter() < next_poll: continue
+            next_poll = time.perf_counter() + self.interval
+            # so conta quando o tamanho e o mtime ficam iguais dois pollings seguidos
+            # assim o blender ainda a escrever o ficheiro nao da um obj cortado
+            for path, st in self._scan().items():
+                if st == stamps.get(path):
+                    pending.pop(path, None)
+                elif pending.get(path) == st:
+                    stamps[path] = st
+                    del pending[path]
+                    self.changes.put(path)
+                    if self.wake: self.wake()
+                else:
+                    pending[path] = st
+
+    def _parse(self, path):
+        # so cpu tipo texto pra arrays interleaved o gl fica pra thread principal
+        # um obj mal escrito no meio da edicao so estraga este reload a thread continua
+        start = time.perf_counter()
+        try:
+            model = OBJModel(path, parse_only=True)
+            batches = model.batch_arrays()
+        except Exception as e:
+            print(f"Recarregar {os.path.basename(path)}: {e}")
+            model, batches = None, []
+        self.results.put((path, model, batches, time.perf_counter() - start))
+        if self.wake: self.wake()
+
+    def busy(self):
+        # mudancas por aplicar ou obj ainda no parse
+        return bool(self.queued) or not self.changes.empty() or not self.results.empty()
+
+    def update(self):
+        # chamar uma vez por frame na thread do gl devolve quantos obj foram trocados
+        while True:
+            try:
+                path = self.changes.get_nowait()
+            except queue.Empty:
+                break
+            self._changed(path)
+        applied = 0
+        while applied < self.applies_per_frame:
+            try:
+                path, model, batches, seconds = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.queued.discard(path)
+            self._apply(path, model, batches, seconds)
+            applied += 1
+        return applied
+
+    def _changed(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".obj":
+            objs = [path] if path in self.tracked else []
+        elif ext == ".mtl":
+            objs = sorted(self.mtl_users.get(path, ()))
+        else:
+            objs = []
+            # o streamer guarda as texturas pelo caminho com que foram pedidas
+            if self.textures is not None:
+                for key in list(self.textures.textures):
+                    if os.path.abspath(key) == path:
+                        self.textures.reload(key)
+                        print(f"Textura recarregada {os.path.basename(path)}")
+        for obj in objs:
+            if obj in self.queued: continue
+            self.queued.add(obj)
+            self.jobs.put(obj)
+
+    def _texture(self, model, mat_data):
+        path = mat_data.get("texture_path")
+        if not path: return None
+        model.textures = self.textures
+        return model._load_texture(path)
+
+    def _apply(self, path, model, batches, seconds):
+        if not batches:
+            if model is not None: print(f"Recarregar {os.path.basename(path)}: sem faces fica o anterior")
+            return
+        for mtl in model.mtl_files:
+            self.mtl_users.setdefault(os.path.abspath(mtl), set()).add(path)
+        names = [mat_data.get("name") for mat_data, _, _ in batches]
+        textures = [self._texture(model, mat_data) for mat_data, _, _ in batches]
+        swapped = rebuilt = 0
+        for t in self.tracked.get(path, []):
+            same = names == t.names and textures == t.textures
+            if same:
+                self._swap(t, batches)
+                swapped += 1
+            else:
+                self._rebuild(t, model, batches, names)
+                rebuilt += 1
+            for callback in self.on_reload: callback(t.node)
+        self.reloads += 1
+        print(f"Recarregado {os.path.basename(path)} em {seconds * 1000:.0f} ms de parse "
+              f"({swapped} trocados no sitio {rebuilt} refeitos)")
+
+    def _release(self, t, old):
+        # materiais do loader que ja nenhum filho usa saem da tabela senao cada reload gastava slots
+        used = {id(c.material) for c in t.node.children}
+        for m in old:
+            if id(m) in used or id(m) not in t.own: continue
+            t.own.discard(id(m))
+            if self.materials is not None: self.materials.release(m)
+
+    def _swap(self, t, batches):
+        # mesmos batches pela mesma ordem so muda o conteudo dos buffers e a cor do mtl
+        owners = {}
+        for c in t.node.children:
+            members = c.mesh.meshes if isinstance(c.mesh, MeshGroup) else [c.mesh]
+            for m in members: owners[id(m)] = c
+        # uma cor que volta ao valor de outro filho reaproveita o material dele
+        shared = {c.material.key(): c.material for c in t.node.children if id(c.material) in t.own}
+        old = []
+        for mesh, (mat_data, vertices, indices) in zip(t.slots, batches):
+            refill_mesh(mesh, vertices, indices)
+            owner = owners.get(id(mesh))
+            if owner is None or t.options["color"]: continue
+            if owner.material.diffuse != tuple(float(x) for x in mat_data["diffuse"]):
+                m = owner.material.copy(diffuse=mat_data["diffuse"])
+                old.append(owner.material)
+                owner.material = shared.setdefault(m.key(), m)
+                t.own.add(id(owner.material))
+        for c in t.node.children:
+            if isinstance(c.mesh, MeshGroup): c.mesh.refresh()
+        self._release(t, old)
+
+    def _rebuild(self, t, model, batches, names):
+        # batches ou texturas diferentes fazem-se filhos novos debaixo do mesmo no
+        # o no em si e o que os controladores e montagens conhecem por isso fica
+        for mat in model.materials.values():
+            mat["texture"] = self._texture(model, mat)
+        # os arrays ja vieram da thread o build nao volta a expandir as faces aqui
+        model.batch_arrays = lambda: batches
+        model.batches = []
+        fresh = model_node(model, t.node.name, **t.options)
+        # material posto por fora em todos os filhos tipo os farois passa pros novos
+        old_materials = {id(c.material): c.material for c in t.node.children}
+        # a textura tambem tipo a do portao posta depois do load por cima da do mtl
+        old_textures = {id(c.mesh.texture_id): c.mesh.texture_id for c in t.node.children if c.mesh is not None}
+        mtl_textures = {id(tex) for tex in t.textures}
+        old = t.node.children
+        t.node.children = fresh.children
+        if len(old_materials) == 1 and not old_materials.keys() & t.own:
+            material = next(iter(old_materials.values()))
+            for c in t.node.children: c.material = material
+        t.textures = [b["mesh"].texture_id for b in model.batches]
+        if len(old_textures) == 1 and not old_textures.keys() & mtl_textures:
+            texture = next(iter(old_textures.values()))
+            for c in t.node.children:
+                if c.mesh is not None: c.mesh.texture_id = texture
+        self._release(t, old_materials.values())
+        t.own = {id(c.material) for c in fresh.children}
+        for c in old:
+            if c.mesh is not None: c.mesh.destroy()
+        t.slots = [b["mesh"] for b in model.batches]
+        t.names = names
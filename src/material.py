@@ -0,0 +1,135 @@
+
+import itertools
+import numpy as np
+from OpenGL.GL import *
+
+# materiais partilhados por referencia entre nos
+# cada alteracao a um campo sobe a versao e a tabela so reenvia pro uniform buffer o que mudou
+# ligar os farois passa a ser uma atribuicao num material em vez de percorrer a arvore
+
+_versions = itertools.count(1)
+
+MAX_MATERIALS = 256    # 256 vezes 64 bytes cabe nos 16 KB minimos de um uniform block
+MATERIAL_FLOATS = 16   # 4 vec4 no layout std140
+MATERIAL_BINDING = 0   # ponto de ligacao do bloco Materials
+
+_COLORS = ("ambient", "diffuse", "specular", "emission")
+_SCALARS = ("shininess", "alpha")
+
+class Material:
+    def __init__(self, name="Material", ambient=(0.2, 0.2, 0.2), diffuse=(0.8, 0.8, 0.8),
+                 specular=(1.0, 1.0, 1.0), emission=(0.0, 0.0, 0.0), shininess=32.0, alpha=1.0):
+        self.name = name
+        self.version = 0
+        self.ambient = ambient
+        self.diffuse = diffuse
+        self.specular = specular
+        self.emission = emission
+        self.shininess = shininess
+        self.alpha = alpha
+
+    def __setattr__(self, key, value):
+        # campos do material normalizados pra tuplos e floats e so contam como mudanca se o valor for outro
+        if key in _COLORS:
+            value = tuple(float(x) for x in value)
+        elif key in _SCALARS:
+            value = float(value)
+        else:
+            object.__setattr__(self, key, value)
+            return
+        if self.__dict__.get(key) == value: return
+        object.__setattr__(self, key, value)
+        object.__setattr__(self, "version", next(_versions))
+
+    def key(self):
+        # valores todos juntos pra reaproveitar materiais iguais
+        return (self.ambient, self.diffuse, self.specular, self.emission, self.shininess, self.alpha)
+
+    def copy(self, name=None, **changes):
+        m = Material(name or self.name, *self.key())
+        for k, v in changes.items(): setattr(m, k, v)
+        return m
+
+    @property
+    def transparent(self):
+        return self.alpha < 1.0
+
+    def pack(self, out):
+        # std140 tipo ambient e shininess diffuse e alpha specular e emission cada um num vec4
+        out[0:3] = self.ambient
+        out[3] = self.shininess
+        out[4:7] = self.diffuse
+        out[7] = self.alpha
+        out[8:11] = self.specular
+        out[12:15] = self.emission
+        return out
+
+class MaterialTable:
+    # tabela de todos os materiais usados num uniform buffer cada draw so manda o indice
+    # materiais que saem da cena tipo modelos recarregados largam o slot pra ser reaproveitado
+    def __init__(self, capacity=MAX_MATERIALS):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, MATERIAL_FLOATS), dtype=np.float32)
+        self.materials = []     # material de cada slot None nos slots livres
+        self.versions = []
+        self.slots = {}
+        self.free = []
+        self.ubo = None
+        self.uploads = 0
+
+    def index(self, material):
+        slot = self.slots.get(id(material))
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                self.materials[slot] = material
+                self.versions[slot] = 0
+            else:
+                if len(self.materials) >= self.capacity:
+                    raise RuntimeError(f"Tabela de materiais cheia ({self.capacity})")
+                slot = len(self.materials)
+                self.materials.append(material)
+                self.versions.append(0)
+            # a lista guarda a referencia assim o id nunca e reaproveitado enquanto tiver slot
+            self.slots[id(material)] = slot
+        return slot
+
+    def release(self, material):
+        # o slot fica livre pro proximo material novo se o material voltar a ser usado recebe outro
+        slot = self.slots.pop(id(material), None)
+        if slot is None: return False
+        self.materials[slot] = None
+        self.free.append(slot)
+        return True
+
+    def sync(self):
+        # reenviar so o intervalo entre o primeiro e o ultimo material que mudou
+        lo = hi = None
+        for slot, m in enumerate(self.materials):
+            if m is not None and m.version != self.versions[slot]:
+                m.pack(self.data[slot])
+                self.versions[slot] = m.version
+                if lo is None: lo = slot
+                hi = slot
+        if self.ubo is None:
+            self.ubo = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, self.data, GL_DYNAMIC_DRAW)
+            glBindBufferBase(GL_UNIFORM_BUFFER, MATERIAL_BINDING, self.ubo)
+            self.uploads += 1
+            return len(self.slots)
+        if lo is None: return 0
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        row = MATERIAL_FLOATS * 4
+        glBufferSubData(GL_UNIFORM_BUFFER, lo * row, (hi - lo + 1) * row, self.data[lo:hi + 1])
+        self.uploads += 1
+        return hi - lo + 1
+
+    def bind(self):
+        if self.ubo is not None:
+            glBindBufferBase(GL_UNIFORM_BUFFER, MATERIAL_BINDING, self.ubo)
+
+    def destroy(self):
+        if self.ubo is not None:
+            glDeleteBuffers(1, [self.ubo])
+            self.ubo = None
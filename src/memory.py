@@ -0,0 +1,151 @@
+
+import os
+import sys
+import numpy as np
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
+# contabilidade de memoria do cpu e da gpu consultavel com o programa a correr
+# o cpu conta as listas do parse dos obj e as copias numpy das malhas
+# a gpu conta o que foi pedido ao driver nos glBufferData e glTexImage nao o que ele gasta de facto
+# as listas python sao medidas por amostragem pois percorrer 100 mil faces leva mais do que o parse
+
+SAMPLE = 64
+
+_models = {}   # caminho do obj pra bytes do parse e bytes que ficaram depois do release
+_textures = {} # texturas criadas fora do streamer tipo ceu e loads sincronos
+
+def sizeof(obj):
+    # tamanho de um objeto e de tudo o que ele referencia arrays numpy pelo nbytes
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sampled_sizeof(obj)
+    # nomes de materiais e chaves das faces sao os mesmos objetos partilhados
+    if isinstance(obj, str): return 0
+    return sys.getsizeof(obj)
+
+def sampled_sizeof(items):
+    # soma dos elementos estimada pelos primeiros SAMPLE tipo todos do mesmo formato
+    if not items: return 0
+    sample = items[:SAMPLE]
+    return sum(sizeof(x) for x in sample) * len(items) // len(sample)
+
+def model_cpu_bytes(model):
+    # listas do parse de um OBJModel zero pra bundle e glb que vivem em mmap
+    total = 0
+    for attr in ("vertices", "normals", "texcoords", "faces"):
+        items = getattr(model, attr, None)
+        if items is not None: total += sizeof(items)
+    return total
+
+def record_model(path, parsed, kept):
+    _models[path] = (parsed, kept)
+
+def track_texture(texture, name, nbytes):
+    _textures[texture] = (name, nbytes)
+
+def forget_texture(texture):
+    _textures.pop(texture, None)
+
+def texture_bytes(w, h, mipmaps=True, channels=4, layers=1):
+    # a cadeia de mipmaps soma mais um terco
+    n = w * h * channels * layers
+    return n * 4 // 3 if mipmaps else n
+
+def mesh_cpu_bytes(mesh):
+    # copias pro picking e pro bake mais a bvh se ja foi construida
+    total = 0
+    for attr in ("positions", "normals", "indices"):
+        a = getattr(mesh, attr, None)
+        if a is not None: total += a.nbytes
+    bvh = getattr(mesh, "bvh", None)
+    if bvh is not None:
+        total += sum(a.nbytes for a in vars(bvh).values() if isinstance(a, np.ndarray))
+    return total
+
+def rss_bytes():
+    # residente agora so no linux pelo /proc
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_bytes():
+    # pico desde o inicio do processo o linux da em KB o macos em bytes
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _meshes(node, out, seen):
+    # cada malha uma vez mesmo partilhada por varios nos
+    mesh = node.mesh
+    if mesh is not None and id(mesh) not in seen:
+        seen.add(id(mesh))
+        out.append((node.name, mesh))
+    for c in node.children: _meshes(c, out, seen)
+    return out
+
+def scene_report(root, arena=None, textures=None):
+    # dicionario com as linhas por modelo malha e textura e os totais
+    report = {"models": [], "meshes": [], "textures": [], "pools": []}
+    for path, (parsed, kept) in sorted(_models.items()):
+        report["models"].append((os.path.basename(path), parsed, kept))
+    meshes = _meshes(root, [], set())
+    for name, m in meshes:
+        # um grupo do arena conta as copias dos membros e a bvh que e dele
+        cpu = mesh_cpu_bytes(m) + sum(mesh_cpu_bytes(x) for x in getattr(m, "meshes", []))
+        report["meshes"].append((name, cpu, m.gpu_bytes()))
+    if arena is not None:
+        for p in arena.pools:
+            report["pools"].append((p.used_bytes(), p.gpu_bytes()))
+    if textures is not None:
+        for path, nbytes in textures.texture_bytes().items():
+            report["textures"].append((os.path.basename(path), nbytes))
+    for name, nbytes in _textures.values():
+        report["textures"].append((os.path.basename(name), nbytes))
+
+    # malhas do arena ja estao dentro do que o pool reservou
+    gpu = sum(m.gpu_bytes() for _, m in meshes if getattr(m, "arena", None) is None)
+    gpu += sum(reserved for _, reserved in report["pools"])
+    gpu += sum(n for _, n in report["textures"])
+    if textures is not None: gpu += textures.staging_bytes()
+    report["cpu"] = sum(k for _, _, k in report["models"]) + sum(c for _, c, _ in report["meshes"])
+    report["gpu"] = gpu
+    report["rss"] = rss_bytes()
+    report["peak_rss"] = peak_rss_bytes()
+    return report
+
+def mb(n):
+    return "?" if n is None else f"{n / (1 << 20):.1f} MB"
+
+def format_report(report, top=8):
+    # resumo pra consola os totais e os maiores de cada tipo
+    lines = [f"Memoria: cpu {mb(report['cpu'])} gpu {mb(report['gpu'])} "
+             f"rss {mb(report['rss'])} pico {mb(report['peak_rss'])}"]
+    models = sorted(report["models"], key=lambda r: -r[1])
+    if models:
+        lines.append(f"  modelos {len(models)} parse {mb(sum(r[1] for r in models))} "
+                     f"ficou {mb(sum(r[2] for r in models))}")
+        for name, parsed, kept in models[:top]:
+            lines.append(f"    {name:<32} parse {mb(parsed):>9} ficou {mb(kept):>9}")
+    meshes = sorted(report["meshes"], key=lambda r: -(r[1] + r[2]))
+    if meshes:
+        lines.append(f"  malhas {len(meshes)} cpu {mb(sum(r[1] for r in meshes))} "
+                     f"gpu {mb(sum(r[2] for r in meshes))}")
+        for name, cpu, gpu in meshes[:top]:
+            lines.append(f"    {name:<32} cpu {mb(cpu):>9} gpu {mb(gpu):>9}")
+    for i, (used, reserved) in enumerate(report["pools"]):
+        lines.append(f"  pool {i} {mb(used)} usados de {mb(reserved)}")
+    textures = sorted(report["textures"], key=lambda r: -r[1])
+    if textures:
+        lines.append(f"  texturas {len(textures)} gpu {mb(sum(r[1] for r in textures))}")
+        for name, nbytes in textures[:top]:
+            lines.append(f"    {name:<32} gpu {mb(nbytes):>9}")
+    return "\n".join(lines)
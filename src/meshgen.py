@@ -0,0 +1,142 @@
+
+import numpy as np
+
+# geradores de malhas procedurais em numpy sem loops python
+# devolvem vertices interleaved x y z nx ny nz u v em float32 e indices uint32 com vertices partilhados
+# o create grid sphere cube do scene usam estes e o make mesh por cima
+
+def _pack(pos, nrm, uv):
+    # juntar os atributos num array N 8 achatado igual ao que o Mesh espera
+    out = np.empty((len(pos), 8), dtype=np.float32)
+    out[:, 0:3] = pos
+    out[:, 3:6] = nrm
+    out[:, 6:8] = uv
+    return out.reshape(-1)
+
+def grid_indices(rows, cols):
+    # dois triangulos por celula de uma grelha de (rows+1) por (cols+1) vertices linha a linha
+    # celula a b c d tipo a=(r,c) b=(r,c+1) c=(r+1,c+1) d=(r+1,c) triangulos a b c e a c d
+    r = np.arange(rows, dtype=np.uint32)[:, None]
+    c = np.arange(cols, dtype=np.uint32)[None, :]
+    a = r * (cols + 1) + c
+    b = a + 1
+    d = a + (cols + 1)
+    cc = d + 1
+    return np.stack([a, b, cc, a, cc, d], axis=-1).reshape(-1).astype(np.uint32)
+
+def plane(width=1.0, depth=1.0, seg_x=1, seg_z=1, uv_scale=(1.0, 1.0)):
+    # plano em y 0 centrado na origem virado pra cima com subdivisao qualquer
+    # u vai com x e v com z ambos de 0 a uv scale
+    # escreve direto no array final por colunas sem stacks intermedios pra grelhas de milhoes de vertices
+    nx, nz = seg_x + 1, seg_z + 1
+    i = np.arange(nx, dtype=np.float64)
+    j = np.arange(nz, dtype=np.float64)
+    out = np.zeros((nx, nz, 8), dtype=np.float32) # linha e o i em x coluna o j em z
+    out[:, :, 0] = (-width * 0.5 + i * (width / seg_x))[:, None]
+    out[:, :, 2] = (-depth * 0.5 + j * (depth / seg_z))[None, :]
+    out[:, :, 4] = 1.0
+    out[:, :, 6] = (i * (uv_scale[0] / seg_x))[:, None]
+    out[:, :, 7] = (j * (uv_scale[1] / seg_z))[None, :]
+
+    # celula a=(i,j) b=(i,j+1) c=(i+1,j+1) d=(i+1,j)
+    # triangulos a b d e d b c com a mesma diagonal e ordem da grelha antiga
+    a = (np.arange(seg_x, dtype=np.uint32)[:, None] * np.uint32(nz) + np.arange(seg_z, dtype=np.uint32)[None, :])
+    indices = np.empty((seg_x, seg_z, 6), dtype=np.uint32)
+    indices[:, :, 0] = a
+    indices[:, :, 1] = a + 1
+    indices[:, :, 2] = a + nz
+    indices[:, :, 3] = indices[:, :, 2]
+    indices[:, :, 4] = indices[:, :, 1]
+    indices[:, :, 5] = indices[:, :, 2] + 1
+    return out.reshape(-1), indices.reshape(-1)
+
+def grid(size=100, tiles=20):
+    # chao quadrado com a textura repetida uma vez por tile
+    return plane(size, size, tiles, tiles, uv_scale=(tiles, tiles))
+
+def sphere(radius=1.0, stacks=32, slices=32):
+    # mesma ordem de vertices e triangulos do gerador antigo
+    phi = np.pi * np.arange(stacks + 1, dtype=np.float64) / stacks
+    theta = 2.0 * np.pi * np.arange(slices + 1, dtype=np.float64) / slices
+    P, T = np.meshgrid(phi, theta, indexing='ij')
+    nrm = np.stack([np.sin(P) * np.cos(T), np.cos(P), np.sin(P) * np.sin(T)], axis=-1).reshape(-1, 3)
+    pos = nrm * radius
+    uv = np.stack(np.meshgrid(np.arange(stacks + 1) / stacks, np.arange(slices + 1) / slices, indexing='ij')[::-1],
+                  axis=-1).reshape(-1, 2)
+
+    first = (np.arange(stacks, dtype=np.uint32)[:, None] * (slices + 1) + np.arange(slices, dtype=np.uint32)[None, :])
+    second = first + slices + 1
+    indices = np.stack([first, second, first + 1, second, second + 1, first + 1], axis=-1).reshape(-1)
+    return _pack(pos, nrm, uv), indices.astype(np.uint32)
+
+# faces do cubo tipo canto de origem eixo u eixo v e normal todos pra meio lado 1
+_CUBE_FACES = [
+    ((-1, -1,  1), ( 1, 0,  0), (0, 1,  0), ( 0,  0,  1)), # frente
+    (( 1, -1, -1), (-1, 0,  0), (0, 1,  0), ( 0,  0, -1)), # tras
+    ((-1,  1,  1), ( 1, 0,  0), (0, 0, -1), ( 0,  1,  0)), # cima
+    ((-1, -1, -1), ( 1, 0,  0), (0, 0,  1), ( 0, -1,  0)), # baixo
+    (( 1, -1,  1), ( 0, 0, -1), (0, 1,  0), ( 1,  0,  0)), # direita
+    ((-1, -1, -1), ( 0, 0,  1), (0, 1,  0), (-1,  0,  0)), # esquerda
+]
+
+def cube(size=1.0, segments=1):
+    # cubo com cada face subdividida em segments por segments quads e uv de 0 a 1 por face
+    s = size * 0.5
+    n = segments + 1
+    t = np.arange(n, dtype=np.float32) / segments
+    V, U = np.meshgrid(t, t, indexing='ij') # linha em v coluna em u
+    U, V = U.ravel(), V.ravel()
+
+    faces = np.array(_CUBE_FACES, dtype=np.float32) # 6 4 3
+    origin, du, dv, normal = faces[:, 0] * s, faces[:, 1] * size, faces[:, 2] * size, faces[:, 3]
+    pos = origin[:, None] + U[None, :, None] * du[:, None] + V[None, :, None] * dv[:, None]
+    nrm = np.broadcast_to(normal[:, None], pos.shape)
+    uv = np.broadcast_to(np.stack([U, V], axis=1), (6, n * n, 2))
+
+    base = grid_indices(segments, segments)
+    indices = (base[None, :] + (np.arange(6, dtype=np.uint32) * (n * n))[:, None]).reshape(-1)
+    return _pack(pos.reshape(-1, 3), nrm.reshape(-1, 3), uv.reshape(-1, 2)), indices.astype(np.uint32)
+
+def cylinder(radius=1.0, height=2.0, slices=32, stacks=1, caps=True):
+    # cilindro no eixo y centrado na origem com tampas opcionais
+    theta = 2.0 * np.pi * np.arange(slices + 1, dtype=np.float64) / slices
+    y = height * 0.5 - height * np.arange(stacks + 1, dtype=np.float64) / stacks
+    Y, T = np.meshgrid(y, theta, indexing='ij')
+    nrm = np.stack([np.cos(T), np.zeros_like(T), np.sin(T)], axis=-1).reshape(-1, 3)
+    pos = np.stack([radius * np.cos(T), Y, radius * np.sin(T)], axis=-1).reshape(-1, 3)
+    uv = np.stack(np.meshgrid(np.arange(stacks + 1) / stacks, np.arange(slices + 1) / slices, indexing='ij')[::-1],
+                  axis=-1).reshape(-1, 2)
+    # padrao de indices da esfera com a costura duplicada pra o u fechar em 1
+    # mas com o sentido trocado pra as faces do lado olharem pra fora
+    first = (np.arange(stacks, dtype=np.uint32)[:, None] * (slices + 1) + np.arange(slices, dtype=np.uint32)[None, :])
+    second = first + slices + 1
+    side = np.stack([first, first + 1, second, second, first + 1, second + 1], axis=-1).reshape(-1)
+    parts = [(pos, nrm, uv, side)]
+
+    if caps:
+        ring = np.stack([np.cos(theta[:-1]), np.sin(theta[:-1])], axis=1)
+        k = np.arange(slices, dtype=np.uint32)
+        for sign in (1.0, -1.0):
+            c_pos = np.zeros((slices + 1, 3))
+            c_pos[1:, 0] = radius * ring[:, 0]
+            c_pos[1:, 2] = radius * ring[:, 1]
+            c_pos[:, 1] = sign * height * 0.5
+            c_nrm = np.broadcast_to([0.0, sign, 0.0], c_pos.shape)
+            c_uv = np.vstack([[0.5, 0.5], ring * 0.5 + 0.5])
+            a, b = k + 1, (k + 1) % slices + 1
+            # em cima anda no sentido contrario pra a face olhar pra cima
+            tris = np.stack([np.zeros(slices, dtype=np.uint32), b, a] if sign > 0 else
+                            [np.zeros(slices, dtype=np.uint32), a, b], axis=-1).reshape(-1)
+            parts.append((c_pos, c_nrm, c_uv, tris))
+
+    verts, indices, offset = [], [], 0
+    for p, nm, tc, idx in parts:
+        verts.append(_pack(p, nm, tc))
+        indices.append(idx.astype(np.uint32) + np.uint32(offset))
+        offset += len(p)
+    return np.concatenate(verts), np.concatenate(indices)
+
+def expand(vertices, indices):
+    # sopa de triangulos N 3 8 pra comparar malhas com indices diferentes
+    v = np.asarray(vertices, dtype=np.float32).reshape(-1, 8)
+    return v[np.asarray(indices, dtype=np.int64)].reshape(-1, 3, 8)
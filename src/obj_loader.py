@@ -1,40 +1,61 @@
 
+import io
 import os
 import sys
 import math
 import numpy as np
 from PIL import Image
 from OpenGL.GL import *
-from scene import Mesh, Node
+from scene import Mesh, Node, make_mesh
+from material import Material
+import memory
 
 class OBJModel:
-    def __init__(self, filename):
+    def __init__(self, filename, textures=None, parse_only=False):
+        # textures e um TextureStreamer opcional sem ele as texturas carregam na hora
+        # parse only nao toca no gl tipo pro bundler so ficam os caminhos das texturas
+        self.textures = textures
+        self.parse_only = parse_only
         self.vertices = []
         self.normals = []
         self.texcoords = []
         self.faces = []
         self.materials = {}
+        self.mtl_files = [] # mtl lidos pra saber que obj recarregar quando um muda
         self.batches = []
+        self.bounds = None  # limites guardados pra sobreviverem ao release_geometry
+        self.released = False
         
         self._load_obj(filename)
         # adiar construcao de malhas ate depois da centralizacao opcional
 
     def get_center(self):
-        if not self.vertices: return (0,0,0)
+        if self.bounds is None and not self.vertices: return (0,0,0)
         # calcular centro
-        min_v = np.min(self.vertices, axis=0)
-        max_v = np.max(self.vertices, axis=0)
+        min_v, max_v = self.get_bounds()
         center = (min_v + max_v) / 2.0
         return center
 
     def get_bounds(self):
-        if not self.vertices: return (0,0,0), (0,0,0)
-        min_v = np.min(self.vertices, axis=0)
-        max_v = np.max(self.vertices, axis=0)
-        return min_v, max_v
+        if self.bounds is None:
+            if not self.vertices: return (0,0,0), (0,0,0)
+            V = np.asarray(self.vertices, dtype=np.float64)
+            self.bounds = (V.min(axis=0), V.max(axis=0))
+        return self.bounds
 
-    def build(self):
-        self._build_meshes()
+    def build(self, arena=None):
+        self._build_meshes(arena)
+
+    def release_geometry(self):
+        # depois do build as listas do parse ja estao nos buffers da gpu e so ocupam memoria
+        # ficam os limites e as malhas com a copia compacta que o picking e o bake usam
+        # o build nao pode ser chamado outra vez depois disto
+        self.get_bounds()
+        self.vertices = []
+        self.normals = []
+        self.texcoords = []
+        self.faces = []
+        self.released = True
 
     def _load_obj(self, filename):
         base_dir = os.path.dirname(filename)
@@ -88,6 +109,7 @@ class OBJModel:
     def _load_mtl(self, filename):
         base_dir = os.path.dirname(filename)
         current = None
+        self.mtl_files.append(filename)
         try:
             with open(filename, "r") as f:
                 for line in f:
@@ -100,14 +122,17 @@ class OBJModel:
                         current["diffuse"] = tuple(map(float, line.split()[1:4]))
                     elif line.startswith("map_Kd") and current:
                         tex_path = os.path.join(base_dir, line.split(None, 1)[1].strip())
-                        current["texture"] = self._load_texture(tex_path)
+                        current["texture_path"] = tex_path
+                        if not self.parse_only: current["texture"] = self._load_texture(tex_path)
         except OSError:
             pass
 
-    def _load_texture(self, path):
-        if not os.path.isfile(path): return None
+    def _load_texture(self, path, data=None):
+        # data sao os bytes do jpg ou png quando a imagem vem dentro de outro ficheiro tipo glb
+        if self.textures is not None: return self.textures.request(path, data=data)
+        if data is None and not os.path.isfile(path): return None
         try:
-            img = Image.open(path)
+            img = Image.open(io.BytesIO(data) if data is not None else path)
             img = img.transpose(Image.FLIP_TOP_BOTTOM).convert("RGBA")
             data = img.tobytes()
             w, h = img.size
@@ -118,12 +143,26 @@ class OBJModel:
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
             glGenerateMipmap(GL_TEXTURE_2D)
+            memory.track_texture(tex_id, path, memory.texture_bytes(w, h))
             return tex_id
         except Exception as e:
             print(f"Texture error {path}: {e}")
             return None
 
-    def _build_meshes(self):
+    def triangles(self):
+        # triangulos N 3 3 das faces pra colisao
+        if self.released:
+            # sem as faces saem das copias das malhas mesmos triangulos agrupados por material
+            tris = [b["mesh"].positions[b["mesh"].indices].reshape(-1, 3, 3) for b in self.batches
+                    if getattr(b["mesh"], "positions", None) is not None]
+            return np.concatenate(tris) if tris else np.zeros((0, 3, 3), dtype=np.float32)
+        if not self.faces: return np.zeros((0, 3, 3), dtype=np.float32)
+        V = np.asarray(self.vertices, dtype=np.float32)
+        idx = np.array([[v[0] for v in f["verts"]] for f in self.faces], dtype=np.int64)
+        return V[idx]
+
+    def batch_arrays(self):
+        # vertices interleaved e indices por material sem criar buffers
         temp_batches = {}
         
         for face in self.faces:
@@ -143,13 +182,17 @@ class OBJModel:
                 u, v = self.texcoords[vt_idx] if vt_idx >= 0 else (0, 0)
                 temp_batches[mat].extend([px, py, pz, nx, ny, nz, u, v])
 
+        out = []
         for mat_name, data in temp_batches.items():
             arr = np.array(data, dtype=np.float32)
             indices = np.arange(len(data)//8, dtype=np.uint32)
-            
             mat_data = self.materials.get(mat_name, {"diffuse": (0.8, 0.8, 0.8), "texture": None})
-            
-            mesh = Mesh(arr, indices, texture_id=mat_data["texture"])
+            out.append((mat_data, arr, indices))
+        return out
+
+    def _build_meshes(self, arena=None):
+        for mat_data, arr, indices in self.batch_arrays():
+            mesh = make_mesh(arr, indices, texture_id=mat_data["texture"], arena=arena)
             self.batches.append({
                 "mesh": mesh,
                 "material": mat_data
@@ -161,6 +204,6 @@ class OBJModel:
             mat = batch["material"]
             # create a child node for each material batch
             child = Node(name + "_Mesh", mesh=batch["mesh"], 
-                         material_diffuse=mat["diffuse"])
+                         material=Material(name + "_Mesh", diffuse=mat["diffuse"]))
             root.add(child)
         return root
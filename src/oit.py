@@ -0,0 +1,166 @@
+
+import numpy as np
+from OpenGL.GL import *
+from scene import draw_queue
+from shader import link_program
+import memory
+
+# transparencia independente da ordem tipo weighted blended oit do mcguire e bavoil
+# os vidros vao pra dois alvos com blend aditivo e no fim um passe compoe tudo por cima dos opacos
+# nao ha ordenacao no cpu e o resultado e o mesmo pra qualquer ordem dos draws
+# o gl 3.3 nao tem glBlendFunci por isso usa um so glBlendFuncSeparate pros dois alvos
+#   alvo 0 rgba16f rgb soma cor vezes alpha vezes peso e o alpha fica o produto de 1 menos alpha
+#   alvo 1 r16f soma alpha vezes peso pra normalizar
+# a profundidade dos opacos e copiada por blit os vidros testam contra ela sem escrever
+# os alvos so crescem assim a resolucao dinamica a mudar de escala nao realoca nada
+
+COMPOSITE_VS = r"""
+#version 330 core
+out vec2 vUV;
+void main(){
+    // triangulo que cobre o ecra sem vertex buffer
+    vec2 p = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    vUV = p;
+    gl_Position = vec4(p * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+COMPOSITE_FS = r"""
+#version 330 core
+uniform sampler2D uAccum;
+uniform sampler2D uWeight;
+out vec4 fragColor;
+void main(){
+    ivec2 p = ivec2(gl_FragCoord.xy);
+    vec4 accum = texelFetch(uAccum, p, 0);
+    float revealage = accum.a;
+    // nenhum vidro neste pixel
+    if (revealage >= 1.0) discard;
+    float weight = texelFetch(uWeight, p, 0).r;
+    vec3 color = accum.rgb / max(weight, 1e-5);
+    // o blend normal da cena faz cor vezes 1 menos revealage mais o que ja la estava vezes revealage
+    fragColor = vec4(color, 1.0 - revealage);
+}
+"""
+
+def _attachment_param(attachment, pname):
+    value = glGetFramebufferAttachmentParameteriv(GL_READ_FRAMEBUFFER, attachment, pname)
+    return 0 if value is None else int(np.ravel(value)[0])
+
+def depth_format(fbo):
+    # formato do depth de um fbo o blit de profundidade so funciona com formatos iguais
+    # o framebuffer da janela tem nomes proprios pros anexos
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, fbo)
+    depth = GL_DEPTH if fbo == 0 else GL_DEPTH_ATTACHMENT
+    stencil = GL_STENCIL if fbo == 0 else GL_DEPTH_ATTACHMENT
+    bits = _attachment_param(depth, GL_FRAMEBUFFER_ATTACHMENT_DEPTH_SIZE)
+    stencil_bits = _attachment_param(stencil, GL_FRAMEBUFFER_ATTACHMENT_STENCIL_SIZE)
+    is_float = _attachment_param(depth, GL_FRAMEBUFFER_ATTACHMENT_COMPONENT_TYPE) == GL_FLOAT
+    if stencil_bits:
+        return GL_DEPTH32F_STENCIL8 if is_float else GL_DEPTH24_STENCIL8
+    if is_float: return GL_DEPTH_COMPONENT32F
+    return {16: GL_DEPTH_COMPONENT16, 32: GL_DEPTH_COMPONENT32}.get(bits, GL_DEPTH_COMPONENT24)
+
+class WeightedOIT:
+    def __init__(self):
+        self.fbo = glGenFramebuffers(1)
+        self.accum = glGenTextures(1)
+        self.weight = glGenTextures(1)
+        self.depth = glGenRenderbuffers(1)
+        self.width = 0
+        self.height = 0
+        self.depth_format = None
+        self.formats = {}  # fbo de destino pro formato do depth perguntado uma vez
+        self.draws = 0
+        self.frames = 0
+
+        self.prog = link_program(COMPOSITE_VS, COMPOSITE_FS)
+        glUseProgram(self.prog)
+        glUniform1i(glGetUniformLocation(self.prog, "uAccum"), 0)
+        glUniform1i(glGetUniformLocation(self.prog, "uWeight"), 1)
+        glUseProgram(0)
+        # vao vazio o triangulo sai do gl_VertexID como no ceu
+        self.vao = glGenVertexArrays(1)
+
+    def _texture(self, tex, internal, fmt, width, height):
+        glBindTexture(GL_TEXTURE_2D, tex)
+        glTexImage2D(GL_TEXTURE_2D, 0, internal, width, height, 0, fmt, GL_HALF_FLOAT, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def _ensure(self, width, height, depth_format):
+        # so realoca se o pedido nao cabe ou o depth do destino mudou de formato
+        if width <= self.width and height <= self.height and depth_format == self.depth_format: return
+        width, height = max(width, self.width), max(height, self.height)
+        self.width, self.height, self.depth_format = width, height, depth_format
+        self._texture(self.accum, GL_RGBA16F, GL_RGBA, width, height)
+        self._texture(self.weight, GL_R16F, GL_RED, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, depth_format, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.accum, 0)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT1, GL_TEXTURE_2D, self.weight, 0)
+        attachment = GL_DEPTH_STENCIL_ATTACHMENT if depth_format in (GL_DEPTH24_STENCIL8, GL_DEPTH32F_STENCIL8) \
+                     else GL_DEPTH_ATTACHMENT
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, self.depth)
+        glDrawBuffers(2, [GL_COLOR_ATTACHMENT0, GL_COLOR_ATTACHMENT1])
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer do oit incompleto: {status:#x}")
+        # rgba16f mais r16f mais o depth de 4 bytes
+        memory.track_texture(self.accum, "oit", width * height * (8 + 2 + 4))
+
+    def draw(self, shader, queue, VP, width, height):
+        # queue so com os transparentes desenha e compoe no fbo que estava ligado
+        if not queue: return
+        target = int(glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING))
+        fmt = self.formats.get(target)
+        if fmt is None: fmt = self.formats[target] = depth_format(target)
+        self._ensure(width, height, fmt)
+
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, target)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.fbo)
+        glBlitFramebuffer(0, 0, width, height, 0, 0, width, height, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, width, height)
+        glClearBufferfv(GL_COLOR, 0, (0.0, 0.0, 0.0, 1.0))
+        glClearBufferfv(GL_COLOR, 1, (0.0, 0.0, 0.0, 0.0))
+
+        glBlendFuncSeparate(GL_ONE, GL_ONE, GL_ZERO, GL_ONE_MINUS_SRC_ALPHA)
+        shader.use()
+        shader.set_oit(True)
+        draw_queue(shader, queue, VP)
+        shader.set_oit(False)
+
+        # composicao por cima dos opacos com o blend normal da cena
+        glBindFramebuffer(GL_FRAMEBUFFER, target)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDisable(GL_DEPTH_TEST)
+        glDepthMask(GL_FALSE)
+        glUseProgram(self.prog)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.accum)
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, self.weight)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, 3)
+        glBindVertexArray(0)
+        glDepthMask(GL_TRUE)
+        glEnable(GL_DEPTH_TEST)
+        # as unidades 0 e 1 sao as mesmas da shader da cena
+        shader.invalidate_textures()
+        shader.use()
+        self.draws += len(queue)
+        self.frames += 1
+
+    def destroy(self):
+        memory.forget_texture(self.accum)
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteTextures([self.accum, self.weight])
+        glDeleteRenderbuffers(1, [self.depth])
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteProgram(self.prog)
@@ -0,0 +1,73 @@
+
+import time
+
+# ritmo dos frames da janela tipo limite de fps e modo parado
+# o limite dorme com time sleep ate perto do prazo e acaba a rodar pra nao passar por causa da granularidade do so
+# a margem da rotacao aprende o atraso real do sleep deste sistema
+# parado quer dizer nada a mexer e sem input ai bloqueia nos eventos da janela em vez de redesenhar a mesma imagem
+
+def sleep_until(deadline, margin):
+    # devolve quanto o sleep passou do pedido pra afinar a margem
+    oversleep = 0.0
+    remaining = deadline - time.perf_counter()
+    if remaining > margin:
+        want = remaining - margin
+        start = time.perf_counter()
+        time.sleep(want)
+        oversleep = time.perf_counter() - start - want
+    while time.perf_counter() < deadline:
+        pass
+    return oversleep
+
+class FramePacer:
+    def __init__(self, max_fps=0, idle_timeout=0.5, margin=0.002):
+        self.period = 1.0 / max_fps if max_fps > 0 else 0.0  # zero sem limite fica o vsync se houver
+        self.idle_timeout = idle_timeout                        # zero desliga o modo parado
+        self.margin = margin
+        self.next = None
+        self.frames = 0
+        self.late = 0
+        self.paced = 0
+        self.error = 0.0           # soma de quanto cada frame acabou depois do prazo
+        self.idle_waits = 0
+        self.idle_time = 0.0
+        self.skipped = 0
+        self.start = time.perf_counter()
+
+    def pace(self):
+        # chamar depois do swap espera pelo prazo do frame seguinte
+        self.frames += 1
+        if not self.period: return
+        now = time.perf_counter()
+        if self.next is None:
+            self.next = now + self.period
+            return
+        if now > self.next:
+            # atrasado nao tenta recuperar com frames seguidos recomeca a grelha agora
+            self.late += 1
+            self.next = now + self.period
+            return
+        oversleep = sleep_until(self.next, self.margin)
+        self.error += time.perf_counter() - self.next
+        self.paced += 1
+        # margem segue o pior atraso recente do sleep com um minimo e um maximo
+        self.margin = min(0.004, max(0.0005, self.margin * 0.9, oversleep * 1.5))
+        self.next += self.period
+
+    def wait_idle(self, wait_events_timeout):
+        # bloqueia nos eventos da janela acorda com input ou ao fim do timeout pra ver o hot reload
+        start = time.perf_counter()
+        wait_events_timeout(self.idle_timeout)
+        self.idle_time += time.perf_counter() - start
+        self.idle_waits += 1
+        # o prazo antigo ja nao conta depois de parado
+        self.next = None
+
+    def format_stats(self):
+        total = time.perf_counter() - self.start
+        text = (f"Ritmo: {self.frames} frames em {total:.1f} s "
+                f"parado {self.idle_time:.1f} s ({self.idle_waits} esperas {self.skipped} frames saltados)")
+        if self.period:
+            err = self.error / self.paced * 1000.0 if self.paced else 0.0
+            text += f" limite {1.0 / self.period:.0f} fps {self.late} atrasados erro medio {err:.3f} ms"
+        return text
@@ -0,0 +1,238 @@
+
+import numpy as np
+
+# picking por raio tipo clicar numa porta ou portao
+# primeiro as caixas world de todos os nos de uma vez depois a bvh de cada malha candidata
+# os triangulos sao testados em lote com moller trumbore
+
+LEAF_SIZE = 16
+
+def ray_from_screen(x, y, width, height, VP):
+    # raio em world a partir de um pixel desprojetando os planos near e far com a inversa do VP
+    inv = np.linalg.inv(np.asarray(VP, dtype=np.float64))
+    nx = 2.0 * x / width - 1.0
+    ny = 1.0 - 2.0 * y / height
+    near = inv @ np.array([nx, ny, -1.0, 1.0])
+    far = inv @ np.array([nx, ny, 1.0, 1.0])
+    near = near[:3] / near[3]
+    far = far[:3] / far[3]
+    direction = far - near
+    return near, direction / np.linalg.norm(direction)
+
+def _inv_dir(direction):
+    # componentes a zero viram um numero enorme pra os slabs nao darem nan
+    d = np.where(np.abs(direction) < 1e-30, 1e-30, direction)
+    return 1.0 / d
+
+def ray_aabb(origin, inv_dir, mins, maxs):
+    # teste de slabs contra N caixas devolve t de entrada e se acertou
+    t0 = (mins - origin) * inv_dir
+    t1 = (maxs - origin) * inv_dir
+    t_near = np.max(np.minimum(t0, t1), axis=-1)
+    t_far = np.min(np.maximum(t0, t1), axis=-1)
+    return t_near, t_far >= np.maximum(t_near, 0.0)
+
+def _cross(a, b):
+    # produto externo sem o overhead do np cross pra arrays pequenos
+    return np.stack([a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1],
+                     a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2],
+                     a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]], axis=-1)
+
+def ray_triangles(origin, direction, v0, e1, e2, eps=1e-9):
+    # moller trumbore em lote sem back face culling igual ao render
+    # um raio contra N triangulos ou N pares raio triangulo
+    p = _cross(direction, e2)
+    det = np.einsum('ij,ij->i', e1, p)
+    ok = np.abs(det) > eps
+    inv = 1.0 / np.where(ok, det, 1.0)
+    s = origin - v0
+    u = np.einsum('ij,ij->i', s, p) * inv
+    q = _cross(s, e1)
+    v = np.sum(q * direction, axis=-1) * inv
+    t = np.einsum('ij,ij->i', e2, q) * inv
+    hit = ok & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > eps)
+    return np.where(hit, t, np.inf)
+
+def mesh_triangles(mesh):
+    # triangulos N 3 3 no espaco local da malha um grupo junta os dos membros
+    members = getattr(mesh, "meshes", None)
+    if members is not None:
+        parts = [mesh_triangles(m) for m in members]
+        parts = [p for p in parts if p is not None]
+        return np.concatenate(parts) if parts else None
+    positions = getattr(mesh, "positions", None)
+    if positions is None: return None
+    return positions[mesh.indices[:len(mesh.indices) // 3 * 3]].reshape(-1, 3, 3)
+
+class MeshBVH:
+    # bvh binaria com divisao pela mediana dos centroides no eixo maior
+    # a travessia e feita por niveis tipo todos os nos de um nivel testados de uma vez
+    def __init__(self, tris, leaf_size=LEAF_SIZE):
+        tris = np.asarray(tris, dtype=np.float32).reshape(-1, 3, 3)
+        tri_min = tris.min(axis=1)
+        tri_max = tris.max(axis=1)
+        centroids = (tri_min + tri_max) * 0.5
+        order = np.arange(len(tris))
+
+        mins, maxs, left, right, start, count = [], [], [], [], [], []
+        def new_node(lo, hi):
+            idx = order[lo:hi]
+            mins.append(tri_min[idx].min(axis=0) if hi > lo else np.zeros(3, dtype=np.float32))
+            maxs.append(tri_max[idx].max(axis=0) if hi > lo else np.zeros(3, dtype=np.float32))
+            left.append(-1); right.append(-1)
+            start.append(lo); count.append(hi - lo)
+            return len(mins) - 1
+
+        stack = [(new_node(0, len(tris)), 0, len(tris))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo <= leaf_size: continue
+            idx = order[lo:hi]
+            c = centroids[idx]
+            axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+            mid = (hi - lo) // 2
+            part = np.argpartition(c[:, axis], mid)
+            order[lo:hi] = idx[part]
+            l = new_node(lo, lo + mid)
+            r = new_node(lo + mid, hi)
+            left[node] = l; right[node] = r
+            stack.append((l, lo, lo + mid))
+            stack.append((r, lo + mid, hi))
+
+        self.mins = np.array(mins, dtype=np.float32).reshape(-1, 3)
+        self.maxs = np.array(maxs, dtype=np.float32).reshape(-1, 3)
+        self.left = np.array(left, dtype=np.int64)
+        self.right = np.array(right, dtype=np.int64)
+        self.start = np.array(start, dtype=np.int64)
+        self.count = np.array(count, dtype=np.int64)
+        self.order = order
+
+        # triangulos reordenados pela bvh ja com as arestas pro moller trumbore
+        sorted_tris = tris[order].astype(np.float64)
+        self.v0 = sorted_tris[:, 0]
+        self.e1 = sorted_tris[:, 1] - sorted_tris[:, 0]
+        self.e2 = sorted_tris[:, 2] - sorted_tris[:, 0]
+
+    def intersect(self, origin, direction, t_max=np.inf):
+        # devolve t e o indice do triangulo original mais perto ou None
+        if len(self.v0) == 0: return None
+        inv_dir = _inv_dir(direction)
+        frontier = np.zeros(1, dtype=np.int64)
+        leaves = []
+        while frontier.size:
+            t_near, hit = ray_aabb(origin, inv_dir, self.mins[frontier], self.maxs[frontier])
+            frontier = frontier[hit & (t_near <= t_max)]
+            is_leaf = self.left[frontier] < 0
+            leaves.append(frontier[is_leaf])
+            inner = frontier[~is_leaf]
+            frontier = np.concatenate([self.left[inner], self.right[inner]])
+
+        leaves = np.concatenate(leaves)
+        if leaves.size == 0: return None
+        # juntar os intervalos de triangulos das folhas acertadas num so array de indices
+        counts = self.count[leaves]
+        total = int(counts.sum())
+        if total == 0: return None
+        idx = np.repeat(self.start[leaves] - np.cumsum(counts) + counts, counts) + np.arange(total)
+        t = ray_triangles(origin, direction, self.v0[idx], self.e1[idx], self.e2[idx])
+        i = int(np.argmin(t))
+        if not t[i] < t_max: return None
+        return float(t[i]), int(self.order[idx[i]])
+
+    def intersect_many(self, origins, directions, t_max=np.inf):
+        # pacote de raios tipo pares raio no expandidos nivel a nivel
+        # devolve pra cada raio o t mais perto inf se falhou e o triangulo original ou menos 1
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        R = len(origins)
+        best_t = np.full(R, np.inf)
+        best_tri = np.full(R, -1, dtype=np.int64)
+        if R == 0 or len(self.v0) == 0: return best_t, best_tri
+        t_max = np.broadcast_to(np.asarray(t_max, dtype=np.float64), (R,))
+        inv_dir = _inv_dir(directions)
+
+        rays = np.arange(R)
+        nodes = np.zeros(R, dtype=np.int64)
+        leaf_rays, leaf_nodes = [], []
+        while rays.size:
+            t_near, hit = ray_aabb(origins[rays], inv_dir[rays], self.mins[nodes], self.maxs[nodes])
+            keep = hit & (t_near <= t_max[rays])
+            rays, nodes = rays[keep], nodes[keep]
+            is_leaf = self.left[nodes] < 0
+            leaf_rays.append(rays[is_leaf])
+            leaf_nodes.append(nodes[is_leaf])
+            r_in, n_in = rays[~is_leaf], nodes[~is_leaf]
+            rays = np.concatenate([r_in, r_in])
+            nodes = np.concatenate([self.left[n_in], self.right[n_in]])
+
+        rays = np.concatenate(leaf_rays)
+        nodes = np.concatenate(leaf_nodes)
+        counts = self.count[nodes]
+        total = int(counts.sum())
+        if total == 0: return best_t, best_tri
+        pair_rays = np.repeat(rays, counts)
+        tri = np.repeat(self.start[nodes] - np.cumsum(counts) + counts, counts) + np.arange(total)
+        t = ray_triangles(origins[pair_rays], directions[pair_rays], self.v0[tri], self.e1[tri], self.e2[tri])
+        t = np.where(t < t_max[pair_rays], t, np.inf)
+        np.minimum.at(best_t, pair_rays, t)
+        won = np.isfinite(t) & (t == best_t[pair_rays])
+        best_tri[pair_rays[won]] = self.order[tri[won]]
+        return best_t, best_tri
+
+def mesh_bvh(mesh):
+    # bvh construida na primeira vez que a malha e testada e guardada nela
+    bvh = getattr(mesh, "bvh", None)
+    if bvh is None:
+        tris = mesh_triangles(mesh)
+        if tris is None: return None
+        bvh = MeshBVH(tris)
+        mesh.bvh = bvh
+    return bvh
+
+class PickHit:
+    def __init__(self, node, distance, triangle, point):
+        self.node = node
+        self.distance = distance
+        self.triangle = triangle
+        self.point = point
+
+def world_bounds(queue):
+    # caixas world de todos os nos da fila tipo centro transformado e extensao com abs da matriz
+    worlds = np.stack([w for w, _ in queue])
+    mins = np.array([n.mesh.aabb[0] for _, n in queue], dtype=np.float32)
+    maxs = np.array([n.mesh.aabb[1] for _, n in queue], dtype=np.float32)
+    center = (mins + maxs) * 0.5
+    extent = (maxs - mins) * 0.5
+    c = np.einsum('nij,nj->ni', worlds[:, :3, :3], center) + worlds[:, :3, 3]
+    e = np.einsum('nij,nj->ni', np.abs(worlds[:, :3, :3]), extent)
+    return c - e, c + e
+
+def pick(queue, origin, direction, max_distance=np.inf):
+    # queue igual a do Node collect tipo world e no
+    if not queue: return None
+    origin = np.asarray(origin, dtype=np.float64)
+    direction = np.asarray(direction, dtype=np.float64)
+    mins, maxs = world_bounds(queue)
+    t_near, hit = ray_aabb(origin, _inv_dir(direction), mins, maxs)
+    candidates = np.nonzero(hit)[0]
+    # do mais perto pro mais longe pra parar cedo
+    candidates = candidates[np.argsort(t_near[candidates])]
+
+    best = None
+    best_t = max_distance
+    for k in candidates:
+        if t_near[k] > best_t: break
+        world, node = queue[k]
+        bvh = mesh_bvh(node.mesh)
+        if bvh is None: continue
+        # raio pro espaco local sem normalizar assim o t e o mesmo que em world
+        inv = np.linalg.inv(world.astype(np.float64))
+        local_origin = inv[:3, :3] @ origin + inv[:3, 3]
+        local_dir = inv[:3, :3] @ direction
+        res = bvh.intersect(local_origin, local_dir, best_t)
+        if res is not None and res[0] < best_t:
+            best_t = res[0]
+            best = (node, res[1])
+
+    if best is None: return None
+    return PickHit(best[0], best_t, best[1], origin + direction * best_t)
@@ -0,0 +1,184 @@
+
+import time
+import json
+from collections import deque
+from OpenGL.GL import *
+
+# profiler por frame com scopes aninhados
+# cpu com perf counter e gpu com timestamps lidos uns frames depois pra nao parar o pipeline
+# nota time elapsed nao pode ser aninhado por isso cada scope usa um par de glQueryCounter
+
+class _NullScope:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_SCOPE = _NullScope()
+
+class _Scope:
+    def __init__(self, profiler, name, gpu):
+        self.profiler = profiler
+        self.name = name
+        self.gpu = gpu
+
+    def __enter__(self):
+        p = self.profiler
+        self.depth = p.depth
+        p.depth += 1
+        self.queries = None
+        if self.gpu and p.gpu:
+            self.queries = (p._query(), p._query())
+            glQueryCounter(self.queries[0], GL_TIMESTAMP)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        p = self.profiler
+        if self.queries is not None:
+            glQueryCounter(self.queries[1], GL_TIMESTAMP)
+        p.depth -= 1
+        p.events.append([self.name, self.depth, self.start, end, self.queries, None])
+        return False
+
+class FrameProfiler:
+    def __init__(self, enabled=True, gpu=True, latency=3, history=120, max_trace_frames=2000):
+        self._enabled = enabled
+        self.gpu = gpu
+        self.latency = latency
+        self.history = deque(maxlen=history)
+        self.trace = deque(maxlen=max_trace_frames)
+        self.free_queries = []
+        self.pending = deque()
+        self.events = []
+        self.depth = 0
+        self.frame_index = 0
+        self.frame_start = 0.0
+        self.origin = time.perf_counter()
+        self.last_report = self.origin
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        # ligado a meio de um frame tipo tecla p no poll o frame conta a partir daqui
+        if value and not self._enabled:
+            self.events = []
+            self.depth = 0
+            self.frame_start = time.perf_counter()
+        self._enabled = value
+
+    def _query(self):
+        if not self.free_queries:
+            self.free_queries.extend(int(q) for q in glGenQueries(32))
+        return self.free_queries.pop()
+
+    def scope(self, name, gpu=True):
+        if not self.enabled: return _NULL_SCOPE
+        return _Scope(self, name, gpu)
+
+    def begin_frame(self):
+        if not self.enabled: return
+        self.events = []
+        self.depth = 0
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled: return
+        self.pending.append((self.frame_index, self.frame_start, time.perf_counter(), self.events))
+        self.events = []
+        self.frame_index += 1
+
+        # recolher frames antigos cujas queries ja devem estar prontas
+        while self.pending and self.frame_index - self.pending[0][0] >= self.latency:
+            if not self._resolve(self.pending[0]): break
+            self.pending.popleft()
+
+    def flush(self):
+        # no fim da execucao espera pelas queries de todos os frames pendentes em vez de inventar frames
+        while self.pending:
+            self._resolve(self.pending.popleft(), wait=True)
+
+    def _resolve(self, frame, wait=False):
+        index, start, end, events = frame
+        gpu_events = [e for e in events if e[4] is not None]
+        if gpu_events:
+            last = gpu_events[-1][4][1]
+            # com wait o GL_QUERY_RESULT bloqueia ate a gpu acabar
+            if not wait and not glGetQueryObjectiv(last, GL_QUERY_RESULT_AVAILABLE): return False
+            for e in gpu_events:
+                t0 = glGetQueryObjectui64v(e[4][0], GL_QUERY_RESULT)
+                t1 = glGetQueryObjectui64v(e[4][1], GL_QUERY_RESULT)
+                e[5] = (int(t0), int(t1))
+                self.free_queries.extend(e[4])
+                e[4] = None
+
+        totals = {"frame": [(end - start) * 1000.0, None]}
+        for name, depth, c0, c1, _, gpu_ts in events:
+            entry = totals.setdefault(name, [0.0, None])
+            entry[0] += (c1 - c0) * 1000.0
+            if gpu_ts is not None:
+                entry[1] = (entry[1] or 0.0) + (gpu_ts[1] - gpu_ts[0]) / 1e6
+        self.history.append(totals)
+        self.trace.append(frame)
+        return True
+
+    def summary(self):
+        # media das ultimas frames por scope em ms tipo nome cpu gpu
+        out = {}
+        n = len(self.history)
+        if n == 0: return out
+        for totals in self.history:
+            for name, (cpu, gpu) in totals.items():
+                acc = out.setdefault(name, [0.0, 0.0, 0])
+                acc[0] += cpu
+                if gpu is not None:
+                    acc[1] += gpu
+                    acc[2] += 1
+        return {name: (cpu / n, (gpu / count) if count else None) for name, (cpu, gpu, count) in out.items()}
+
+    def format_summary(self):
+        parts = []
+        for name, (cpu, gpu) in self.summary().items():
+            if gpu is None: parts.append(f"{name} {cpu:.2f}")
+            else: parts.append(f"{name} {cpu:.2f}/{gpu:.2f}")
+        return "ms cpu/gpu: " + "  ".join(parts)
+
+    def report(self, interval=2.0):
+        # resumo na consola de x em x segundos
+        now = time.perf_counter()
+        if not self.enabled or now - self.last_report < interval: return
+        self.last_report = now
+        print(self.format_summary())
+
+    def export_chrome_trace(self, path):
+        # formato json do about tracing eventos completos em microsegundos
+        # tid 1 e a cpu e tid 2 a gpu alinhada ao inicio cpu do primeiro scope gpu do frame
+        events = []
+        for index, start, end, frame_events in self.trace:
+            events.append({"name": f"frame {index}", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6})
+            gpu_base = None
+            for name, depth, c0, c1, _, gpu_ts in frame_events:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (c0 - self.origin) * 1e6, "dur": (c1 - c0) * 1e6,
+                               "args": {"depth": depth}})
+                if gpu_ts is None: continue
+                if gpu_base is None: gpu_base = (gpu_ts[0], c0)
+                ts = (gpu_base[1] - self.origin) * 1e6 + (gpu_ts[0] - gpu_base[0]) / 1e3
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 2,
+                               "ts": ts, "dur": (gpu_ts[1] - gpu_ts[0]) / 1e3})
+        meta = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "CPU"}},
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": 2, "args": {"name": "GPU"}}]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+
+    def destroy(self):
+        queries = list(self.free_queries)
+        for _, _, _, events in self.pending:
+            for e in events:
+                if e[4] is not None: queries.extend(e[4])
+        if queries: glDeleteQueries(len(queries), queries)
+        self.free_queries = []
+        self.pending.clear()
@@ -0,0 +1,223 @@
+
+import math
+import time
+import numpy as np
+from OpenGL.GL import *
+from framebuffer import Framebuffer, RenderTexture
+from transform import perspective, lookAt_into
+from scene import cull_queue, sort_queue, draw_queue, refill_mesh
+import memory
+
+# vistas secundarias desenhadas num fbo pequeno e usadas como textura na cena tipo retrovisores
+# cada vista reaproveita a travessia e as esferas do culling do frame principal so testa o seu frustum
+# nao redesenham todos os frames tipo de n em n desfasadas entre si e so se a camara mexeu
+# o resto dos frames a malha continua a mostrar a ultima imagem
+
+MIRROR_FLIP = np.diag([-1.0, 1.0, 1.0, 1.0]).astype(np.float32)
+
+class RenderTarget:
+    # fbo com cor e profundidade a resolucao reduzida mais a politica de quando redesenhar
+    # every e de quantos em quantos frames pode redesenhar e phase desfasa alvos com o mesmo every
+    # com on_move so redesenha se a chave da camara mudou ou ja passaram max_age frames
+    def __init__(self, width, height, every=2, phase=0, on_move=True, max_age=30, name="RenderTarget"):
+        self.framebuffer = Framebuffer(width, height)
+        self.texture = RenderTexture(self.framebuffer)
+        self.every = max(1, int(every))
+        self.phase = phase
+        self.on_move = on_move
+        self.max_age = max_age
+        self.last_frame = None
+        self.last_key = None
+        self.renders = 0
+        self.skips = 0
+        # cor rgba8 mais profundidade de 24 bits que o driver guarda em 32
+        memory.track_texture(self.framebuffer.color_tex, name, width * height * 8)
+
+    def due(self, frame):
+        # so o desfasamento sem precisar da camara tipo barato pra testar todos os frames
+        return self.last_frame is None or (frame + self.phase) % self.every == 0
+
+    def moved(self, frame, key):
+        if not self.on_move or self.last_key is None or frame - self.last_frame >= self.max_age: return True
+        return not np.allclose(key, self.last_key, atol=1e-5)
+
+    def rendered(self, frame, key=None):
+        self.last_frame = frame
+        self.last_key = None if key is None else np.array(key, dtype=np.float32)
+        self.renders += 1
+        self.texture.ready = True
+
+    def destroy(self):
+        memory.forget_texture(self.framebuffer.color_tex)
+        self.framebuffer.destroy()
+
+def _subtree_mesh_nodes(node, out):
+    if node.mesh is not None: out.append(node)
+    for c in node.children: _subtree_mesh_nodes(c, out)
+    return out
+
+def _leaf_meshes(mesh):
+    return getattr(mesh, "meshes", [mesh])
+
+def planar_frame(positions, normals):
+    # centro normal e eixos u v no plano do espelho no espaco da malha
+    # u e a direita de quem olha pro lado da normal e v o cima projetado no plano
+    center = (positions.min(axis=0) + positions.max(axis=0)) * 0.5
+    n = normals.mean(axis=0)
+    if np.linalg.norm(n) < 1e-6:
+        n = np.cross(positions[1] - positions[0], positions[2] - positions[0])
+    n = n / np.linalg.norm(n)
+    u = np.cross((0.0, 1.0, 0.0), n)
+    if np.linalg.norm(u) < 1e-6: u = np.cross((0.0, 0.0, 1.0), n)
+    u = u / np.linalg.norm(u)
+    v = np.cross(n, u)
+    return center.astype(np.float32), n.astype(np.float32), u.astype(np.float32), v.astype(np.float32)
+
+class MirrorView:
+    # retrovisor plano com a imagem de uma camara posta no centro dele
+    # a camara olha na direcao do olho do condutor refletida na normal do espelho
+    # os uv do obj dos retrovisores sao degenerados por isso sao refeitos a partir do plano
+    def __init__(self, node, eye_node, eye_local, width=192, every=2, phase=0, on_move=True,
+                 fov=40.0, tint=(0.85, 0.85, 0.85)):
+        self.node = node
+        self.eye_node = eye_node
+        self.eye_local = np.array(list(eye_local[:3]) + [1.0], dtype=np.float32)
+        self.fov = fov
+        self.tint = tint
+        self.width = width
+        self.schedule = (every, phase, on_move)
+        self.V = np.eye(4, dtype=np.float32)
+        self.target = None
+        self.shared = {}      # material tingido por chave do material original reaproveitado nos refits
+        self.fit()
+
+    def fit(self):
+        # plano uv e material a partir da geometria atual do no
+        # volta a correr quando o hot reload troca a malha senao ficavam os uv do obj
+        nodes = [n for n in _subtree_mesh_nodes(self.node, [])
+                 if all(getattr(m, "positions", None) is not None for m in _leaf_meshes(n.mesh))]
+        if not nodes: raise ValueError(f"{self.node.name} sem geometria pro espelho")
+        self.mesh_node = nodes[0]
+
+        meshes = [m for n in nodes for m in _leaf_meshes(n.mesh)]
+        positions = np.concatenate([m.positions for m in meshes])
+        normals = np.concatenate([m.normals for m in meshes])
+        self.center, self.normal, self.u, self.v = planar_frame(positions, normals)
+        s = (positions - self.center) @ self.u
+        t = (positions - self.center) @ self.v
+        s_lo, s_hi, t_lo, t_hi = s.min(), s.max(), t.min(), t.max()
+        self.aspect = float((s_hi - s_lo) / max(t_hi - t_lo, 1e-6))
+        if self.target is None:
+            # o fbo fica com o tamanho do arranque num refit so a projecao segue a forma nova
+            height = max(8, int(round(self.width / self.aspect)))
+            self.target = RenderTarget(self.width, height, *self.schedule, name=self.node.name)
+        self.P = perspective(self.fov, self.aspect, 0.05, 500.0)
+
+        for m in meshes:
+            rel = m.positions - self.center
+            uv = np.stack([(rel @ self.u - s_lo) / max(s_hi - s_lo, 1e-6),
+                           (rel @ self.v - t_lo) / max(t_hi - t_lo, 1e-6)], axis=1)
+            vertices = np.concatenate([m.positions, m.normals, uv.astype(np.float32)], axis=1)
+            refill_mesh(m, vertices.reshape(-1), m.indices)
+        for n in nodes:
+            if hasattr(n.mesh, "refresh"): n.mesh.refresh()
+            for m in _leaf_meshes(n.mesh): m.texture_id = self.target.texture
+            n.mesh.texture_id = self.target.texture
+            mat = n.material.copy(diffuse=self.tint, emission=(0.0, 0.0, 0.0), alpha=1.0)
+            n.material = self.shared.setdefault(mat.key(), mat)
+
+    def camera(self):
+        # view e projection a partir das world calculadas na travessia deste frame
+        W = self.mesh_node.world
+        R = W[:3, :3]
+        c = R @ self.center + W[:3, 3]
+        n = R @ self.normal
+        n = n / math.sqrt(float(n @ n))
+        eye = (self.eye_node.world @ self.eye_local)[:3]
+        d = c - eye
+        d = d / math.sqrt(float(d @ d))
+        # normal do lado do condutor o quad pode ter vindo com a normal pra fora
+        facing = float(n @ d) <= 0.0
+        nf = n if facing else -n
+        r = d - 2.0 * float(d @ nf) * nf
+        lookAt_into(c, c + r, R @ self.v, self.V)
+        # imagem de espelho trocada na horizontal os uv ja contam com o lado da normal
+        P = MIRROR_FLIP @ self.P if facing else self.P
+        return P, self.V, c
+
+class SecondaryViews:
+    # todas as vistas secundarias desenhadas antes do passe principal no mesmo frame
+    def __init__(self):
+        self.views = []
+        self.frame = 0
+        self.renders = 0
+        self.cpu_ms = 0.0
+        self.frames = 0
+
+    def add(self, view):
+        self.views.append(view)
+        return view
+
+    def reloaded(self, node):
+        # callback do hot reload a malha de um espelho voltou com os uv do obj
+        for view in self.views:
+            if view.node is not node: continue
+            try:
+                view.fit()
+            except ValueError as e:
+                print(f"Retrovisor sem vista: {e}")
+
+    def render(self, shader, queue, spheres, sky=None):
+        # queue e a fila do frame ja com as world e spheres as esferas do culling principal
+        # devolve quantas vistas foram redesenhadas
+        start = time.perf_counter()
+        drawn = 0
+        prev = None
+        for view in self.views:
+            target = view.target
+            if not target.due(self.frame):
+                target.skips += 1
+                continue
+            P, V, eye = view.camera()
+            VP = P @ V
+            if not target.moved(self.frame, VP):
+                target.skips += 1
+                continue
+            if prev is None: prev = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+            # o proprio espelho e os outros render targets nao se desenham a si mesmos
+            visible = [item for item in cull_queue(queue, VP, spheres)
+                       if not isinstance(item[1].mesh.texture_id, RenderTexture)]
+            target.framebuffer.bind()
+            glClearColor(0.1, 0.1, 0.1, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            shader.use()
+            shader.set_view_pos(eye)
+            opaque = [item for item in visible if item[1].material.alpha >= 1.0]
+            transparent = [item for item in visible if item[1].material.alpha < 1.0]
+            draw_queue(shader, sort_queue(opaque, shader.materials), VP)
+            if sky is not None:
+                sky.draw(P, V)
+                shader.use()
+            draw_queue(shader, transparent, VP)
+            target.rendered(self.frame, VP)
+            drawn += 1
+        if prev is not None:
+            glBindFramebuffer(GL_FRAMEBUFFER, int(prev))
+        self.frame += 1
+        self.frames += 1
+        self.renders += drawn
+        self.cpu_ms += (time.perf_counter() - start) * 1000.0
+        return drawn
+
+    def format_stats(self, frame_ms=None):
+        # custo medio por frame incluindo os frames em que nada foi redesenhado
+        if not self.frames: return "Vistas secundarias: nenhum frame"
+        per_frame = self.cpu_ms / self.frames
+        text = (f"Vistas secundarias: {len(self.views)} alvos {self.renders} renders em {self.frames} frames "
+                f"{per_frame:.2f} ms cpu por frame")
+        if frame_ms: text += f" ({100.0 * per_frame / frame_ms:.1f}% do frame)"
+        return text
+
+    def destroy(self):
+        for view in self.views: view.target.destroy()
+        self.views = []
@@ -0,0 +1,127 @@
+
+import sys
+import math
+import struct
+from world import HOLD_ACTIONS, TRIGGER_ACTIONS
+
+# gravacao de input e replay deterministico com passo fixo
+# ficheiro binario tipo cabecalho mais eventos de 18 bytes cada
+# evento tempo em segundos desde o inicio tipo acao ou rato e dois floats
+
+MAGIC = b"CGIN"
+VERSION = 1
+HEADER = struct.Struct("<4sBxxxdI") # magic versao dt sugerido numero de eventos
+EVENT = struct.Struct("<dBBff")     # t kind code a b
+
+KIND_PRESS = 0
+KIND_RELEASE = 1
+KIND_MOUSE = 2
+
+ACTIONS = HOLD_ACTIONS + TRIGGER_ACTIONS
+ACTION_CODES = {name: i for i, name in enumerate(ACTIONS)}
+
+class InputRecorder:
+    def __init__(self, start_time=0.0):
+        self.start_time = start_time
+        self.events = []
+
+    def action(self, t, action, pressed=True):
+        kind = KIND_PRESS if pressed else KIND_RELEASE
+        self.events.append((t - self.start_time, kind, ACTION_CODES[action], 0.0, 0.0))
+
+    def mouse(self, t, dx, dy):
+        if dx == 0 and dy == 0: return
+        self.events.append((t - self.start_time, KIND_MOUSE, 0, float(dx), float(dy)))
+
+    def save(self, path, dt=1.0 / 60.0):
+        save_events(path, self.events, dt)
+
+def save_events(path, events, dt=1.0 / 60.0):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, dt, len(events)))
+        for e in events:
+            f.write(EVENT.pack(*e))
+
+def load_events(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, dt, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} nao e uma gravacao de input valida")
+    events = list(EVENT.iter_unpack(data[HEADER.size:HEADER.size + count * EVENT.size]))
+    # ordenar pelo tempo mantendo a ordem original dos empates
+    events.sort(key=lambda e: e[0])
+    return dt, events
+
+class ReplayDriver:
+    # aplica os eventos gravados a cena com um dt fixo em vez do relogio
+    # assim o mesmo ficheiro produz exatamente os mesmos frames em qualquer maquina
+    def __init__(self, world, events, dt=1.0 / 60.0, tail=1.0):
+        self.world = world
+        self.events = events
+        self.dt = dt
+        self.index = 0
+        self.frame = 0
+        self.sim_time = 0.0
+        self.end_time = (events[-1][0] if events else 0.0) + tail
+
+    @property
+    def n_frames(self):
+        return int(math.ceil(self.end_time / self.dt))
+
+    @property
+    def done(self):
+        return self.frame >= self.n_frames
+
+    def step(self):
+        mouse_dx, mouse_dy = 0.0, 0.0
+        while self.index < len(self.events) and self.events[self.index][0] <= self.sim_time:
+            t, kind, code, a, b = self.events[self.index]
+            if kind == KIND_MOUSE:
+                mouse_dx += a
+                mouse_dy += b
+            else:
+                self.world.apply_action(ACTIONS[code], kind == KIND_PRESS)
+            self.index += 1
+
+        self.world.update(self.dt, self.sim_time, mouse_dx, mouse_dy)
+        self.sim_time += self.dt
+        self.frame += 1
+
+def build_garage_scenario():
+    # cenario de benchmark abrir garagem entrar com o carro e abrir as portas todas
+    # tempos afinados pra acabar parado dentro da garagem do lado esquerdo
+    rec = InputRecorder()
+    timeline = [
+        (0.0, 'garage', True),
+        (0.0, 'headlights', True),
+        # esperar o portao subir senao o carro bate nele
+        (1.0, 'w', True),
+        (2.6, 'w', False),
+        (2.6, 's', True),
+        (3.3, 's', False),
+        (5.0, 'door:frente_esquerda', True),
+        (5.25, 'door:frente_direita', True),
+        (5.5, 'door:tras_esquerda', True),
+        (5.75, 'door:tras_direita', True),
+        (8.0, 'camera_first_person', True),
+    ]
+    for t, action, pressed in timeline:
+        rec.action(t, action, pressed)
+    return rec.events
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "make-scenario":
+        save_events(argv[1], build_garage_scenario())
+        print(f"Cenario gravado em {argv[1]}")
+    elif len(argv) >= 2 and argv[0] == "info":
+        dt, events = load_events(argv[1])
+        presses = sum(1 for e in events if e[1] == KIND_PRESS)
+        mouse = sum(1 for e in events if e[1] == KIND_MOUSE)
+        duration = events[-1][0] if events else 0.0
+        print(f"{len(events)} eventos {presses} presses {mouse} rato duracao {duration:.2f} s dt {dt:.5f}")
+    else:
+        print("uso: python replay.py make-scenario FICHEIRO | info FICHEIRO")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
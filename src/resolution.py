@@ -0,0 +1,122 @@
+
+import math
+from OpenGL.GL import *
+from framebuffer import Framebuffer
+
+# resolucao dinamica tipo a cena desenhada num fbo a uma escala da janela e depois esticada com um blit
+# o tempo de gpu de cada frame vem de um par de timestamps lido uns frames depois sem parar o pipeline
+# time elapsed nao da porque os scopes do profiler podem estar por fora
+# um controlador pi mexe na fracao de pixeis escala ao quadrado que e do que o custo dos fragmentos depende
+# o fbo e alocado uma vez a escala maxima e so muda o viewport assim mudar de escala nao realoca nada
+
+class ResolutionController:
+    # pi sobre a fracao de pixeis com o erro relativo ao alvo em ms
+    # o integral fica preso aos limites assim nao acumula quando ja esta na escala minima ou maxima
+    # a escala aplicada so muda aos saltos de step pra nao redimensionar por ruido
+    def __init__(self, target_ms=16.7, min_scale=0.5, max_scale=1.0, kp=0.4, ki=0.15, step=0.05):
+        self.target_ms = target_ms
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.kp = kp
+        self.ki = ki
+        self.step = step
+        self.integral = max_scale * max_scale
+        self.fraction = self.integral
+        self.scale = max_scale
+        self.last_ms = None
+
+    def update(self, gpu_ms):
+        # devolve a escala pra os proximos frames
+        self.last_ms = gpu_ms
+        lo, hi = self.min_scale ** 2, self.max_scale ** 2
+        error = (self.target_ms - gpu_ms) / self.target_ms
+        self.integral = min(hi, max(lo, self.integral + self.ki * error * self.fraction))
+        self.fraction = min(hi, max(lo, self.integral + self.kp * error * self.fraction))
+        wanted = math.sqrt(self.fraction)
+        if self.fraction in (lo, hi):
+            # nos limites vai mesmo ao limite mesmo que nao caia na grelha do step
+            self.scale = self.min_scale if self.fraction == lo else self.max_scale
+        elif abs(wanted - self.scale) >= self.step:
+            self.scale = min(self.max_scale, max(self.min_scale, round(wanted / self.step) * self.step))
+        return self.scale
+
+class DynamicResolution:
+    def __init__(self, controller=None, latency=3):
+        self.controller = controller or ResolutionController()
+        self.latency = latency             # frames entre a query e a leitura do resultado
+        self.framebuffer = None
+        self.queries = []                  # pares de timestamps em voo pela ordem dos frames
+        self.free_queries = []
+        self.pair = None
+        self.prev = 0
+        self.window = (0, 0)
+        self.size = (0, 0)
+        self.frames = 0
+        self.scale_sum = 0.0
+        self.gpu_sum = 0.0
+        self.gpu_count = 0
+
+    def begin(self, width, height):
+        # liga o fbo da cena e devolve o tamanho a que a cena deve ser desenhada
+        c = self.controller
+        if self.framebuffer is None or self.window != (width, height):
+            # so quando a janela muda de tamanho
+            w, h = max(1, int(width * c.max_scale)), max(1, int(height * c.max_scale))
+            if self.framebuffer is None: self.framebuffer = Framebuffer(w, h)
+            else: self.framebuffer.resize(w, h)
+            self.window = (width, height)
+        self._collect()
+        self.size = (max(1, int(round(width * c.scale))), max(1, int(round(height * c.scale))))
+
+        self.prev = int(glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING))
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer.fbo)
+        glViewport(0, 0, self.size[0], self.size[1])
+        self.pair = (self._query(), self._query())
+        glQueryCounter(self.pair[0], GL_TIMESTAMP)
+        return self.size
+
+    def _query(self):
+        if not self.free_queries:
+            self.free_queries.extend(int(q) for q in glGenQueries(8))
+        return self.free_queries.pop()
+
+    def end(self):
+        # esticar o retangulo desenhado pra janela inteira no fbo que estava ligado antes
+        width, height = self.window
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.framebuffer.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.prev)
+        glBlitFramebuffer(0, 0, self.size[0], self.size[1], 0, 0, width, height,
+                          GL_COLOR_BUFFER_BIT, GL_LINEAR)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.prev)
+        glViewport(0, 0, width, height)
+        glQueryCounter(self.pair[1], GL_TIMESTAMP)
+        self.queries.append(self.pair)
+        self.pair = None
+        self.frames += 1
+        self.scale_sum += self.controller.scale
+
+    def _collect(self):
+        # resultados ja prontos dos frames antigos alimentam o controlador sem esperar pela gpu
+        while len(self.queries) >= self.latency:
+            q0, q1 = self.queries[0]
+            if not glGetQueryObjectiv(q1, GL_QUERY_RESULT_AVAILABLE): break
+            ms = (int(glGetQueryObjectui64v(q1, GL_QUERY_RESULT)) - int(glGetQueryObjectui64v(q0, GL_QUERY_RESULT))) / 1e6
+            self.queries.pop(0)
+            self.free_queries.extend((q0, q1))
+            self.gpu_sum += ms
+            self.gpu_count += 1
+            self.controller.update(ms)
+
+    def format_stats(self):
+        if not self.frames: return "Resolucao dinamica: nenhum frame"
+        gpu = f"{self.gpu_sum / self.gpu_count:.2f} ms" if self.gpu_count else "?"
+        c = self.controller
+        return (f"Resolucao dinamica: escala media {self.scale_sum / self.frames:.2f} atual {c.scale:.2f} "
+                f"({c.min_scale:.2f}-{c.max_scale:.2f}) gpu media {gpu} alvo {c.target_ms:.1f} ms")
+
+    def destroy(self):
+        queries = [q for pair in self.queries for q in pair] + self.free_queries
+        if queries: glDeleteQueries(len(queries), queries)
+        self.queries, self.free_queries = [], []
+        if self.framebuffer is not None: self.framebuffer.destroy()
+        self.framebuffer = None
@@ -1,21 +1,39 @@
 
 import ctypes
 import os
-import math
+import itertools
 import numpy as np
 from PIL import Image
 from OpenGL.GL import *
+from transform import classify_affine, normal_matrix, RIGID
+import meshgen
+from material import Material
+from texstream import TextureLayer
+from framebuffer import RenderTexture
+import memory
+
+# contador global pras versoes das matrizes assim dois nos nunca partilham o mesmo numero
+_versions = itertools.count(1)
+
+def vertex_bounds(vertices):
+    # aabb local a partir do array interleaved de 8 floats
+    pos = np.asarray(vertices, dtype=np.float32).reshape(-1, 8)[:, :3]
+    if len(pos) == 0: return np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32)
+    return pos.min(axis=0), pos.max(axis=0)
 
 class Mesh:
     def __init__(self, vertices, indices, texture_id=None):
         # vertices numpy array de float32 interleaved x y z nx ny nz u v
         # indices numpy array de uint32
         self.count = indices.size
+        self.v_count = vertices.size // 8
         self.texture_id = texture_id
+        self.aabb = vertex_bounds(vertices)
         
         self.vao = glGenVertexArrays(1)
         self.vbo = glGenBuffers(1)
         self.ebo = glGenBuffers(1)
+        self.bake_vbo = None
         
         glBindVertexArray(self.vao)
         
@@ -42,18 +60,57 @@ class Mesh:
         
         glBindVertexArray(0)
 
-    def draw(self):
+    def set_bake(self, data):
+        # atributo 3 com luz indireta rgb e oclusao ambiente num vbo a parte
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if self.bake_vbo is None:
+            self.bake_vbo = glGenBuffers(1)
         glBindVertexArray(self.vao)
-        glDrawElements(GL_TRIANGLES, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glBindBuffer(GL_ARRAY_BUFFER, self.bake_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(3)
+        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(0))
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def replace(self, vertices, indices):
+        # conteudo novo nos mesmos vao vbo e ebo quem aponta pra esta malha nao da por nada
+        # o glBufferData orfana o armazenamento antigo assim os frames em voo nao esperam
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.count = indices.size
+        self.v_count = vertices.size // 8
+        self.aabb = vertex_bounds(vertices)
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        # o bake era dos vertices antigos fica o valor por defeito ate um novo bake
+        if self.bake_vbo is not None:
+            glDisableVertexAttribArray(3)
+            glDeleteBuffers(1, [self.bake_vbo])
+            self.bake_vbo = None
         glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, shader):
+        shader.bind_vao(self.vao)
+        glDrawElements(GL_TRIANGLES, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+
+    def gpu_bytes(self):
+        # vbo de 8 floats por vertice ebo de uint32 e o vbo do bake com 4 floats se houver
+        bake = self.v_count * 16 if self.bake_vbo is not None else 0
+        return self.v_count * 32 + self.count * 4 + bake
 
     def destroy(self):
         glDeleteVertexArrays(1, [self.vao])
         glDeleteBuffers(1, [self.vbo])
         glDeleteBuffers(1, [self.ebo])
+        if self.bake_vbo is not None: glDeleteBuffers(1, [self.bake_vbo])
 
 class Node:
-    def __init__(self, name="Node", local=None, mesh=None, 
+    def __init__(self, name="Node", local=None, mesh=None, material=None,
                  material_ambient=(0.2, 0.2, 0.2),
                  material_diffuse=(0.8, 0.8, 0.8),
                  material_specular=(1.0, 1.0, 1.0),
@@ -62,126 +119,245 @@ class Node:
                  material_alpha=1.0):
         self.name = name
         self.local = np.array(local if local is not None else np.eye(4, dtype=np.float32), dtype=np.float32)
+        
+        # cache da matriz world e da matriz das normais so recalculadas quando algo muda
+        self.world = None
+        self.world_kind = RIGID
+        self.world_version = 0
+        self.normal = None
+        self._world_key = None
+        self._parent_world = None
+        self._parent_version = 0
         self.children = []
         self.mesh = mesh
         
-        # propriedades do material
-        self.mat_ambient = material_ambient
-        self.mat_diffuse = material_diffuse
-        self.mat_specular = material_specular
-        self.mat_emission = material_emission
-        self.mat_shininess = material_shininess
-        self.mat_alpha = material_alpha
+        # material partilhado por referencia os material_ so servem pra criar um novo
+        if material is None:
+            material = Material(name, material_ambient, material_diffuse, material_specular,
+                                material_emission, material_shininess, material_alpha)
+        self.material = material
+
+    @property
+    def local(self):
+        return self._local
+
+    @local.setter
+    def local(self, value):
+        # qualquer atribuicao invalida a world deste no e dos filhos
+        self._local = value
+        self.local_version = next(_versions)
 
     def add(self, *children):
         for c in children: self.children.append(c)
         return self
 
-    def draw(self, shader, parent_world, VP):
-        world = parent_world @ self.local
-        
+    def update_world(self, parent_world, parent_version=None):
+        # sem versao do pai tipo raiz comparamos o conteudo da matriz e damos-lhe uma versao
+        if parent_version is None:
+            if self._parent_world is None or not np.array_equal(self._parent_world, parent_world):
+                self._parent_world = np.array(parent_world, dtype=np.float32)
+                self._parent_version = next(_versions)
+            parent_version = self._parent_version
+        key = (parent_version, self.local_version)
+        if key == self._world_key: return self.world
+
+        self.world = parent_world @ self._local
+        self.world_version = next(_versions)
+        self._world_key = key
         if self.mesh is not None:
-            shader.set_transform_uniforms(world, VP)
-            shader.set_material(self.mat_ambient, self.mat_diffuse, 
-                              self.mat_specular, self.mat_shininess, 
-                              self.mat_alpha,
-                              self.mesh.texture_id,
-                              self.mat_emission)
-            if self.mat_alpha < 1.0:
-                glDepthMask(GL_FALSE)
-                
-            self.mesh.draw()
-            
-            if self.mat_alpha < 1.0:
-                glDepthMask(GL_TRUE)
-            
+            self.world_kind, s2 = classify_affine(self.world)
+            self.normal = normal_matrix(self.world, self.world_kind, s2)
+        return self.world
+
+    def collect(self, parent_world, queue, parent_version=None):
+        # travessia so calcula matrizes world e junta os nos com malha pra desenhar depois
+        world = self.update_world(parent_world, parent_version)
+        if self.mesh is not None:
+            queue.append((world, self))
         for c in self.children:
-            c.draw(shader, world, VP)
-
-def create_grid_mesh(size=100, tiles=20):
-    # Criar uma grelha de chao
-    # vertices: x, y, z, nx, ny, nz, u, v
-    verts = []
-    step = size / tiles
-    
-    # Vamos criar quads para cada tile
-    for i in range(tiles):
-        for j in range(tiles):
-            x0 = -size/2 + i*step
-            z0 = -size/2 + j*step
-            x1 = x0 + step
-            z1 = z0 + step
-            
-            u0 = i
-            v0 = j
-            u1 = i+1
-            v1 = j+1
-            
-            # normal e sempre pra cima tipo 0 1 0
-            # quad vertices 2 triangulos
-            
-            # triangulo 1
-            verts.extend([x0, 0, z0, 0, 1, 0, 0, 0])
-            verts.extend([x0, 0, z1, 0, 1, 0, 0, 1])
-            verts.extend([x1, 0, z0, 0, 1, 0, 1, 0])
+            c.collect(world, queue, self.world_version)
+        return queue
+
+    def find(self, name):
+        # primeiro no da subarvore com este nome ou None
+        if self.name == name: return self
+        for c in self.children:
+            found = c.find(name)
+            if found is not None: return found
+        return None
+
+    def submit(self, shader, world, VP):
+        # matriz das normais da cache se a world for a mesma senao calcula na hora
+        if world is self.world and self.normal is not None:
+            shader.set_transform_uniforms(world, VP, self.normal, self.world_kind)
+        else:
+            shader.set_transform_uniforms(world, VP)
+        material = self.material
+        shader.set_material(shader.materials.index(material), self.mesh.texture_id)
+        if material.alpha < 1.0:
+            glDepthMask(GL_FALSE)
             
-            # triangulo 2
-            verts.extend([x1, 0, z0, 0, 1, 0, 1, 0])
-            verts.extend([x0, 0, z1, 0, 1, 0, 0, 1])
-            verts.extend([x1, 0, z1, 0, 1, 0, 1, 1])
-
-    vertices = np.array(verts, dtype=np.float32)
-    indices = np.arange(len(verts)//8, dtype=np.uint32)
-    
-    return Mesh(vertices, indices)
-
-def create_cube_mesh(size=1.0):
-    s = size * 0.5
-    # vertices x y z nx ny nz u v
-    # 6 faces vezes 4 verts igual 24 verts
-    verts = [
-        # Front
-        -s, -s,  s,  0, 0, 1,  0, 0,
-         s, -s,  s,  0, 0, 1,  1, 0,
-         s,  s,  s,  0, 0, 1,  1, 1,
-        -s,  s,  s,  0, 0, 1,  0, 1,
-        # Back
-         s, -s, -s,  0, 0,-1,  0, 0,
-        -s, -s, -s,  0, 0,-1,  1, 0,
-        -s,  s, -s,  0, 0,-1,  1, 1,
-         s,  s, -s,  0, 0,-1,  0, 1,
-        # Top
-        -s,  s,  s,  0, 1, 0,  0, 0,
-         s,  s,  s,  0, 1, 0,  1, 0,
-         s,  s, -s,  0, 1, 0,  1, 1,
-        -s,  s, -s,  0, 1, 0,  0, 1,
-        # Bottom
-        -s, -s, -s,  0,-1, 0,  0, 0,
-         s, -s, -s,  0,-1, 0,  1, 0,
-         s, -s,  s,  0,-1, 0,  1, 1,
-        -s, -s,  s,  0,-1, 0,  0, 1,
-        # Right
-         s, -s,  s,  1, 0, 0,  0, 0,
-         s, -s, -s,  1, 0, 0,  1, 0,
-         s,  s, -s,  1, 0, 0,  1, 1,
-         s,  s,  s,  1, 0, 0,  0, 1,
-        # Left
-        -s, -s, -s, -1, 0, 0,  0, 0,
-        -s, -s,  s, -1, 0, 0,  1, 0,
-        -s,  s,  s, -1, 0, 0,  1, 1,
-        -s,  s, -s, -1, 0, 0,  0, 1,
-    ]
-    
-    indices = [
-        0,1,2, 0,2,3,       # Front
-        4,5,6, 4,6,7,       # Back
-        8,9,10, 8,10,11,    # Top
-        12,13,14, 12,14,15, # Bottom
-        16,17,18, 16,18,19, # Right
-        20,21,22, 20,22,23  # Left
-    ]
-    
-    return Mesh(np.array(verts, dtype=np.float32), np.array(indices, dtype=np.uint32))
+        self.mesh.draw(shader)
+        
+        if material.alpha < 1.0:
+            glDepthMask(GL_TRUE)
+
+    def draw(self, shader, parent_world, VP):
+        draw_queue(shader, self.collect(parent_world, []), VP)
+
+def frustum_planes(VP):
+    # planos do frustum extraidos da matriz view projection tipo gribb hartmann
+    M = np.asarray(VP, dtype=np.float32)
+    planes = np.array([M[3] + M[0], M[3] - M[0], M[3] + M[1],
+                       M[3] - M[1], M[3] + M[2], M[3] - M[2]], dtype=np.float32)
+    planes /= np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+    return planes
+
+def bounding_spheres(queue):
+    # esferas envolventes em world de cada item da fila
+    # calculadas uma vez por frame e reaproveitadas por todas as vistas tipo retrovisores
+    if not queue: return np.zeros((0, 3), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    worlds = np.stack([w for w, _ in queue])
+    mins = np.array([n.mesh.aabb[0] for _, n in queue], dtype=np.float32)
+    maxs = np.array([n.mesh.aabb[1] for _, n in queue], dtype=np.float32)
+    centers_local = (mins + maxs) * 0.5
+    radii_local = np.linalg.norm(maxs - mins, axis=1) * 0.5
+
+    centers = np.einsum('nij,nj->ni', worlds[:, :3, :3], centers_local) + worlds[:, :3, 3]
+    scales = np.sqrt(np.max(np.sum(worlds[:, :3, :3] ** 2, axis=1), axis=1))
+    return centers, radii_local * scales
+
+def cull_queue(queue, VP, spheres=None):
+    # teste de esfera envolvente contra os 6 planos tudo de uma vez em numpy
+    if not queue: return queue
+    centers, radii = spheres if spheres is not None else bounding_spheres(queue)
+    planes = frustum_planes(VP)
+    dist = centers @ planes[:, :3].T + planes[:, 3]
+    visible = np.all(dist > -radii[:, None], axis=1)
+    return [item for item, v in zip(queue, visible) if v]
+
+def state_key(node, materials):
+    # ordem de estado tipo textura depois material depois vao
+    # camadas do mesmo array e malhas sem textura ficam juntas porque nao precisam de bind
+    mesh = node.mesh
+    tex = mesh.texture_id
+    if tex is None: bucket = (0, 0)
+    elif isinstance(tex, TextureLayer): bucket = (0, tex.array.texture)
+    elif isinstance(tex, RenderTexture): bucket = (1, tex.texture)
+    else: bucket = (1, tex)
+    vao = getattr(getattr(mesh, "pool", mesh), "vao", 0)
+    return bucket, materials.index(node.material), vao
+
+def sort_queue(queue, materials):
+    # so pros opacos os transparentes mantem a ordem que tinham
+    return sorted(queue, key=lambda item: state_key(item[1], materials))
+
+def draw_queue(shader, queue, VP):
+    # o vao fica ligado entre draws e so volta a zero no fim da fila
+    if not queue: return
+    shader.invalidate_vao()
+    for world, node in queue:
+        node.submit(shader, world, VP)
+    shader.bind_vao(0)
+
+def make_mesh(vertices, indices, texture_id=None, arena=None):
+    # subalocar no arena se existir senao vao vbo ebo proprios
+    if arena is not None:
+        mesh = arena.allocate(vertices, indices, texture_id)
+    else:
+        mesh = Mesh(vertices, indices, texture_id)
+    # copia das posicoes normais e indices no cpu pro picking e pro bake
+    interleaved = np.asarray(vertices, dtype=np.float32).reshape(-1, 8)
+    mesh.positions = np.ascontiguousarray(interleaved[:, :3])
+    mesh.normals = np.ascontiguousarray(interleaved[:, 3:6])
+    mesh.indices = np.asarray(indices, dtype=np.uint32)
+    return mesh
+
+def refill_mesh(mesh, vertices, indices):
+    # trocar a geometria de uma malha ja existente tipo hot reload e refazer as copias do cpu
+    mesh.replace(vertices, indices)
+    interleaved = np.asarray(vertices, dtype=np.float32).reshape(-1, 8)
+    mesh.positions = np.ascontiguousarray(interleaved[:, :3])
+    mesh.normals = np.ascontiguousarray(interleaved[:, 3:6])
+    mesh.indices = np.asarray(indices, dtype=np.uint32)
+    mesh.bvh = None # o picking volta a construir na proxima vez
+    return mesh
+
+def release_mesh_geometry(node):
+    # largar as copias do cpu das malhas da subarvore depois do bake e da colisao
+    # malhas com a bvh ja feita continuam a dar pro picking as outras deixam de ser clicaveis
+    released = 0
+    for m in _subtree_meshes(node, []):
+        for attr in ("positions", "normals", "indices"):
+            a = getattr(m, attr, None)
+            if a is not None:
+                released += a.nbytes
+                setattr(m, attr, None)
+    return released
+
+def _subtree_meshes(node, out):
+    if node.mesh is not None: out.extend(getattr(node.mesh, "meshes", [node.mesh]))
+    for c in node.children: _subtree_meshes(c, out)
+    return out
+
+def merge_arena_children(node):
+    # juntar filhos folha do mesmo arena com material igual num so multi draw
+    groups = {}
+    rest = []
+    for c in node.children:
+        mesh = c.mesh
+        if mesh is None or c.children or getattr(mesh, "arena", None) is None or \
+           not np.array_equal(c.local, np.eye(4, dtype=np.float32)):
+            rest.append(c)
+            continue
+        key = (id(mesh.arena), mesh.texture_id, id(c.material))
+        groups.setdefault(key, []).append(c)
+
+    node.children = rest
+    for members in groups.values():
+        if len(members) == 1:
+            node.children.append(members[0])
+            continue
+        first = members[0]
+        group = first.mesh.arena.group([m.mesh for m in members], first.mesh.texture_id)
+        first.mesh = group
+        node.children.append(first)
+    return node
+
+def model_node(model, name, color=None, alpha=1.0, specular=(1, 1, 1), shininess=32.0, arena=None):
+    # construir as malhas de um modelo e o no com os materiais substituidos
+    model.build(arena)
+    node = model.to_node(name)
+
+    # substituir propriedades do material recursivamente
+    # materiais que ficam iguais depois da troca passam a ser o mesmo objeto
+    shared = {}
+    def set_props(n):
+        changes = dict(alpha=alpha, specular=specular, shininess=shininess)
+        if color: changes["diffuse"] = color
+        m = n.material.copy(**changes)
+        n.material = shared.setdefault(m.key(), m)
+        for c in n.children: set_props(c)
+
+    # pecas do glb ja trazem os materiais feitos no blender
+    if not getattr(model, "authored", False): set_props(node)
+    # batches com o mesmo material passam a ser um so multi draw em cada nivel da hierarquia
+    if arena is not None:
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            merge_arena_children(n)
+            stack.extend(n.children)
+    return node
+
+def create_grid_mesh(size=100, tiles=20, arena=None):
+    # grelha de chao com vertices partilhados tipo (tiles+1) ao quadrado em vez de 6 por tile
+    vertices, indices = meshgen.grid(size, tiles)
+    return make_mesh(vertices, indices, arena=arena)
+
+def create_cube_mesh(size=1.0, arena=None):
+    vertices, indices = meshgen.cube(size)
+    return make_mesh(vertices, indices, arena=arena)
 
 def load_texture(path):
     if not os.path.isfile(path): return None
@@ -199,42 +375,12 @@ def load_texture(path):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
         glGenerateMipmap(GL_TEXTURE_2D)
+        memory.track_texture(tex_id, path, memory.texture_bytes(w, h))
         return tex_id
     except Exception as e:
         print(f"Texture error {path}: {e}")
         return None
 
-def create_sphere_mesh(radius=1.0, stacks=32, slices=32):
-    verts = []
-    indices = []
-
-    for i in range(stacks + 1):
-        phi = math.pi * i / stacks
-        for j in range(slices + 1):
-            theta = 2 * math.pi * j / slices
-            
-            x = radius * math.sin(phi) * math.cos(theta)
-            y = radius * math.cos(phi)
-            z = radius * math.sin(phi) * math.sin(theta)
-            
-            nx = x / radius
-            ny = y / radius
-            nz = z / radius
-            
-            u = j / slices
-            v = i / stacks
-            
-            verts.extend([x, y, z, nx, ny, nz, u, v])
-            
-    for i in range(stacks):
-        for j in range(slices):
-            first = (i * (slices + 1)) + j
-            second = first + slices + 1
-            
-            indices.extend([first, second, first + 1])
-            indices.extend([second, second + 1, first + 1])
-            
-    vertices = np.array(verts, dtype=np.float32)
-    indices_arr = np.array(indices, dtype=np.uint32)
-    
-    return Mesh(vertices, indices_arr)
+def create_sphere_mesh(radius=1.0, stacks=32, slices=32, arena=None):
+    vertices, indices = meshgen.sphere(radius, stacks, slices)
+    return make_mesh(vertices, indices, arena=arena)
@@ -1,7 +1,10 @@
 
 from OpenGL.GL import *
 import numpy as np
-from transform import normal_matrix
+from transform import normal_matrix, GENERAL
+from material import MaterialTable, MAX_MATERIALS, MATERIAL_BINDING
+from texstream import TextureLayer
+from framebuffer import RenderTexture
 
 # vertex shader
 VS = r"""
@@ -9,20 +12,24 @@ VS = r"""
 layout(location=0) in vec3 aPos;
 layout(location=1) in vec3 aNormal;
 layout(location=2) in vec2 aTexCoord;
+layout(location=3) in vec4 aBake; // luz indireta rgb e oclusao ambiente do bake
 
 uniform mat4 uM;
 uniform mat4 uVP;
 uniform mat3 uN;
+uniform bool uNormalFromModel; // rigida ou escala uniforme o bloco 3x3 do modelo serve depois de normalizar
 
 out vec3 fN;
 out vec3 fPosW;
 out vec2 fTexCoord;
+out vec4 fBake;
 
 void main(){
     vec4 posW = uM * vec4(aPos, 1.0);
     fPosW = posW.xyz;
-    fN = normalize(uN * aNormal);
+    fN = normalize((uNormalFromModel ? mat3(uM) : uN) * aNormal);
     fTexCoord = aTexCoord;
+    fBake = aBake;
     gl_Position = uVP * posW;
 }
 """
@@ -30,11 +37,16 @@ void main(){
 # fragment shader
 FS = r"""
 #version 330 core
+#define MAX_MATERIALS %d
 in vec3 fN;
 in vec3 fPosW;
 in vec2 fTexCoord;
+in vec4 fBake;
 
-out vec4 fragColor;
+layout(location=0) out vec4 fragColor;
+layout(location=1) out float fragWeight; // so no passe oit
+
+uniform bool uOIT;
 
 struct Light {
     vec3 position;
@@ -54,17 +66,24 @@ struct Light {
 uniform Light lights[NR_LIGHTS];
 
 uniform vec3 uViewPos;
-uniform vec3 uMaterialAmbient;
-uniform vec3 uMaterialDiffuse;
-uniform vec3 uMaterialSpecular;
-uniform vec3 uMaterialEmission;
-uniform float uMaterialShininess;
-uniform float uMaterialAlpha;
+
+// tabela de materiais num uniform buffer igual ao Material pack do material py
+struct MaterialData {
+    vec4 ambientShininess;
+    vec4 diffuseAlpha;
+    vec4 specular;
+    vec4 emission;
+};
+layout(std140) uniform Materials {
+    MaterialData uMaterials[MAX_MATERIALS];
+};
+uniform int uMaterialIndex;
 
 uniform sampler2D uTexture;
-uniform bool uHasTexture;
+uniform sampler2DArray uTextureArray;
+uniform int uTextureLayer; // menos 1 sem textura menos 2 textura 2d solta menos 3 render target senao camada do array
 
-vec3 CalcLight(Light light, vec3 normal, vec3 viewDir, vec3 albedo) {
+vec3 CalcLight(Light light, MaterialData mat, vec3 normal, vec3 viewDir, vec3 albedo) {
     vec3 lightDir = normalize(light.position - fPosW);
     
     // spotlight pode adicionar soft edges depois por agora hard cutoff
@@ -87,63 +106,110 @@ vec3 CalcLight(Light light, vec3 normal, vec3 viewDir, vec3 albedo) {
     
     // especular
     vec3 reflectDir = reflect(-lightDir, normal);
-    float spec = pow(max(dot(viewDir, reflectDir), 0.0), uMaterialShininess);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), mat.ambientShininess.w);
     
-    vec3 ambient  = light.ambient  * albedo;
+    vec3 ambient  = light.ambient  * albedo * fBake.a; // oclusao so escurece a ambiente
     vec3 diffuse  = light.diffuse  * diff * albedo;
-    vec3 specular = light.specular * spec * uMaterialSpecular;
+    vec3 specular = light.specular * spec * mat.specular.rgb;
     
     return (ambient + diffuse + specular) * intensity;
 }
 
+void emit(vec4 color) {
+    if (!uOIT) {
+        fragColor = color;
+        return;
+    }
+    // peso do mcguire e bavoil mais perto e mais opaco pesa mais limitado pra caber em 16 bits
+    float a = color.a;
+    float z = 1.0 - gl_FragCoord.z * 0.9;
+    float w = clamp(pow(min(1.0, a * 10.0) + 0.01, 3.0) * 1e8 * z * z * z, 1e-2, 3e3);
+    fragColor = vec4(color.rgb * a * w, a);
+    fragWeight = a * w;
+}
+
 void main(){
     vec3 norm = normalize(fN);
     vec3 viewDir = normalize(uViewPos - fPosW);
     
-    vec3 albedo = uMaterialDiffuse;
+    MaterialData mat = uMaterials[uMaterialIndex];
+    if (uTextureLayer == -3) {
+        // espelho a imagem ja vem iluminada da vista secundaria so leva a tinta do material
+        emit(vec4(texture(uTexture, fTexCoord).rgb * mat.diffuseAlpha.rgb + mat.emission.rgb, mat.diffuseAlpha.a));
+        return;
+    }
+    vec3 albedo = mat.diffuseAlpha.rgb;
     vec3 texColorRGB = vec3(1.0);
-    if (uHasTexture) {
-        vec4 texColor = texture(uTexture, fTexCoord);
+    if (uTextureLayer != -1) {
+        vec4 texColor = uTextureLayer >= 0 ? texture(uTextureArray, vec3(fTexCoord, float(uTextureLayer)))
+                                           : texture(uTexture, fTexCoord);
         albedo = texColor.rgb;
         texColorRGB = texColor.rgb;
     }
     
-    vec3 result = uMaterialEmission * texColorRGB; // emissao modulada por textura
+    vec3 result = mat.emission.rgb * texColorRGB; // emissao modulada por textura
+    result += fBake.rgb * albedo; // ressalto do sol do bake
     
     for(int i = 0; i < NR_LIGHTS; i++)
-        result += CalcLight(lights[i], norm, viewDir, albedo);
+        result += CalcLight(lights[i], mat, norm, viewDir, albedo);
         
-    fragColor = vec4(result, uMaterialAlpha);
+    emit(vec4(result, mat.diffuseAlpha.a));
 }
-"""
+""" % MAX_MATERIALS
+
+def compile_shader(src, kind):
+    sh = glCreateShader(kind)
+    glShaderSource(sh, src)
+    glCompileShader(sh)
+    if not glGetShaderiv(sh, GL_COMPILE_STATUS):
+        raise RuntimeError(glGetShaderInfoLog(sh).decode())
+    return sh
+
+def link_program(vs_src, fs_src):
+    # programa de vertex e fragment shader usado tambem pelo ceu e pela composicao do oit
+    prog = glCreateProgram()
+    vs = compile_shader(vs_src, GL_VERTEX_SHADER)
+    fs = compile_shader(fs_src, GL_FRAGMENT_SHADER)
+    glAttachShader(prog, vs); glAttachShader(prog, fs)
+    glLinkProgram(prog)
+    glDeleteShader(vs); glDeleteShader(fs)
+    if not glGetProgramiv(prog, GL_LINK_STATUS):
+        raise RuntimeError(glGetProgramInfoLog(prog).decode())
+    return prog
 
 class ShaderProgram:
     def __init__(self):
-        self.prog = glCreateProgram()
-        vs = self._compile(VS, GL_VERTEX_SHADER)
-        fs = self._compile(FS, GL_FRAGMENT_SHADER)
-        glAttachShader(self.prog, vs); glAttachShader(self.prog, fs)
-        glLinkProgram(self.prog)
-        glDeleteShader(vs); glDeleteShader(fs)
-        
-        if not glGetProgramiv(self.prog, GL_LINK_STATUS):
-            raise RuntimeError(glGetProgramInfoLog(self.prog).decode())
+        self.prog = link_program(VS, FS)
             
         # cache uniform locations
         self.loc_uM = glGetUniformLocation(self.prog, "uM")
         self.loc_uVP = glGetUniformLocation(self.prog, "uVP")
         self.loc_uN = glGetUniformLocation(self.prog, "uN")
+        self.loc_uNormalFromModel = glGetUniformLocation(self.prog, "uNormalFromModel")
+        self.normal_from_model = None
         self.loc_uViewPos = glGetUniformLocation(self.prog, "uViewPos")
         
-        self.loc_mat_amb = glGetUniformLocation(self.prog, "uMaterialAmbient")
-        self.loc_mat_diff = glGetUniformLocation(self.prog, "uMaterialDiffuse")
-        self.loc_mat_spec = glGetUniformLocation(self.prog, "uMaterialSpecular")
-        self.loc_mat_emis = glGetUniformLocation(self.prog, "uMaterialEmission")
-        self.loc_mat_shiny = glGetUniformLocation(self.prog, "uMaterialShininess")
-        self.loc_mat_alpha = glGetUniformLocation(self.prog, "uMaterialAlpha")
+        # materiais num uniform buffer partilhado por draw so vai o indice
+        block = glGetUniformBlockIndex(self.prog, "Materials")
+        glUniformBlockBinding(self.prog, block, MATERIAL_BINDING)
+        self.loc_mat_index = glGetUniformLocation(self.prog, "uMaterialIndex")
+        self.material_index = None
+        self.materials = MaterialTable()
+        
+        # texturas soltas na unidade 0 e o array na 1 os binds so se repetem quando mudam
+        self.loc_tex_layer = glGetUniformLocation(self.prog, "uTextureLayer")
+        glUseProgram(self.prog)
+        glUniform1i(glGetUniformLocation(self.prog, "uTexture"), 0)
+        glUniform1i(glGetUniformLocation(self.prog, "uTextureArray"), 1)
+        glUseProgram(0)
+        self.texture_layer = None
+        self.invalidate_textures()
+        # vao ligado pelas malhas da fila malhas do mesmo pool do arena seguidas nao voltam a ligar
+        self.bound_vao = None
         
-        self.loc_has_tex = glGetUniformLocation(self.prog, "uHasTexture")
-        self.loc_tex = glGetUniformLocation(self.prog, "uTexture")
+        # saida pros alvos do oit em vez da cor normal
+        self.loc_oit = glGetUniformLocation(self.prog, "uOIT")
+        self.oit = False
         
         # light locations
         self.light_locs = []
@@ -157,40 +223,72 @@ class ShaderProgram:
                 'spec': glGetUniformLocation(self.prog, f"lights[{i}].specular")
             })
 
-    def _compile(self, src, kind):
-        sh = glCreateShader(kind)
-        glShaderSource(sh, src)
-        glCompileShader(sh)
-        if not glGetShaderiv(sh, GL_COMPILE_STATUS):
-            raise RuntimeError(glGetShaderInfoLog(sh).decode())
-        return sh
-
     def use(self):
         glUseProgram(self.prog)
 
-    def set_transform_uniforms(self, M, VP):
+    def set_transform_uniforms(self, M, VP, N=None, kind=None):
         glUniformMatrix4fv(self.loc_uM, 1, GL_TRUE, M)
         glUniformMatrix4fv(self.loc_uVP, 1, GL_TRUE, VP)
-        glUniformMatrix3fv(self.loc_uN, 1, GL_TRUE, normal_matrix(M))
+        # no caso comum a shader tira a normal do uM e nao enviamos o uN
+        from_model = kind is not None and kind != GENERAL
+        if from_model != self.normal_from_model:
+            glUniform1i(self.loc_uNormalFromModel, int(from_model))
+            self.normal_from_model = from_model
+        if not from_model:
+            glUniformMatrix3fv(self.loc_uN, 1, GL_TRUE, N if N is not None else normal_matrix(M))
+
+    def set_oit(self, enabled):
+        if enabled != self.oit:
+            glUniform1i(self.loc_oit, int(enabled))
+            self.oit = enabled
 
     def set_view_pos(self, pos):
         glUniform3fv(self.loc_uViewPos, 1, np.array(pos, dtype=np.float32))
 
-    def set_material(self, ambient, diffuse, specular, shininess, alpha=1.0, texture_id=None, emission=(0,0,0)):
-        glUniform3fv(self.loc_mat_amb, 1, np.array(ambient, dtype=np.float32))
-        glUniform3fv(self.loc_mat_diff, 1, np.array(diffuse, dtype=np.float32))
-        glUniform3fv(self.loc_mat_spec, 1, np.array(specular, dtype=np.float32))
-        glUniform3fv(self.loc_mat_emis, 1, np.array(emission, dtype=np.float32))
-        glUniform1f(self.loc_mat_shiny, shininess)
-        glUniform1f(self.loc_mat_alpha, alpha)
-        
-        if texture_id is not None:
-            glUniform1i(self.loc_has_tex, 1)
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, texture_id)
-            glUniform1i(self.loc_tex, 0)
+    def invalidate_textures(self):
+        # quem mexer nos binds fora daqui tipo o streamer chama isto
+        self.bound_texture = None
+        self.bound_array = None
+
+    def bind_vao(self, vao):
+        if vao != self.bound_vao:
+            glBindVertexArray(vao)
+            self.bound_vao = vao
+
+    def invalidate_vao(self):
+        # fora do draw_queue os vaos sao ligados sem passar por aqui
+        self.bound_vao = None
+
+    def set_material(self, index, texture=None):
+        # index e a posicao do material na tabela so muda o int quando o material muda
+        if index != self.material_index:
+            glUniform1i(self.loc_mat_index, index)
+            self.material_index = index
+
+        # texture pode ser None um id de textura 2d ou uma TextureLayer
+        if texture is None:
+            layer = -1
+        elif isinstance(texture, TextureLayer):
+            layer = texture.layer if texture.ready else -1
+            if layer >= 0 and texture.array.texture != self.bound_array:
+                glActiveTexture(GL_TEXTURE1)
+                glBindTexture(GL_TEXTURE_2D_ARRAY, texture.array.texture)
+                self.bound_array = texture.array.texture
+        elif isinstance(texture, RenderTexture):
+            layer = -3 if texture.ready else -1
+            if layer == -3 and texture.texture != self.bound_texture:
+                glActiveTexture(GL_TEXTURE0)
+                glBindTexture(GL_TEXTURE_2D, texture.texture)
+                self.bound_texture = texture.texture
         else:
-            glUniform1i(self.loc_has_tex, 0)
+            layer = -2
+            if texture != self.bound_texture:
+                glActiveTexture(GL_TEXTURE0)
+                glBindTexture(GL_TEXTURE_2D, texture)
+                self.bound_texture = texture
+        if layer != self.texture_layer:
+            glUniform1i(self.loc_tex_layer, layer)
+            self.texture_layer = layer
 
     def set_light(self, index, position, ambient, diffuse, specular, direction=(0,-1,0), cutoff=-1.0):
         if 0 <= index < len(self.light_locs):
@@ -203,4 +301,5 @@ class ShaderProgram:
             glUniform3fv(locs['spec'], 1, np.array(specular, dtype=np.float32))
 
     def destroy(self):
+        self.materials.destroy()
         glDeleteProgram(self.prog)
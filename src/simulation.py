@@ -0,0 +1,27 @@
+
+# simulacao a passo fixo com acumulador tipo fix your timestep
+# os controladores avancam sempre com o mesmo dt e a renderizacao interpola entre os dois ultimos estados
+
+SIM_RATE = 120.0
+
+class FixedStepScheduler:
+    def __init__(self, rate=SIM_RATE, max_steps=8):
+        self.step_dt = 1.0 / rate
+        # limite de passos por frame pra um engasgo grande nao virar espiral
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.total_steps = 0
+
+    def advance(self, frame_dt, step_fn):
+        # corre os passos que couberem no tempo acumulado e devolve o alpha de interpolacao
+        self.accumulator += min(max(frame_dt, 0.0), self.step_dt * self.max_steps)
+        steps = 0
+        while self.accumulator >= self.step_dt and steps < self.max_steps:
+            step_fn(self.step_dt)
+            self.accumulator -= self.step_dt
+            steps += 1
+        self.total_steps += steps
+        return self.accumulator / self.step_dt
+
+    def reset(self):
+        self.accumulator = 0.0
@@ -0,0 +1,155 @@
+
+import os
+import hashlib
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from shader import link_program
+import memory
+
+# passe do ceu com cubemap em vez da esfera texturada de 8k triangulos
+# a panoramica equirectangular e convertida uma vez pra 6 faces e guardada em cache
+# desenha-se depois dos opacos com um triangulo de ecra inteiro na profundidade 1
+# assim o early z deita fora todos os pixeis ja tapados pela cena
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", ".cache")
+
+SKY_VS = r"""
+#version 330 core
+out vec2 vNdc;
+
+void main(){
+    // triangulo que cobre o ecra todo so com o gl_VertexID sem vbo
+    vec2 p = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2) * 2.0 - 1.0;
+    vNdc = p;
+    gl_Position = vec4(p, 1.0, 1.0); // z igual a w da profundidade 1
+}
+"""
+
+SKY_FS = r"""
+#version 330 core
+in vec2 vNdc;
+out vec4 fragColor;
+
+uniform mat4 uInvViewProj; // inversa de P vezes V sem translacao
+uniform samplerCube uSky;
+
+void main(){
+    vec4 dir = uInvViewProj * vec4(vNdc, 1.0, 1.0);
+    fragColor = vec4(texture(uSky, dir.xyz / dir.w).rgb, 1.0);
+}
+"""
+
+def face_directions(size):
+    # direcoes por pixel das 6 faces na ordem e convencao do opengl mais x menos x mais y menos y mais z menos z
+    c = (np.arange(size, dtype=np.float32) + 0.5) / size * 2.0 - 1.0
+    s, t = np.meshgrid(c, c) # s colunas t linhas com a primeira linha em t menos 1
+    one = np.ones_like(s)
+    faces = [
+        ( one,   -t,   -s),
+        (-one,   -t,    s),
+        (   s,  one,    t),
+        (   s, -one,   -t),
+        (   s,   -t,  one),
+        (  -s,   -t, -one),
+    ]
+    dirs = np.stack([np.stack(f, axis=-1) for f in faces])
+    return dirs / np.linalg.norm(dirs, axis=-1, keepdims=True)
+
+def equirect_to_cubemap(image, size):
+    # image H W 3 uint8 com a primeira linha no zenite
+    # a altura cobre pi vezes 2H sobre W tipo 2 pra 1 e a esfera toda 4 pra 1 so o hemisferio de cima
+    img = np.asarray(image, dtype=np.float32)
+    H, W = img.shape[:2]
+    v_span = np.pi * min(1.0, 2.0 * H / W)
+
+    d = face_directions(size)
+    # azimute igual ao da esfera antiga tipo atan2 z x
+    u = (np.arctan2(d[..., 2], d[..., 0]) / (2.0 * np.pi)) % 1.0
+    polar = np.arccos(np.clip(d[..., 1], -1.0, 1.0))
+    v = np.clip(polar / v_span, 0.0, 1.0) # abaixo do fim da imagem repete a ultima linha
+
+    # bilinear com a volta em u e limite em v
+    x = u * W - 0.5
+    y = v * (H - 1)
+    x0 = np.floor(x).astype(np.int64)
+    y0 = np.floor(y).astype(np.int64)
+    fx = (x - x0)[..., None]
+    fy = (y - y0)[..., None]
+    x1 = (x0 + 1) % W
+    x0 = x0 % W
+    y1 = np.minimum(y0 + 1, H - 1)
+    top = img[y0, x0] * (1.0 - fx) + img[y0, x1] * fx
+    bottom = img[y1, x0] * (1.0 - fx) + img[y1, x1] * fx
+    out = top * (1.0 - fy) + bottom * fy
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+def load_cubemap_faces(path, size=None):
+    # faces da cache se a imagem e o tamanho forem os mesmos senao converte e grava
+    with open(path, "rb") as f:
+        data = f.read()
+    image = np.asarray(Image.open(path).convert("RGB"))
+    if size is None:
+        size = max(64, image.shape[1] // 4)
+    key = hashlib.sha1(data + f"cube{size}".encode()).hexdigest()
+    cache = os.path.join(CACHE_DIR, "sky_" + key + ".npy")
+    if os.path.isfile(cache):
+        try:
+            return np.load(cache)
+        except (OSError, ValueError):
+            pass
+    faces = equirect_to_cubemap(image, size)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.save(cache, faces)
+    return faces
+
+class SkyPass:
+    def __init__(self, path, size=None):
+        faces = load_cubemap_faces(path, size)
+        size = faces.shape[1]
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture)
+        for i in range(6):
+            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + i, 0, GL_RGB8, size, size, 0,
+                         GL_RGB, GL_UNSIGNED_BYTE, np.ascontiguousarray(faces[i]))
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        for wrap in (GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_TEXTURE_WRAP_R):
+            glTexParameteri(GL_TEXTURE_CUBE_MAP, wrap, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, 0)
+        memory.track_texture(self.texture, path, memory.texture_bytes(size, size, mipmaps=False, channels=3, layers=6))
+
+        self.prog = link_program(SKY_VS, SKY_FS)
+        self.loc_inv_vp = glGetUniformLocation(self.prog, "uInvViewProj")
+        self.loc_sky = glGetUniformLocation(self.prog, "uSky")
+
+        # core profile precisa de um vao mesmo sem atributos
+        self.vao = glGenVertexArrays(1)
+
+    def draw(self, P, V):
+        # so a rotacao da camara conta pro ceu
+        V_rot = np.array(V, dtype=np.float32)
+        V_rot[:3, 3] = 0.0
+        inv_vp = np.linalg.inv(P @ V_rot).astype(np.float32)
+
+        glUseProgram(self.prog)
+        glUniformMatrix4fv(self.loc_inv_vp, 1, GL_TRUE, inv_vp)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture)
+        glUniform1i(self.loc_sky, 0)
+
+        # profundidade 1 so passa onde o depth ficou limpo
+        glDepthFunc(GL_LEQUAL)
+        glDepthMask(GL_FALSE)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, 3)
+        glBindVertexArray(0)
+        glDepthMask(GL_TRUE)
+        glDepthFunc(GL_LESS)
+
+    def destroy(self):
+        memory.forget_texture(self.texture)
+        glDeleteTextures(1, [self.texture])
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteProgram(self.prog)
@@ -0,0 +1,334 @@
+
+import io
+import os
+import time
+import ctypes
+import threading
+import queue
+from PIL import Image
+from OpenGL.GL import *
+import memory
+
+# carregamento de texturas sem parar o frame
+# a textura nasce logo com um pixel cinzento e o id pode ir ja pros materiais
+# a thread de trabalho descodifica o jpg e copia os pixeis pra um pixel unpack buffer ja mapeado
+# na thread do gl so se desmapeia faz o glTexSubImage2D a partir do pbo e mete uma fence
+# o pbo so volta pro pool quando a fence diz que a gpu acabou de o ler
+# texturas pequenas e quase quadradas tipo as que repetem no chao e nas paredes vao pra camadas de um so array
+# e partilham o bind as grandes ou compridas ficam em texturas 2d soltas ao tamanho delas
+
+PLACEHOLDER = (128, 128, 128, 255)
+
+LAYER_SIZE = 512     # tamanho de cada camada as texturas que cabem sao reescaladas pra ele
+MAX_ASPECT = 2.0     # mais comprida que isto fica solta pra nao esticar
+ARRAY_LAYERS = 8
+
+class TextureLayer:
+    # camada de um TextureArray e o que fica no texture_id da malha
+    # ate os pixeis chegarem ready e falso e a malha desenha so com a cor do material
+    def __init__(self, array, layer):
+        self.array = array
+        self.layer = layer
+        self.ready = False
+
+class TextureArray:
+    # um GL_TEXTURE_2D_ARRAY com camadas quadradas todas do mesmo tamanho
+    # ao contrario de um atlas o GL_REPEAT continua a funcionar por camada
+    # o armazenamento so e alocado no primeiro upload com as camadas ja reservadas
+    # assim nao ha camadas vazias e reservas depois disso ficam texturas soltas
+    def __init__(self, size=LAYER_SIZE, layers=ARRAY_LAYERS, max_aspect=MAX_ASPECT):
+        self.size = size
+        self.layers = layers         # maximo de camadas
+        self.max_aspect = max_aspect
+        self.used = 0
+        self.allocated = 0           # camadas com armazenamento na gpu zero ate ao primeiro upload
+        self.texture = glGenTextures(1)
+
+    def fits(self, width, height):
+        # maiores que a camada perdiam detalhe e compridas ficavam esmagadas
+        return max(width, height) <= self.size and max(width, height) <= self.max_aspect * min(width, height)
+
+    def reserve(self, width, height):
+        # None quando nao cabe ou esta cheio e quem pediu fica com uma textura 2d solta
+        if not self.fits(width, height): return None
+        if self.used >= (self.allocated or self.layers): return None
+        self.used += 1
+        return TextureLayer(self, self.used - 1)
+
+    def allocate(self):
+        if self.allocated: return
+        self.allocated = self.used
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture)
+        # todos os niveis alocados ja pra a textura ficar completa com mipmaps
+        level, s = 0, self.size
+        while s >= 1:
+            glTexImage3D(GL_TEXTURE_2D_ARRAY, level, GL_RGBA8, s, s, self.allocated, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+            level += 1
+            s //= 2
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+    def gpu_bytes(self):
+        return memory.texture_bytes(self.size, self.size, layers=self.allocated)
+
+    def destroy(self):
+        glDeleteTextures(1, [self.texture])
+
+class _Job:
+    def __init__(self, path, texture, size, on_ready, layer=None, pixels=None, data=None):
+        self.path = path
+        self.data = data     # bytes do ficheiro de imagem quando vem embebido tipo num glb
+        self.texture = texture
+        self.size = size
+        self.on_ready = on_ready
+        self.layer = layer
+        self.pixels = pixels # tipo pixeis e tamanho ja descodificados vindos do bundle
+        self.pbo = None
+        self.ptr = None
+        self.fence = None
+        self.error = None
+
+def _decode_into(job):
+    # corre na thread de trabalho so mexe em memoria do cpu e no ponteiro mapeado
+    w, h = job.size
+    if job.pixels is not None:
+        pixels, size = job.pixels
+        if size == (w, h):
+            # do mmap do bundle direto pro pbo sem descodificar nem copiar pelo meio
+            ctypes.memmove(job.ptr, pixels.ctypes.data, pixels.nbytes)
+            return
+        img = Image.frombuffer("RGBA", size, pixels, "raw", "RGBA", 0, 1)
+    else:
+        img = Image.open(io.BytesIO(job.data) if job.data is not None else job.path)
+        img = img.transpose(Image.FLIP_TOP_BOTTOM).convert("RGBA")
+    if img.size != (w, h):
+        img = img.resize((w, h), Image.BILINEAR)
+    data = img.tobytes()
+    ctypes.memmove(job.ptr, data, len(data))
+
+class TextureStreamer:
+    def __init__(self, array=None, bundle=None, max_pbos=2, uploads_per_frame=1):
+        self.array = array                        # TextureArray opcional pras camadas
+        self.bundle = bundle                      # Bundle opcional com os pixeis ja descodificados
+        self.max_pbos = max_pbos                  # pbos mapeados ou a ser lidos pela gpu ao mesmo tempo
+        self.uploads_per_frame = uploads_per_frame
+        self.free_pbos = []
+        self.waiting = []                         # pedidos a espera de um pbo
+        self.staging = 0                          # jobs entregues a thread
+        self.uploading = []                       # jobs com fence a espera da gpu
+        self.done_jobs = queue.Queue()
+        self.work = queue.Queue()
+        self.textures = {}                        # caminho pra id pra nao carregar duas vezes
+        self.sizes = {}                           # id das texturas 2d soltas pro tamanho enviado
+        self.pbo_sizes = {}                       # bytes de cada pbo do pool
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        max_size = glGetIntegerv(GL_MAX_TEXTURE_SIZE)
+        self.max_size = int(max_size) if max_size else 0
+        self.thread = threading.Thread(target=self._worker, name="texstream", daemon=True)
+        self.thread.start()
+
+    def _worker(self):
+        while True:
+            job = self.work.get()
+            if job is None: return
+            try:
+                _decode_into(job)
+            except Exception as e:
+                job.error = e
+            self.done_jobs.put(job)
+
+    def request(self, path, on_ready=None, data=None):
+        # devolve logo o id da textura com o pixel provisorio o conteudo chega uns frames depois
+        # com data o path so serve de chave e os bytes da imagem vem de dentro de outro ficheiro
+        if path in self.textures: return self.textures[path]
+        pixels = self.bundle.texture(path) if self.bundle is not None and data is None else None
+        if pixels is not None:
+            w, h = pixels[1]
+        else:
+            if data is None and not os.path.isfile(path): return None
+            try:
+                # so le o cabecalho pra saber o tamanho do pbo
+                with Image.open(io.BytesIO(data) if data is not None else path) as img:
+                    w, h = img.size
+            except Exception as e:
+                print(f"Texture error {path}: {e}")
+                return None
+        if self.max_size and max(w, h) > self.max_size:
+            k = self.max_size / max(w, h)
+            w, h = max(1, int(w * k)), max(1, int(h * k))
+
+        layer = self.array.reserve(w, h) if self.array is not None else None
+        if layer is not None:
+            size = self.array.size
+            self.textures[path] = layer
+            self.waiting.append(_Job(path, layer, (size, size), on_ready, layer, pixels, data))
+            return layer
+
+        tex_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE, bytes(PLACEHOLDER))
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        self.textures[path] = tex_id
+        self.waiting.append(_Job(path, tex_id, (w, h), on_ready, pixels=pixels, data=data))
+        return tex_id
+
+    def reload(self, path):
+        # o ficheiro mudou no disco a textura fica com o mesmo id ou camada e o conteudo novo
+        # chega pelo mesmo caminho dos pbos ate la continua a imagem antiga
+        texture = self.textures.get(path)
+        if texture is None: return None
+        try:
+            with Image.open(path) as img:
+                w, h = img.size
+        except Exception as e:
+            print(f"Texture error {path}: {e}")
+            return texture
+        if self.max_size and max(w, h) > self.max_size:
+            k = self.max_size / max(w, h)
+            w, h = max(1, int(w * k)), max(1, int(h * k))
+        if isinstance(texture, TextureLayer):
+            # a camada tem sempre o mesmo tamanho a imagem nova e reescalada pra ela como no arranque
+            size = texture.array.size
+            if not texture.array.fits(w, h): print(f"Textura {path} ja nao cabe na camada {(w, h)} reiniciar pra ficar solta")
+            self.waiting.append(_Job(path, texture, (size, size), None, texture))
+        else:
+            self.waiting.append(_Job(path, texture, (w, h), None))
+        return texture
+
+    def busy(self):
+        return bool(self.waiting or self.staging or self.uploading)
+
+    def update(self):
+        # chamar uma vez por frame na thread do gl devolve quantas texturas ficaram prontas
+        ready = self._retire()
+        self._upload()
+        self._stage()
+        return ready
+
+    def _retire(self):
+        # pbos cuja fence ja passou voltam pro pool sem nunca bloquear
+        ready = 0
+        still = []
+        for job in self.uploading:
+            status = glClientWaitSync(job.fence, 0, 0)
+            if status in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                glDeleteSync(job.fence)
+                self.free_pbos.append(job.pbo)
+                ready += 1
+                if job.on_ready: job.on_ready(job.texture)
+            else:
+                still.append(job)
+        self.uploading = still
+        return ready
+
+    def _upload(self):
+        for _ in range(self.uploads_per_frame):
+            try:
+                job = self.done_jobs.get_nowait()
+            except queue.Empty:
+                return
+            self.staging -= 1
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, job.pbo)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            if job.error is not None:
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+                print(f"Texture error {job.path}: {job.error}")
+                self.free_pbos.append(job.pbo)
+                continue
+
+            w, h = job.size
+            self.uploaded += 1
+            self.uploaded_bytes += w * h * 4
+            if job.layer is not None:
+                # camada do array tipo a mesma copia do pbo mas em 3d
+                layer = job.layer
+                layer.array.allocate()
+                glBindTexture(GL_TEXTURE_2D_ARRAY, layer.array.texture)
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, job.pbo)
+                glTexSubImage3D(GL_TEXTURE_2D_ARRAY, 0, 0, 0, layer.layer, w, h, 1,
+                                GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+                glGenerateMipmap(GL_TEXTURE_2D_ARRAY)
+                glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+                layer.ready = True
+                job.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+                self.uploading.append(job)
+                continue
+
+            self.sizes[job.texture] = (w, h)
+            glBindTexture(GL_TEXTURE_2D, job.texture)
+            # alocar sem o pbo ligado e depois copiar do pbo que a gpu le por dma
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, job.pbo)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, w, h, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+            glGenerateMipmap(GL_TEXTURE_2D)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            job.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+            self.uploading.append(job)
+
+    def _stage(self):
+        # mapear um pbo por pedido enquanto houver pbos livres e mandar pra thread
+        while self.waiting and self.staging + len(self.uploading) < self.max_pbos:
+            job = self.waiting.pop(0)
+            w, h = job.size
+            job.pbo = self.free_pbos.pop() if self.free_pbos else glGenBuffers(1)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, job.pbo)
+            # orfanar o armazenamento antigo assim o map nunca espera pela gpu
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, w * h * 4, None, GL_STREAM_DRAW)
+            self.pbo_sizes[job.pbo] = w * h * 4
+            job.ptr = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, w * h * 4,
+                                       GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT)
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+            if not job.ptr:
+                print(f"Texture error {job.path}: glMapBufferRange falhou")
+                self.free_pbos.append(job.pbo)
+                continue
+            self.staging += 1
+            self.work.put(job)
+
+    def texture_bytes(self):
+        # caminho pros bytes na gpu as camadas contam a parte delas no array
+        out = {}
+        for path, texture in self.textures.items():
+            if isinstance(texture, TextureLayer):
+                out[path] = memory.texture_bytes(texture.array.size, texture.array.size)
+            else:
+                w, h = self.sizes.get(texture, (1, 1))
+                out[path] = memory.texture_bytes(w, h, mipmaps=texture in self.sizes)
+        return out
+
+    def staging_bytes(self):
+        # so os pbos do pool o array so aloca as camadas que tem textura
+        return sum(self.pbo_sizes.values())
+
+    def flush(self, timeout=30.0):
+        # bloquear ate tudo o que foi pedido estar na gpu tipo antes do primeiro frame do headless
+        end = time.perf_counter() + timeout
+        while self.busy() and time.perf_counter() < end:
+            if not self.update(): time.sleep(0.001)
+        return not self.busy()
+
+    def destroy(self):
+        self.work.put(None)
+        self.thread.join(timeout=1.0)
+        for job in self.uploading:
+            glDeleteSync(job.fence)
+            self.free_pbos.append(job.pbo)
+        self.uploading = []
+        if self.free_pbos:
+            glDeleteBuffers(len(self.free_pbos), self.free_pbos)
+            self.free_pbos = []
+        self.pbo_sizes = {}
+        if self.array is not None: self.array.destroy()
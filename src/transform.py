@@ -51,6 +51,146 @@ def rotate(angle_rad, axis):
     M[:3,:3] = R3
     return M
 
-def normal_matrix(M):
-    N = M[:3,:3]
-    return np.linalg.inv(N).T.astype(np.float32)
+# tipos de matriz world pra escolher a matriz das normais mais barata
+RIGID = 0    # so rotacao e translacao a normal usa o bloco 3x3 direto
+UNIFORM = 1  # escala igual nos 3 eixos basta dividir por s ao quadrado
+GENERAL = 2  # escala nao uniforme ou shear precisa da inversa transposta
+
+def classify_affine(M, eps=1e-4):
+    # olhar pro produto das colunas L^T L tipo identidade rigida s2 I uniforme
+    L = M[:3,:3]
+    G = L.T @ L
+    s2 = (G[0,0] + G[1,1] + G[2,2]) / 3.0
+    off = abs(G[0,1]) + abs(G[0,2]) + abs(G[1,2])
+    diag = abs(G[0,0] - s2) + abs(G[1,1] - s2) + abs(G[2,2] - s2)
+    if off + diag > eps * max(s2, 1e-12) or s2 == 0: return GENERAL, 0.0
+    if abs(s2 - 1.0) <= eps: return RIGID, 1.0
+    return UNIFORM, float(s2)
+
+def normal_matrix(M, kind=None, s2=None):
+    # inversa transposta do bloco 3x3 sem linalg inv
+    L = M[:3,:3]
+    if kind is None: kind, s2 = classify_affine(M)
+    if kind == RIGID: return np.ascontiguousarray(L, dtype=np.float32)
+    if kind == UNIFORM: return (L / s2).astype(np.float32)
+    # cofatores tipo colunas c1 x c2 c2 x c0 c0 x c1 a dividir pelo determinante
+    c0, c1, c2 = L[:,0], L[:,1], L[:,2]
+    N = np.empty((3,3), dtype=np.float32)
+    N[:,0] = np.cross(c1, c2)
+    N[:,1] = np.cross(c2, c0)
+    N[:,2] = np.cross(c0, c1)
+    det = float(c0 @ N[:,0])
+    if det == 0: return np.ascontiguousarray(L, dtype=np.float32) # matriz degenerada
+    N /= det
+    return N
+
+# versoes em lote tipo arrays N 4 4 com destino out opcional
+# servem pra calcular todas as rodas portas e portoes de uma vez sem criar matrizes novas por no
+
+def _batch_out(n, out, shape=(4, 4)):
+    if out is None: return np.empty((n,) + shape, dtype=np.float32)
+    return out
+
+def _set_affine_row(out):
+    out[:, 3, :3] = 0.0
+    out[:, 3, 3] = 1.0
+
+def rotation3_batch(angles, axes, out=None):
+    # rotacoes 3x3 de rodrigues pra N angulos e N eixos ou um eixo partilhado
+    angles = np.asarray(angles, dtype=np.float32).reshape(-1)
+    n = angles.shape[0]
+    axes = np.asarray(axes, dtype=np.float32)
+    out = _batch_out(n, out, (3, 3))
+
+    if axes.ndim == 1:
+        # eixo partilhado tipo R = c I + s K + (1 - c) k kT com K e k kT constantes
+        norm = float(np.linalg.norm(axes))
+        if norm == 0:
+            out[:] = np.eye(3, dtype=np.float32)
+            return out
+        x, y, z = (axes / norm).tolist()
+        K = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]], dtype=np.float32)
+        KK = np.outer((x, y, z), (x, y, z)).astype(np.float32)
+        c = np.cos(angles)[:, None, None]
+        np.multiply(np.sin(angles)[:, None, None], K, out=out)
+        out += (1.0 - c) * KK
+        out += c * np.eye(3, dtype=np.float32)
+        return out
+
+    axes = np.broadcast_to(axes, (n, 3))
+    norms = np.linalg.norm(axes, axis=1)
+    safe = norms > 0
+    # eixo nulo da identidade igual ao rotate
+    unit = np.where(safe[:, None], axes / np.where(safe, norms, 1.0)[:, None], (1.0, 0.0, 0.0))
+    angles = np.where(safe, angles, 0.0)
+    x, y, z = unit[:, 0], unit[:, 1], unit[:, 2]
+    c = np.cos(angles); s = np.sin(angles); C = 1.0 - c
+    out[:, 0, 0] = x*x*C + c;   out[:, 0, 1] = x*y*C - z*s; out[:, 0, 2] = x*z*C + y*s
+    out[:, 1, 0] = y*x*C + z*s; out[:, 1, 1] = y*y*C + c;   out[:, 1, 2] = y*z*C - x*s
+    out[:, 2, 0] = z*x*C - y*s; out[:, 2, 1] = z*y*C + x*s; out[:, 2, 2] = z*z*C + c
+    return out
+
+def rotate_batch(angles, axes, out=None):
+    angles = np.asarray(angles, dtype=np.float32).reshape(-1)
+    out = _batch_out(angles.shape[0], out)
+    rotation3_batch(angles, axes, out=out[:, :3, :3])
+    out[:, :3, 3] = 0.0
+    _set_affine_row(out)
+    return out
+
+def translate_batch(offsets, out=None):
+    offsets = np.asarray(offsets, dtype=np.float32).reshape(-1, 3)
+    out = _batch_out(offsets.shape[0], out)
+    out[:, :3, :3] = np.eye(3, dtype=np.float32)
+    out[:, :3, 3] = offsets
+    _set_affine_row(out)
+    return out
+
+def scale_batch(factors, out=None):
+    # factors N ou N 3
+    factors = np.asarray(factors, dtype=np.float32)
+    if factors.ndim == 1: factors = np.repeat(factors[:, None], 3, axis=1)
+    out = _batch_out(factors.shape[0], out)
+    out[:, :3, :] = 0.0
+    out[:, 0, 0] = factors[:, 0]; out[:, 1, 1] = factors[:, 1]; out[:, 2, 2] = factors[:, 2]
+    _set_affine_row(out)
+    return out
+
+def pivot_transform_batch(pivots, linear, out=None):
+    # forma fechada de T(p) L T(-p) tipo bloco L e translacao p - L p
+    pivots = np.asarray(pivots, dtype=np.float32).reshape(-1, 3)
+    L = np.asarray(linear, dtype=np.float32)[:, :3, :3]
+    out = _batch_out(pivots.shape[0], out)
+    out[:, :3, :3] = L
+    out[:, :3, 3] = pivots - np.einsum('nij,nj->ni', L, pivots)
+    _set_affine_row(out)
+    return out
+
+def pivot_rotate_batch(pivots, angles, axes, out=None):
+    # rotacao de N pivots em torno de N eixos num so kernel sem as tres matrizes intermedias
+    pivots = np.asarray(pivots, dtype=np.float32).reshape(-1, 3)
+    out = _batch_out(pivots.shape[0], out)
+    R = rotation3_batch(angles, axes, out=out[:, :3, :3])
+    out[:, :3, 3] = pivots - np.einsum('nij,nj->ni', R, pivots)
+    _set_affine_row(out)
+    return out
+
+def compose(A, B, out=None):
+    # A @ B em lote out pode ser o proprio A ou B pra compor no sitio
+    return np.matmul(A, B, out=out)
+
+def lookAt_into(eye, center, up, out):
+    # igual ao lookAt mas escreve no out e faz as contas de vetores 3 em floats python
+    ex, ey, ez = float(eye[0]), float(eye[1]), float(eye[2])
+    fx, fy, fz = float(center[0]) - ex, float(center[1]) - ey, float(center[2]) - ez
+    n = math.sqrt(fx*fx + fy*fy + fz*fz); fx /= n; fy /= n; fz /= n
+    ux, uy, uz = float(up[0]), float(up[1]), float(up[2])
+    n = math.sqrt(ux*ux + uy*uy + uz*uz); ux /= n; uy /= n; uz /= n
+    sx, sy, sz = fy*uz - fz*uy, fz*ux - fx*uz, fx*uy - fy*ux
+    n = math.sqrt(sx*sx + sy*sy + sz*sz); sx /= n; sy /= n; sz /= n
+    ux, uy, uz = sy*fz - sz*fy, sz*fx - sx*fz, sx*fy - sy*fx
+    out[0] = (sx, sy, sz, -(sx*ex + sy*ey + sz*ez))
+    out[1] = (ux, uy, uz, -(ux*ex + uy*ey + uz*ez))
+    out[2] = (-fx, -fy, -fz, fx*ex + fy*ey + fz*ez)
+    out[3] = (0.0, 0.0, 0.0, 1.0)
+    return out
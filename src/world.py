@@ -0,0 +1,952 @@
+
+import os
+import math
+import numpy as np
+from OpenGL.GL import *
+
+from shader import ShaderProgram
+from scene import Node, create_grid_mesh, create_cube_mesh, create_sphere_mesh, model_node, bounding_spheres, cull_queue, draw_queue, sort_queue, release_mesh_geometry
+from arena import MeshArena
+from camera import Camera
+from transform import translate, rotate, scale, perspective
+from animation import Animator, SPIN
+from obj_loader import OBJModel
+from material import Material
+from profiler import FrameProfiler
+from simulation import FixedStepScheduler
+from collision import CollisionWorld, model_triangles
+from picking import ray_from_screen, pick, mesh_bvh
+from bake import bake_static, queue_triangles
+from sky import SkyPass
+from texstream import TextureStreamer, TextureArray
+from bundle import Bundle
+from glb import load_glb
+from hotreload import AssetReloader
+from rendertarget import SecondaryViews, MirrorView
+from oit import WeightedOIT
+import memory
+
+# auxiliar pra rotacao de pivo tipo T(P) * R * T(-P)
+def get_pivot_transform(pivot, rotation_matrix):
+    return translate(pivot[0], pivot[1], pivot[2]) @ \
+           rotation_matrix @ \
+           translate(-pivot[0], -pivot[1], -pivot[2])
+
+class CarController:
+    def __init__(self, root_node, chassis, wheels_dict, doors_dict, steering_wheel, animator=None):
+        self.root = root_node
+        self.chassis = chassis
+        self.wheels = wheels_dict # tipo fl fr etc
+        self.doors = doors_dict   # mesma coisa
+        self.steering_wheel = steering_wheel
+        
+        # comeca fora da garagem em frente ao portao da esquerda virado pra ele
+        # na origem ficava metido dentro da parede do canto
+        self.position = np.array([10.6, 0.65, 8.0], dtype=np.float32)
+        self.yaw = math.pi
+        self.speed = 0.0
+        
+        # configuracao do carro
+        self.max_speed = 10.0
+        self.acceleration = 5.0
+        self.friction = 2.0
+        self.turn_speed = 2.0
+        self.max_steer = 30.0
+        self.door_open_angle = 45.0
+        
+        # colisao com a garagem tipo caixa no plano xz meia largura e meio comprimento
+        self.collision = None
+        self.half_extents = (0.9, 1.8)
+        
+        # volante rodas e portas sao canais do animator os nos sao escritos no apply dele
+        # os canais do carro ficam seguidos pra o hold os parar com um so slice
+        self.anim = anim = animator if animator is not None else Animator()
+        first = len(anim.names)
+        self.steer = anim.add('volante', rate=5.0)
+        self.wheel_keys = list(self.wheels)
+        self.roll = np.array([anim.add('roda:' + k, rate=0.0, mode=SPIN) for k in self.wheel_keys], dtype=np.intp)
+        # portas todas independentes mesmo as que nao tem no
+        self.door_channels = {k: anim.add('porta:' + k, rate=2.0)
+                              for k in ('frente_esquerda', 'frente_direita', 'tras_esquerda', 'tras_direita')}
+        self.channels = slice(first, len(anim.names))
+        self.eased = np.array([self.steer] + list(self.door_channels.values()), dtype=np.intp)
+        
+        # rodas de tras sao maiores tipo 30 porcento e rolam mais devagar pra compensar
+        self.roll_rates = np.zeros(len(self.wheel_keys))
+        for i, key in enumerate(self.wheel_keys):
+            mount, pivot = self.wheels[key]
+            s = 1.3 if 'tras' in key else 1.0
+            self.roll_rates[i] = 20.0 / s
+            steer = math.radians(1.0) if 'frente' in key else 0.0
+            anim.bind(mount, [(self.steer, (0, 1, 0), steer), (self.roll[i], (1, 0, 0), 1.0)], pivot, s)
+        for key, (mount, pivot) in self.doors.items():
+            if key not in self.door_channels: continue
+            # negativo pra esquerda abrir pra fora positivo pra direita
+            sign = -1.0 if 'esquerda' in key else 1.0
+            anim.bind(mount, [(self.door_channels[key], (0, 1, 0), math.radians(sign))], pivot)
+        if self.steering_wheel:
+            anim.bind(self.steering_wheel, [(self.steer, (0, 0, 1), math.radians(3.0))])
+        
+        # estado do passo anterior e pose interpolada pra renderizar
+        self.prev = self._snapshot()
+        self.render_position = self.position.copy()
+        self.render_yaw = self.yaw
+
+    @property
+    def steering_angle(self):
+        return float(self.anim.value[self.steer])
+
+    def door_open(self, door_key):
+        i = self.door_channels.get(door_key)
+        return i is not None and self.anim.target[i] != 0.0
+
+    def _snapshot(self):
+        return (self.position.copy(), self.yaw)
+
+    def hold(self):
+        # sem passo neste frame o estado anterior passa a ser o atual pra nao interpolar
+        self.prev = self._snapshot()
+        self.anim.active[self.channels] = False
+
+    def step(self, dt, inputs):
+        # primeira metade do passo antes do step do animator tipo velocidade e alvos dos canais
+        self.prev = self._snapshot()
+        self.anim.active[self.channels] = True
+        
+        # aceleracao
+        if inputs['w']: self.speed += self.acceleration * dt
+        elif inputs['s']: self.speed -= self.acceleration * dt
+        else:
+            # atrito
+            if abs(self.speed) < 0.1: self.speed = 0
+            else: self.speed -= math.copysign(self.friction * dt, self.speed)
+            
+        # limitar velocidade
+        self.speed = max(-5.0, min(self.speed, self.max_speed))
+        
+        # direcao do volante suavizada pelo animator
+        target_steer = 0.0
+        if inputs['a']: target_steer = self.max_steer
+        elif inputs['d']: target_steer = -self.max_steer
+        self.anim.target[self.steer] = target_steer
+        
+        # rodar rodas so visual
+        self.anim.rate[self.roll] = self.speed * self.roll_rates
+
+    def move(self, dt):
+        # segunda metade depois do step do animator ja com o volante deste passo
+        # movimento
+        if abs(self.speed) > 0.1:
+            turn = math.radians(self.steering_angle) * (self.speed / self.max_speed) * self.turn_speed * dt
+            self.yaw += turn
+            
+            dx = math.sin(self.yaw) * self.speed * dt
+            dz = math.cos(self.yaw) * self.speed * dt
+            self.position[0] += dx
+            self.position[2] += dz
+        
+        # empurrar pra fora das paredes e perder a velocidade que ia contra elas
+        if self.collision is not None:
+            push, normal = self.collision.resolve(self.position[[0, 2]], self.yaw, self.half_extents)
+            if normal is not None:
+                self.position[0] += push[0]
+                self.position[2] += push[1]
+                into = math.sin(self.yaw) * normal[0] + math.cos(self.yaw) * normal[1]
+                if into * self.speed < 0: self.speed *= 1.0 - abs(into)
+
+    def apply(self, alpha=1.0):
+        # escrever na raiz a pose interpolada as pecas sao escritas pelo apply do animator
+        p_pos, p_yaw = self.prev
+        lerp = lambda a, b: a + (b - a) * alpha
+        
+        self.render_position = lerp(p_pos, self.position)
+        self.render_yaw = lerp(p_yaw, self.yaw)
+        
+        # atualizar transformacao da raiz do carro
+        pos = self.render_position
+        self.root.local = translate(pos[0], pos[1], pos[2]) @ \
+                          rotate(self.render_yaw, (0, 1, 0))
+
+    def update(self, dt, inputs):
+        # sozinho sem o world com um animator partilhado avanca tambem os outros canais
+        self.step(dt, inputs)
+        self.anim.step(dt)
+        self.move(dt)
+        self.apply(1.0)
+        self.anim.apply(1.0)
+
+    def is_settled(self, eps=0.05):
+        # parado com o volante ao centro e as portas no alvo a aproximacao e exponencial por isso com folga
+        return self.speed == 0.0 and self.anim.settled(self.eased, eps)
+
+    def toggle_door(self, door_key):
+        i = self.door_channels.get(door_key)
+        if i is not None:
+            self.anim.target[i] = 0.0 if self.door_open(door_key) else self.door_open_angle
+
+class GarageController:
+    def __init__(self, left_gate, right_gate, left_pivot, right_pivot, animator=None):
+        self.left_gate = left_gate
+        self.right_gate = right_gate
+        self.left_pivot = left_pivot
+        self.right_pivot = right_pivot
+        
+        self.max_angle = 90.0 # graus
+        # acima disto a parte de baixo do portao ja passa por cima do tejadilho
+        self.clear_angle = 50.0
+        
+        # um canal pros dois portoes
+        # rotacao em torno do eixo x pra abrir pra cima com a dobradica no topo
+        # carro olha pra menos z e garagem abre pra z por isso o angulo e negativo
+        self.anim = anim = animator if animator is not None else Animator()
+        self.channel = anim.add('portao', rate=2.0)
+        anim.bind(left_gate, [(self.channel, (1, 0, 0), -math.radians(1.0))], left_pivot)
+        anim.bind(right_gate, [(self.channel, (1, 0, 0), -math.radians(1.0))], right_pivot)
+
+    @property
+    def angle(self):
+        return float(self.anim.value[self.channel])
+
+    @property
+    def is_open(self):
+        return self.anim.target[self.channel] != 0.0
+        
+    def update(self, dt):
+        # sozinho sem o world com um animator partilhado avanca tambem os outros canais
+        self.anim.step(dt)
+        self.anim.apply(1.0)
+        
+    def toggle(self):
+        self.anim.target[self.channel] = 0.0 if self.is_open else self.max_angle
+        
+    def is_settled(self, eps=0.05):
+        return self.anim.settled([self.channel], eps)
+
+    def is_blocking(self):
+        return self.angle < self.clear_angle
+
+def load_obj_node(path, name, color=None, alpha=1.0, specular=(1,1,1), shininess=32.0, center=False, arena=None, textures=None, bundle=None, glb=None, assets=None, keep_geometry=False):
+    try:
+        # primeiro o objeto com o mesmo nome dentro do glb depois o bundle e por fim o obj solto
+        model = glb.part(os.path.splitext(os.path.basename(path))[0]) if glb is not None else None
+        if model is None and bundle is not None: model = bundle.model(path, textures)
+        if model is None: model = OBJModel(path, textures)
+        c = (0,0,0)
+        if center: c = model.get_center()
+        options = dict(color=color, alpha=alpha, specular=specular, shininess=shininess, arena=arena)
+        node = model_node(model, name, **options)
+        # o reloader fica a saber que malhas sairam deste obj pra trocar quando o ficheiro mudar
+        if assets is not None and not getattr(model, "authored", False): assets.track(path, node, model, options)
+        # as listas do parse ja foram pros buffers ficam so os limites e a copia compacta das malhas
+        if hasattr(model, "release_geometry"):
+            parsed = memory.model_cpu_bytes(model)
+            if not keep_geometry: model.release_geometry()
+            memory.record_model(path, parsed, memory.model_cpu_bytes(model))
+        return node, model
+
+    except Exception as e:
+        print(f"Falha ao carregar {path}: {e}")
+        return Node(name), None
+
+def apply_texture_recursive(node, texture_id):
+    if node.mesh:
+        node.mesh.texture_id = texture_id
+    for c in node.children:
+        apply_texture_recursive(c, texture_id)
+
+# auxiliar pra por o mesmo material numa subarvore toda
+def set_material_recursive(node, material):
+    node.material = material
+    for c in node.children:
+        set_material_recursive(c, material)
+
+# teclas que ficam premidas o resto sao toggles disparados ao carregar
+HOLD_ACTIONS = ('w', 's', 'a', 'd', 'q', 'e')
+
+# acoes disparadas ao carregar na ordem fixa usada pelos ficheiros de gravacao
+TRIGGER_ACTIONS = ('garage', 'door:frente_direita', 'door:frente_esquerda', 'door:tras_direita',
+                   'door:tras_esquerda', 'headlights', 'camera_free', 'camera_first_person',
+                   'camera_toggle', 'zoom_in', 'zoom_out')
+
+# cabeca do condutor no espaco do car orient tipo camara 1a pessoa e olho dos retrovisores
+DRIVER_HEAD = (-0.30, 0.40, 0.1)
+
+# cena toda sem janela tipo shader camara carro garagem e luzes
+# precisa so de um contexto gl ativo pode ser glfw egl ou osmesa
+class World:
+    def __init__(self, keep_mesh_geometry=True, mirror_every=2, resolution=None, oit=True):
+        # inicializar shader
+        self.shader = ShaderProgram()
+        # desligado por defeito quem quiser medir liga o enabled
+        self.profiler = FrameProfiler(enabled=False)
+        # controladores a passo fixo com interpolacao na renderizacao
+        self.scheduler = FixedStepScheduler()
+        
+        # camara
+        camera = Camera(radius=15.0, height=8.0)
+    
+        # toda a geometria estatica vai pra poucos buffers grandes
+        arena = MeshArena()
+        # texturas descodificadas numa thread e enviadas por pbo sem parar os frames
+        # modelos e texturas de um so ficheiro mapeado se existir o assets bundle
+        bundle = Bundle.open_default()
+        # texturas pequenas em camadas de um so GL_TEXTURE_2D_ARRAY pra os draws so trocarem o indice
+        textures = TextureStreamer(TextureArray(), bundle)
+        # carro exportado do blender num so glb se existir as pecas que la nao estiverem vem dos obj
+        car_glb = load_glb("../models/carro.glb", textures)
+        # modelos e texturas que mudarem no disco recarregam por baixo dos mesmos nos quando ligado
+        assets = AssetReloader(textures, self.shader.materials)
+    
+        # construcao da cena
+        cube_mesh = create_cube_mesh(1.0, arena=arena)
+        # chao
+        # aumentar tamanho pra 150 e repeticao pra 30
+        grid_mesh = create_grid_mesh(150, 30, arena=arena) 
+    
+        root = Node("Root")
+
+        floor = Node("Floor", mesh=grid_mesh, 
+                     material_diffuse=(0.8, 0.8, 0.8),
+                     material_specular=(0.0, 0.0, 0.0),  # sem reflexao especular
+                     material_shininess=1.0)  # superficie mate
+        tex_id = textures.request("../models/grass.jpg")
+        if tex_id: floor.mesh.texture_id = tex_id
+        root.add(floor)
+
+        # ceu num passe proprio com cubemap desenhado depois dos opacos
+        self.sky = None
+        if os.path.isfile("../models/sky_panoramic.jpg"):
+            try:
+                self.sky = SkyPass("../models/sky_panoramic.jpg")
+            except Exception as e:
+                print(f"Falha ao criar o ceu: {e}")
+    
+        # sol esfera brilhante como fonte de luz
+        sun_pos = np.array([200.0, 150.0, 200.0], dtype=np.float32)  # posicao do sol
+        sun_mesh = create_sphere_mesh(20.0, 32, 32, arena=arena)  # esfera de raio 20
+        sun = Node("Sun", mesh=sun_mesh,
+                   local=translate(sun_pos[0], sun_pos[1], sun_pos[2]),
+                   material_emission=(3.0, 2.5, 1.5),  # amarelo laranja brilhante
+                   material_diffuse=(0.0, 0.0, 0.0),
+                   material_specular=(0.0, 0.0, 0.0))
+        root.add(sun)
+    
+        # construcao do carro
+        car_root = Node("CarRoot")
+    
+        # no rotador pra corrigir orientacao tipo 180 graus
+        # se o carro tiver virado pra tras rodar 180 em y deve corrigir
+        car_orient = Node("CarOrient", local=rotate(math.radians(180), (0, 1, 0)))
+        car_root.add(car_orient)
+
+        # chassis pintura azul
+        chassis, chassis_model = load_obj_node("../models/carrocaria.obj", "ChassisModel", 
+                                color=(0.0, 0.3, 0.9), specular=(1.0, 1.0, 1.0), shininess=64.0, center=False, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        car_orient.add(chassis)
+    
+        # luzes
+        luz_frente, _ = load_obj_node("../models/luz_frente.obj", "LuzFrente", color=(1.0, 1.0, 0.9), arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        luz_tras, _ = load_obj_node("../models/luz_tras.obj", "LuzTras", color=(0.8, 0.0, 0.0), arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        luz_tras, _ = load_obj_node("../models/luz_tras.obj", "LuzTras", color=(0.8, 0.0, 0.0), arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        car_orient.add(luz_frente, luz_tras)
+        # um material por grupo de luzes assim ligar e desligar e uma so atribuicao
+        headlight_material = Material("Farois", diffuse=(1.0, 1.0, 0.9))
+        taillight_material = Material("Farolins", diffuse=(0.8, 0.0, 0.0), emission=(0.3, 0.0, 0.0))
+        set_material_recursive(luz_frente, headlight_material)
+        set_material_recursive(luz_tras, taillight_material)
+
+        # configuracao do interior ajuste aqui
+    
+        # 1 banco racing seat
+        # posicao x y z tipo x lateral y altura z frente tras
+        seat_pos = (-0.30, -0.25, -0.2) 
+    
+        # escala tamanho do banco
+        seat_scale = 0.075 # reduzido pra um quarto de 015
+    
+        # rotacao ajuste se o banco tiver virado pro lado errado
+        seat_rot_y = 90.0 # graus rodar 90 pra esquerda
+
+        seat_mount = Node("SeatMount", local=translate(seat_pos[0], seat_pos[1], seat_pos[2]) @ \
+                                             rotate(math.radians(seat_rot_y), (0, 1, 0)) @ \
+                                             scale(seat_scale, seat_scale, seat_scale))
+        seat_node, seat_model = load_obj_node("../models/racing_seat_completed.obj", "RacingSeat", 
+                                              color=(0.2, 0.2, 0.2), specular=(0.5, 0.5, 0.5), shininess=16.0, center=True, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        seat_mount.add(seat_node)
+        car_orient.add(seat_mount)
+
+        # 2 volante
+        volante_node, volante_model = load_obj_node("../models/volante.obj", "Volante", 
+                                                    color=(0.1, 0.1, 0.1), specular=(0.8, 0.8, 0.8), shininess=64.0, center=True, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+    
+        # posicao x y z
+        vol_pos = (-0.30, 0.25, -0.6) 
+    
+        # escala
+        vol_scale = 0.65 
+    
+        # inclinacao graus ajustar angulo da coluna de direcao
+        vol_tilt = 20.0
+    
+        volante_mount = Node("VolanteMount", local=translate(vol_pos[0], vol_pos[1], vol_pos[2]) @ \
+                                                   rotate(math.radians(vol_tilt), (1, 0, 0)) @ \
+                                                   scale(vol_scale, vol_scale, vol_scale))
+    
+        volante_mount.add(volante_node)
+        car_orient.add(volante_mount)
+    
+        # rodas separadas
+        wheels = {}
+        wheel_files = {
+            'frente_esquerda': 'roda_frente_esquerda',
+            'frente_direita': 'roda_frente_direita',
+            'tras_esquerda': 'roda_tras_esquerda',
+            'tras_direita': 'roda_tras_direita'
+        }
+    
+        for key, name in wheel_files.items():
+            # carregar e centrar logicamente
+            node, model = load_obj_node(f"../models/{name}.obj", name, 
+                                         color=(0.1, 0.1, 0.1), specular=(0.8, 0.8, 0.8), shininess=32.0, center=True, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        
+            # pivot da roda e a origem posta no blender ou o centro geometrico
+            center = model.pivot if getattr(model, "pivot", None) is not None else model.get_center()
+
+            # mount identity assumindo vertices globais
+            mount = Node(name + "_Mount") 
+            mount.add(node)
+            car_orient.add(mount)
+        
+            wheels[key] = (mount, center)
+
+        # portas separadas
+        doors = {}
+        door_files = {
+            'frente_esquerda': 'porta_frente_esquerda',
+            'frente_direita': 'porta_frente_direita',
+            'tras_esquerda': 'porta_tras_esquerda',
+            'tras_direita': 'porta_tras_direita'
+        }
+    
+        # mapeamento de vidros e retrovisores pra cada porta
+        glass_files = {
+            'frente_esquerda': 'vidro_porta_frente_esquerdo',
+            'frente_direita': 'vidro_porta_frente_direito',
+            'tras_esquerda': 'vidro_porta_tras_esquerdo',
+            'tras_direita': 'vidro_porta_tras_direito'
+        }
+    
+        mirror_files = {
+            'frente_esquerda': 'retrovisor_fora_esquerda',
+            'frente_direita': 'retrovisor_fora_direita'
+        }
+        mirror_nodes = []
+
+        for key, name in door_files.items():
+            # carregar porta
+            door_node, door_model = load_obj_node(f"../models/{name}.obj", name, 
+                                                   color=(0.0, 0.3, 0.9), specular=(1.0, 1.0, 1.0), shininess=64.0, center=True, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        
+            # calcular pivot baseado nos limites tipo bounding box
+            # esquerda min x direita max x
+            # dobradica provavelmente na frente do carro tipo min z ou max z
+            # assumindo min z como frente baseado em opengl padrao
+            # experimentar min z pro pivot z
+            min_v, max_v = door_model.get_bounds()
+            center = door_model.get_center()
+        
+            pivot_x = center[0]
+            if 'esquerda' in key: pivot_x = min_v[0]
+            elif 'direita' in key: pivot_x = max_v[0]
+        
+            # ajustar z pra ponta da porta assumindo que a porta e comprida em z
+            # se as portas abrem normalmente a dobradica e na frente
+            # vamo tentar min z tipo frente se for portas de tras talvez max z
+            # por agora min z pra todas
+            pivot_z = min_v[2] # tentativa de dobradica na frente
+            
+            pivot = (pivot_x, center[1], pivot_z)
+            # no glb a dobradica e a origem da porta no blender
+            if getattr(door_model, "pivot", None) is not None: pivot = tuple(door_model.pivot)
+        
+        
+            mount = Node(name + "_Mount") # identity transform
+            mount.add(door_node)
+            car_orient.add(mount)
+        
+            doors[key] = (mount, pivot)
+        
+            # carregar vidro e ligar a porta
+            if key in glass_files:
+                g_name = glass_files[key]
+                glass, _ = load_obj_node(f"../models/{g_name}.obj", g_name,
+                                         color=(0.2, 0.3, 0.4), alpha=0.4, specular=(1,1,1), shininess=128, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+                door_node.add(glass)
+            
+            # carregar retrovisor e ligar a porta
+            if key in mirror_files:
+                m_name = mirror_files[key]
+                mirror, _ = load_obj_node(f"../models/{m_name}.obj", m_name, color=(0.1, 0.1, 0.1), arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+                door_node.add(mirror)
+                # no glb o retrovisor ja veio como filho da porta com o nome do objeto no blender
+                if not mirror.children: mirror = door_node.find(m_name) or mirror
+                mirror_nodes.append(mirror)
+
+        # outros vidros parabrisas e atras estaticos
+        parabrisas, _ = load_obj_node("../models/parabrisas.obj", "Parabrisas", 
+                                   color=(0.2, 0.3, 0.4), alpha=0.4, specular=(1,1,1), shininess=128, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        vidro_atras, _ = load_obj_node("../models/vidro_atras.obj", "VidroAtras", 
+                                   color=(0.2, 0.3, 0.4), alpha=0.4, specular=(1,1,1), shininess=128, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+        car_orient.add(parabrisas, vidro_atras)
+    
+        # interior
+        # banco racing seat
+        # posicionar no lado do condutor esquerda
+        seat_node, seat_model = load_obj_node("../models/racing_seat_completed.obj", "RacingSeat", 
+                                              color=(0.2, 0.2, 0.2), specular=(0.5, 0.5, 0.5), shininess=16.0, center=True, arena=arena, textures=textures, bundle=bundle, glb=car_glb, assets=assets)
+    
+        # ajustar posicao tentativa inicial
+        root.add(car_root)
+    
+        # todas as pecas animadas do carro e da garagem num so animator
+        animator = Animator()
+        car_ctrl = CarController(car_root, chassis, wheels, doors, volante_node, animator)
+    
+        # construcao da garagem modelos novos
+        garage_root = Node("Garage", local=translate(0, 0, 0)) # assumindo origem centrada no blend
+    
+        # 1 estrutura fora
+        # 1 estrutura fora
+        struct_node, walls_model = load_obj_node("../models/garagem_parte_fora_paredes.obj", "GarageStruct", 
+                                                  color=(0.7, 0.7, 0.7), specular=(0.2, 0.2, 0.2), center=False, arena=arena, textures=textures, bundle=bundle, assets=assets)
+    
+        # aplicar textura de parede
+        wall_tex = textures.request("../models/wall.jpg")
+        if wall_tex: apply_texture_recursive(struct_node, wall_tex)
+    
+        garage_root.add(struct_node)
+        static_nodes = [struct_node]
+    
+        # 2 estrutura dentro
+        struct_node, struct_model = load_obj_node("../models/garagem_parte_dentro_luzes.obj", "GarageLights", 
+                                                  color=(0.7, 0.7, 0.7), specular=(0.2, 0.2, 0.2), center=False, arena=arena, textures=textures, bundle=bundle, assets=assets)
+        garage_root.add(struct_node)
+        static_nodes.append(struct_node)
+
+        # 3 piso
+        struct_node, pillars_model = load_obj_node("../models/garagem_parte_dentro_pilares.obj", "GaragePillars", 
+                                                color=(0.7, 0.7, 0.7), specular=(0.2, 0.2, 0.2), center=False, arena=arena, textures=textures, bundle=bundle, assets=assets)
+        garage_root.add(struct_node)
+        static_nodes.append(struct_node)
+    
+        # 4 portoes
+        # textura do portao
+        gate_tex = textures.request("../models/garage_door.jpg")
+
+        # esquerda
+        gate_l_node, gate_l_model = load_obj_node("../models/garagem_portao.obj", "GateLeft", 
+                                                  color=(0.8, 0.8, 0.8), center=False, arena=arena, textures=textures, bundle=bundle, assets=assets)
+        if gate_tex: apply_texture_recursive(gate_l_node, gate_tex)
+    
+        # pivot em cima max y
+        gl_min, gl_max = gate_l_model.get_bounds()
+        # centro x pra simetria
+        center_x = (gl_min[0] + gl_max[0]) / 2.0
+    
+        # pivot centro x do portao topo y frente z
+        # usando min z como frente da folha do portao
+        gate_pivot = (center_x, gl_max[1], gl_min[2]) 
+    
+        gate_l_mount = Node("GateL_Mount") 
+        gate_l_mount.add(gate_l_node)
+        garage_root.add(gate_l_mount)
+
+        # direita
+        # o modelo e o mesmo se tiver centrado na origem temos que mover pros lados
+        # se tiver na esquerda global temos que mover pra direita
+        # ajuste manual do offset
+    
+        gate_r_node, _ = load_obj_node("../models/garagem_portao.obj", "GateRight", 
+                                       color=(0.8, 0.8, 0.8), center=False, arena=arena, textures=textures, bundle=bundle, assets=assets)
+        if gate_tex: apply_texture_recursive(gate_r_node, gate_tex)
+    
+        gate_r_mount = Node("GateR_Mount")
+        gate_r_mount.add(gate_r_node)
+    
+        # ajuste aqui offset pra separar os portoes
+        # se tao sobrepostos tenta valores tipo 5 6 10 ou negativos
+        # se center x for a posicao original tipo menos 3 entao menos 2 vezes menos 3 da mais 6 move pra mais 3
+        # se tiverem a sobrepor talvez o offset automatico tenha sido 0
+    
+        gate_r_offset_val = 28.3 # tenta mudar isto tipo 5 6 menos 6
+    
+        gate_r_offset = Node("GateR_Offset", local=translate(gate_r_offset_val, 0, 0))
+        gate_r_offset.add(gate_r_mount)
+        garage_root.add(gate_r_offset)
+    
+        root.add(garage_root)
+    
+        # controlador
+        # nota passamos gate r mount que roda no sitio errado mas como ta dentro do gate r offset
+        # visualmente aparece no sitio certo a rodar sobre o proprio eixo que e igual ao da esquerda
+        garage_ctrl = GarageController(gate_l_mount, gate_r_mount, gate_pivot, gate_pivot, animator)
+        
+        # colisao paredes e pilares fixos e os portoes fechados numa camada que desliga ao abrir
+        # a garagem ta na origem e o portao da direita so tem o offset em x
+        collision = CollisionWorld()
+        collision.add_layer("walls", np.concatenate([model_triangles(walls_model), model_triangles(pillars_model)]))
+        collision.add_layer("gates", np.concatenate([model_triangles(gate_l_model),
+                                                     model_triangles(gate_l_model, gate_r_offset.local)]))
+        car_ctrl.collision = collision
+        if chassis_model is not None:
+            # caixa do carro a partir da carrocaria simetrica em torno da raiz
+            c_min, c_max = chassis_model.get_bounds()
+            car_ctrl.half_extents = (float(max(-c_min[0], c_max[0])), float(max(-c_min[2], c_max[2])))
+        
+        # oclusao ambiente e luz indireta da garagem parada vem da cache ou e calculada uma vez
+        # os triangulos de cada no ficam guardados pra um no recarregado voltar a ser feito com os outros a ocluir
+        static_queue = []
+        for node in static_nodes: node.collect(garage_root.local, static_queue)
+        self.static_nodes = static_nodes
+        self.static_tris = [queue_triangles(node.collect(garage_root.local, [])) for node in static_nodes]
+        bake_static(static_queue, sun_pos, occluders=np.concatenate(self.static_tris))
+        
+        # estado de input
+        self.inputs = {'w': False, 's': False, 'a': False, 'd': False, 'q': False, 'e': False, '1': False}
+        
+        self.camera = camera
+        self.arena = arena
+        self.textures = textures
+        self.bundle = bundle
+        self.car_glb = car_glb
+        self.assets = assets
+        self.root = root
+        self.garage_root = garage_root
+        self.sun_pos = sun_pos
+        self.luz_frente = luz_frente
+        self.luz_tras = luz_tras
+        self.headlight_material = headlight_material
+        self.taillight_material = taillight_material
+        self.animator = animator
+        self.car_ctrl = car_ctrl
+        self.garage_ctrl = garage_ctrl
+        self.collision = collision
+        
+        # clicar numa porta ou portao dispara a mesma acao que a tecla
+        # todos os nos debaixo de cada mount apontam pra acao
+        self.pick_roots = [(mount, 'door:' + key) for key, (mount, _) in doors.items()]
+        self.pick_roots += [(gate_l_mount, 'garage'), (gate_r_mount, 'garage')]
+        self.mark_pick_actions()
+        # um obj recarregado debaixo de uma porta ou portao tem filhos novos que tem de voltar a ser clicaveis
+        assets.on_reload.append(self.reload_pick_actions)
+        # a troca dos buffers volta a por o bake por defeito na garagem tem de ser refeito
+        assets.on_reload.append(self.reload_bake)
+
+        # retrovisores desenhados num fbo pequeno de mirror_every em mirror_every frames desfasados
+        # zero desliga e ficam so a geometria cinzenta
+        self.views = SecondaryViews()
+        if mirror_every > 0:
+            for i, node in enumerate(mirror_nodes):
+                try:
+                    self.views.add(MirrorView(node, car_orient, DRIVER_HEAD, every=mirror_every, phase=i))
+                except ValueError as e:
+                    print(f"Retrovisor sem vista: {e}")
+        # um retrovisor recarregado volta a ter os uv do plano e a textura do fbo
+        assets.on_reload.append(self.views.reloaded)
+
+        # bake colisao e bvh das portas ja estao feitos as copias do cpu das malhas podem ir
+        # o hot reload volta a por as copias nas malhas que trocar
+        if not keep_mesh_geometry: release_mesh_geometry(root)
+        
+        # ultima view projection desenhada pro picking
+        self.last_VP = None
+        # DynamicResolution ou None pra desenhar direto no framebuffer de quem chama
+        self.resolution = resolution
+        # vidros com transparencia independente da ordem sem isto vao pelo blend normal pela ordem da arvore
+        self.oit = WeightedOIT() if oit else None
+
+    def memory_report(self):
+        # bytes de cpu por modelo e malha e de gpu por malha textura e pool agora mesmo
+        return memory.scene_report(self.root, self.arena, self.textures)
+
+    def apply_action(self, action, pressed=True):
+        # todas as acoes de input passam por aqui pra poderem ser gravadas e repetidas
+        if action in HOLD_ACTIONS:
+            self.inputs[action] = pressed
+            return
+        if not pressed: return
+
+        camera = self.camera
+        if action == 'garage': self.garage_ctrl.toggle()
+        elif action.startswith('door:'): self.car_ctrl.toggle_door(action[5:])
+        elif action == 'headlights': self.inputs['1'] = not self.inputs['1']
+        elif action == 'camera_free':
+            camera.mode = "FREE" if camera.mode != "FREE" else "ORBIT"
+        elif action == 'camera_first_person':
+            if camera.mode == "FIRST_PERSON":
+                camera.mode = "ORBIT"
+            else:
+                camera.mode = "FIRST_PERSON"
+        elif action == 'camera_toggle': camera.toggle_mode()
+        elif action == 'zoom_in': camera.zoom(0.9)
+        elif action == 'zoom_out': camera.zoom(1.1)
+
+    def is_quiescent(self):
+        # nada a mexer nem a caminho tipo teclas largadas controladores no alvo e sem texturas ou reloads pendentes
+        # o frame seguinte seria igual ao ultimo por isso a janela pode esperar por eventos
+        if any(self.inputs[k] for k in HOLD_ACTIONS): return False
+        camera = self.camera
+        # no modo livre o carro nao e simulado as portas ficam onde estavam
+        if camera.mode != "FREE" and not self.car_ctrl.is_settled(): return False
+        if camera.mode == "ORBIT" and getattr(camera, 'angle_offset', 0.0) != 0.0: return False
+        if not self.garage_ctrl.is_settled(): return False
+        return not self.textures.busy() and not self.assets.busy()
+
+    def setup_gl_state(self):
+        glEnable(GL_DEPTH_TEST)
+        glDisable(GL_CULL_FACE) # correcao pra partes internas invisiveis
+    
+        # alpha blending
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        
+        # malhas sem bake ficam sem luz indireta e sem oclusao
+        glVertexAttrib4f(3, 0.0, 0.0, 0.0, 1.0)
+
+    def update(self, dt, t, mouse_dx=0, mouse_dy=0):
+        with self.profiler.scope("update", gpu=False):
+            self._update(dt, t, mouse_dx, mouse_dy)
+
+    def _update(self, dt, t, mouse_dx, mouse_dy):
+        camera = self.camera
+        car_ctrl = self.car_ctrl
+        inputs = self.inputs
+        
+        # simulacao a passo fixo o carro fica parado no modo livre
+        # o animator avanca portas portoes rodas e volante todos num so passo
+        # entre os alvos postos pelo carro e o movimento que ja usa o volante deste passo
+        def sim_step(h):
+            self.collision.set_enabled("gates", self.garage_ctrl.is_blocking())
+            driving = camera.mode != "FREE"
+            if driving: car_ctrl.step(h, inputs)
+            else: car_ctrl.hold()
+            with self.profiler.scope("animation", gpu=False):
+                self.animator.step(h)
+            if driving:
+                with self.profiler.scope("car", gpu=False):
+                    car_ctrl.move(h)
+        
+        alpha = self.scheduler.advance(dt, sim_step)
+        car_ctrl.apply(alpha)
+        self.animator.apply(alpha)
+        
+        # atualizar
+        if camera.mode == "FREE":
+            camera.update_free_cam(dt, inputs, (mouse_dx, mouse_dy))
+        else:
+            if camera.mode == "FIRST_PERSON":
+                # posicao da cabeca tipo driver head
+                # offset relativo ao car orient que ta rodado 180
+                # seat menos 030 menos 025 menos 02 volante z menos 06
+                # cabeca anterior menos 025
+                # ajuste mover pra tras direcao mais z local do car orient pois menos z e frente world
+                # tentativa 01 mais pra tras que menos 025
+                head_local = np.array(DRIVER_HEAD + (1.0,), dtype=np.float32)
+                
+                # transformacao pra world
+                # 1 car orient rotate 180 y
+                # 2 car root translate pos mais rotate yaw
+                
+                car_rot = rotate(car_ctrl.render_yaw, (0, 1, 0))
+                mesh_orient = rotate(math.radians(180), (0, 1, 0))
+                
+                total_rot = car_rot @ mesh_orient
+                
+                head_pos_rel = total_rot @ head_local
+                head_world = car_ctrl.render_position + head_pos_rel[:3]
+                
+                camera.position = head_world
+                
+                # forward vector alinhado com o carro
+                cy = car_ctrl.render_yaw
+                camera.front = np.array([math.sin(cy), 0, math.cos(cy)], dtype=np.float32)
+                camera.up = np.array([0, 1, 0], dtype=np.float32)
+                
+            else:
+                # camara inteligente tipo smart follow camera
+                # angulo base e o yaw do carro mais 180 pois o modelo foi rodado
+                base_angle = math.degrees(car_ctrl.render_yaw) + 180
+                
+                # input do rato adiciona a um angulo offset
+                if mouse_dx != 0:
+                    camera.angle_offset = getattr(camera, 'angle_offset', 0.0) - mouse_dx * 0.2
+                    camera.last_mouse_time = t
+                
+                # auto alinhar se sem input por 2 segundos
+                if t - getattr(camera, 'last_mouse_time', 0.0) > 2.0:
+                    # decair offset pra 0
+                    offset = getattr(camera, 'angle_offset', 0.0)
+                    camera.angle_offset = offset * (1.0 - 5.0 * dt) # decaimento suave
+                    if abs(camera.angle_offset) < 0.1: camera.angle_offset = 0.0
+                
+                camera.angle = base_angle + getattr(camera, 'angle_offset', 0.0)
+                camera.center = car_ctrl.render_position
+
+    def mark_pick_actions(self):
+        # todos os nos debaixo de cada mount apontam pra acao refeito do zero pra nao ficarem ids velhos
+        self.pick_actions = {}
+        def mark(node, action):
+            self.pick_actions[id(node)] = action
+            if node.mesh is not None: mesh_bvh(node.mesh) # construir ja pra o primeiro clique nao engasgar
+            for c in node.children: mark(c, action)
+        for mount, action in self.pick_roots: mark(mount, action)
+
+    def reload_pick_actions(self, node):
+        if id(node) in self.pick_actions: self.mark_pick_actions()
+
+    def reload_bake(self, node):
+        # so o no recarregado e refeito os outros ja largaram as copias do cpu e ficam com o bake que tinham
+        # com a geometria igual a chave e a mesma e vem da cache
+        for i, static in enumerate(self.static_nodes):
+            if static is not node: continue
+            queue = node.collect(self.garage_root.local, [])
+            tris = queue_triangles(queue)
+            if not len(tris): return
+            self.static_tris[i] = tris
+            bake_static(queue, self.sun_pos, occluders=np.concatenate(self.static_tris))
+
+    def pick(self, x, y, width, height):
+        # raio do pixel x y pela inversa do ultimo VP contra a cena toda
+        if self.last_VP is None: return None
+        origin, direction = ray_from_screen(x, y, width, height, self.last_VP)
+        queue = self.root.collect(np.eye(4, dtype=np.float32), [])
+        return pick(queue, origin, direction)
+
+    def pick_action(self, x, y, width, height):
+        hit = self.pick(x, y, width, height)
+        if hit is None: return None
+        return self.pick_actions.get(id(hit.node))
+
+    def render(self, width, height):
+        with self.profiler.scope("render"):
+            if self.resolution is None:
+                self._render(width, height)
+                return
+            # cena num fbo a escala escolhida pelo tempo de gpu e depois esticada pra janela
+            w, h = self.resolution.begin(width, height)
+            self._render(w, h, width / height)
+            with self.profiler.scope("upscale"):
+                self.resolution.end()
+
+    def _render(self, width, height, aspect=None):
+        shader = self.shader
+        profiler = self.profiler
+        camera = self.camera
+        car_ctrl = self.car_ctrl
+        inputs = self.inputs
+        
+        # obj que mudaram no disco trocam os buffers por baixo dos nos que ja existem
+        with profiler.scope("assets"):
+            self.assets.update()
+        # texturas que acabaram de descodificar sobem aos poucos sem bloquear
+        with profiler.scope("textures"):
+            self.textures.update()
+        shader.invalidate_textures()
+
+        # renderizar
+        glClearColor(0.1, 0.1, 0.1, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        
+        glViewport(0, 0, width, height)
+        
+        # fov dinamico
+        current_fov = 90.0 if camera.mode == "FIRST_PERSON" else 60.0
+        
+        # com resolucao dinamica o aspeto e o da janela nao o do retangulo arredondado
+        P = perspective(current_fov, aspect or width/height, 0.1, 1000.0)
+        V, eye_pos = camera.get_view_matrix()
+        VP = P @ V
+        self.last_VP = VP
+        
+        shader.use()
+        shader.set_view_pos(eye_pos)
+        
+        # luzes
+        # sol como fonte de luz principal
+        shader.set_light(0, self.sun_pos, (0.3, 0.3, 0.2), (1.0, 0.95, 0.8), (1.0, 1.0, 0.9), cutoff=-1.0)
+        # luz ambiente suave
+        shader.set_light(1, (0, 50, 0), (0.2, 0.2, 0.25), (0.3, 0.3, 0.4), (0.2, 0.2, 0.2), cutoff=-1.0)
+        
+        # logica dos farois
+        headlights_on = inputs['1']
+        
+        # calcular vetores forward e right do carro
+        # yaw do carro e car ctrl yaw
+        # forward e sin yaw 0 cos yaw
+        cy = car_ctrl.render_yaw
+        fwd = np.array([math.sin(cy), 0, math.cos(cy)])
+        right = np.array([math.cos(cy), 0, -math.sin(cy)])
+        up = np.array([0, 1, 0])
+        
+        # posicao do carro
+        car_pos = car_ctrl.render_position
+        
+        # posicoes dos farois
+        hl_intensity = (0,0,0)
+        
+        if headlights_on:
+            hl_intensity = (1.0, 1.0, 0.9) # brilhante levemente amarelo
+            self.headlight_material.emission = (1.0, 1.0, 0.8) # brilho do mesh
+        else:
+            self.headlight_material.emission = (0.0, 0.0, 0.0) # sem brilho
+            
+        # direcao do spotlight ligeiramente pra baixo
+        spot_dir = fwd - up * 0.2
+        # cutoff do spotlight cosseno do angulo 20 graus tipo 094
+        spot_cutoff = math.cos(math.radians(20))
+            
+        # farol esquerdo
+        l_pos = car_pos + fwd * 1.2 - right * 0.6 + up * 0.5
+        shader.set_light(2, l_pos, (0,0,0), hl_intensity, hl_intensity, direction=spot_dir, cutoff=spot_cutoff)
+        
+        # farol direito
+        r_pos = car_pos + fwd * 1.2 + right * 0.6 + up * 0.5
+        shader.set_light(3, r_pos, (0,0,0), hl_intensity, hl_intensity, direction=spot_dir, cutoff=spot_cutoff)
+        
+        # logica das luzes de marcha atras
+        # se mover pra tras velocidade menor que menos 01 ou pressionar s
+        reversing = inputs['s'] or car_ctrl.speed < -0.1
+        if reversing:
+            self.taillight_material.emission = (2.0, 0.0, 0.0) # vermelho muito brilhante
+        else:
+            self.taillight_material.emission = (0.3, 0.0, 0.0) # vermelho escuro luzes traseiras sempre ligadas
+        
+        with profiler.scope("traversal", gpu=False):
+            queue = self.root.collect(np.eye(4, dtype=np.float32), [])
+        with profiler.scope("culling", gpu=False):
+            spheres = bounding_spheres(queue)
+            visible = cull_queue(queue, VP, spheres)
+        # opacos primeiro depois o ceu so nos pixeis que ficaram vazios e por fim os vidros por cima
+        opaque = [item for item in visible if item[1].material.alpha >= 1.0]
+        transparent = [item for item in visible if item[1].material.alpha < 1.0]
+        # indices de todos os materiais garantidos antes do sync pra a tabela subir de uma vez
+        # os retrovisores veem nos que a camara principal cortou
+        materials = shader.materials
+        for _, node in queue: materials.index(node.material)
+        materials.sync()
+        # vistas secundarias com a mesma travessia e as mesmas esferas antes do passe principal
+        with profiler.scope("mirrors"):
+            if self.views.render(shader, queue, spheres, self.sky):
+                glViewport(0, 0, width, height)
+                shader.set_view_pos(eye_pos)
+        # opacos ordenados por textura e material pra cortar binds e trocas de uniforms
+        opaque = sort_queue(opaque, materials)
+        with profiler.scope("submit"):
+            draw_queue(shader, opaque, VP)
+        if self.sky is not None:
+            with profiler.scope("sky"):
+                self.sky.draw(P, V)
+            shader.use()
+        with profiler.scope("transparent"):
+            if self.oit is not None: self.oit.draw(shader, transparent, VP, width, height)
+            else: draw_queue(shader, transparent, VP)